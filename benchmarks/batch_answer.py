@@ -0,0 +1,99 @@
+"""
+Throughput of answering a list of questions one at a time through get_chain against BatchAnswerer.
+
+Offline: a LocalVectorStore of data/programs.json, embeddings with a simulated time per request, the fake
+reranker and a fake chat model with a fixed time per answer. Some questions are asked twice, and one
+question makes the chat model fail, which should show up as that question's error only.
+
+    python -m benchmarks.batch_answer --questions 100 --llm-ms 300 --concurrency 1 4 16 64
+"""
+import time
+import asyncio
+import argparse
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from src.answer_cache import normalize_question
+from src.batch import BatchAnswerer
+from src.chain import get_chain
+from src.vectorstore import LocalVectorStore
+from benchmarks.fakes import FakeChatModel, FakeReranker
+from benchmarks.vectorstore_latency import load_corpus
+
+FAILING = "this question breaks the model"
+
+
+class SlowEmbedding(DeterministicFakeEmbedding):
+    """Fake embeddings with a simulated time per request, counting the requests"""
+    request_ms: float = 50.0
+    requests: int = 0
+
+    def embed_documents(self, texts):
+        self.requests += 1
+        time.sleep(self.request_ms / 1000)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self.requests += 1
+        time.sleep(self.request_ms / 1000)
+        return super().embed_query(text)
+
+
+class FailingChatModel(FakeChatModel):
+    """FakeChatModel raising on the FAILING question"""
+    async def _agenerate(self, messages, *args, **kwargs):
+        if FAILING in messages[-1].content:
+            raise RuntimeError("simulated model error")
+        return await super()._agenerate(messages, *args, **kwargs)
+
+
+def make_questions(n: int, programs: list[str]) -> list[str]:
+    questions = [f"What are the requirements of the {programs[i % len(programs)]} program?" for i in range(n)]
+    # a tenth asked twice, with different spelling
+    for i in range(0, n, 10):
+        questions[i + 1 if i + 1 < n else i] = questions[i].upper().rstrip("?")
+    questions[n // 2] = FAILING
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--llm-ms", type=float, default=300.0, help="fake chat model time per answer")
+    parser.add_argument("--embed-ms", type=float, default=50.0, help="fake embeddings time per request")
+    parser.add_argument("--rerank-ms", type=float, default=50.0, help="fake reranker time per request")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--sequential", type=int, default=20, help="questions answered one at a time for the baseline")
+    args = parser.parse_args()
+
+    texts, metadatas = load_corpus(2000)
+    embedding = SlowEmbedding(size=256, request_ms=0)
+    store = LocalVectorStore.from_texts(texts, embedding, metadatas=metadatas)
+    embedding.request_ms = args.embed_ms
+    questions = make_questions(args.questions, sorted({metadata["program"] for metadata in metadatas}))
+    model = FailingChatModel(first_token_ms=args.llm_ms, token_ms=0)
+    reranker = FakeReranker(top_n=3, request_ms=args.rerank_ms)
+    print(f"{len(questions)} questions ({len(set(map(normalize_question, questions)))} distinct), llm {args.llm_ms:.0f} ms, "
+          f"embeddings {args.embed_ms:.0f} ms, rerank {args.rerank_ms:.0f} ms")
+
+    chain = get_chain(model, store, top_k=10, top_n=3, rerank=True, reranker=reranker)
+    embedding.requests = 0
+    start = time.perf_counter()
+    for question in questions[:args.sequential]:
+        chain.invoke(question)
+    seconds = time.perf_counter() - start
+    print(f"  get_chain one at a time    {args.sequential / seconds:7.2f} questions/s  "
+          f"({embedding.requests / args.sequential:.1f} embedding requests per question)")
+
+    for concurrency in args.concurrency:
+        answerer = BatchAnswerer(model, store, top_k=10, top_n=3, rerank=True, reranker=reranker, max_concurrency=concurrency)
+        embedding.requests = 0
+        start = time.perf_counter()
+        results, stats = asyncio.run(answerer.abatch(questions))
+        seconds = time.perf_counter() - start
+        assert [result["question"] for result in results] == questions
+        errors = [result["question"] for result in results if result["error"]]
+        print(f"  BatchAnswerer concurrency {concurrency:<3} {len(questions) / seconds:7.2f} questions/s  "
+              f"({embedding.requests} embedding requests, {stats['unique']} answered, errors: {errors})")
+
+
+if __name__ == "__main__":
+    main()
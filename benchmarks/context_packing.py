@@ -0,0 +1,95 @@
+"""
+Prompt tokens of the retrieved context with and without the ContextPacker, and what survives the packing.
+
+The corpus is the program documents of data/programs.json (in the program_documents format) plus a
+generated course catalog (course_documents format) where some courses have an honors twin with the same
+description, the near-duplicates a real catalog has. For each question the top k documents are retrieved
+and the tokens of the raw list (as RAG_PROMPT gets it) are compared with the packed context. Retention is
+the fraction of questions whose relevant document, when retrieved, is still in the packed context.
+
+Needs the tiktoken encoding: downloaded on first use, or read from TIKTOKEN_CACHE_DIR offline.
+
+    python -m benchmarks.context_packing --budget 1500 --top-k 10
+"""
+import os
+import re
+import json
+import time
+import random
+import argparse
+import statistics
+from langchain_core.documents import Document
+from src.context import ContextPacker
+from src.indexer import program_documents
+from src.vectorstore import LocalVectorStore
+from benchmarks.retrieval_eval import ConceptEmbedding, make_catalog
+
+
+def make_corpus(n_courses: int, honors_rate: float, seed: int = 0) -> tuple[list[Document], list[tuple[str, str, str]]]:
+    """Documents and (question, id of the relevant document, its kind) triples"""
+    rng = random.Random(seed)
+    texts, metadatas, queries = make_catalog(n_courses, seed)
+    documents = []
+    for text, metadata in zip(texts, metadatas):
+        prerequisites = text.split(" Prerequisites: ")[1].rstrip(".").split(", ") if " Prerequisites: " in text else []
+        metadata = dict(metadata, credits="3", prerequisites=prerequisites)
+        documents.append(Document(page_content=text, metadata=metadata))
+        if rng.random() < honors_rate:
+            honors = dict(metadata, code=metadata["code"] + "H", name=metadata["name"] + " Honors")
+            documents.append(Document(page_content=text.replace(metadata["code"], honors["code"], 1)
+                                      .replace(metadata["name"], honors["name"], 1), metadata=honors))
+    questions = [(query, metadatas[i]["code"], "course") for _, query, i in queries]
+
+    path = os.path.join(os.path.dirname(__file__), "..", "data", "programs.json")
+    with open(path, "r", encoding="utf-8") as file:
+        programs = program_documents(json.load(file))
+    for program, (text, metadata) in programs.items():
+        documents.append(Document(page_content=text, metadata=metadata))
+    for program in rng.sample(list(programs), min(100, len(programs))):
+        questions.append((f"What are the requirements of the {program}?", program, "program"))
+    return documents, questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=2000, help="size of the generated catalog")
+    parser.add_argument("--honors-rate", type=float, default=0.2, help="fraction of courses with an honors twin")
+    parser.add_argument("--top-k", type=int, default=10, help="documents retrieved per question")
+    parser.add_argument("--budget", type=int, default=1500, help="token budget of the packed context")
+    args = parser.parse_args()
+
+    documents, questions = make_corpus(args.courses, args.honors_rate)
+    store = LocalVectorStore.from_texts([doc.page_content for doc in documents], ConceptEmbedding(),
+                                        metadatas=[doc.metadata for doc in documents])
+    packer = ContextPacker(budget=args.budget)
+    print(f"{len(documents)} documents, {len(questions)} questions, top {args.top_k}, budget {args.budget} tokens")
+
+    rows, pack_ms = [], []
+    for question, relevant, kind in questions:
+        retrieved = store.similarity_search(question, k=args.top_k)
+        start = time.perf_counter()
+        packed = packer.pack(retrieved)
+        pack_ms.append((time.perf_counter() - start) * 1000)
+        ids = [doc.metadata.get("code") or doc.metadata.get("program") for doc in retrieved]
+        kept = re.search(re.escape(relevant.replace("\xa0", " ")) + r"(?!\w)", packed["context"]) is not None
+        rows.append({"kind": kind, "raw": packed["raw_tokens"], "packed": packed["tokens"], "retrieved": relevant in ids, "kept": kept,
+                     "duplicates": packed["duplicates"], "truncated": packed["truncated"], "dropped": packed["dropped"]})
+
+    for kind in ["course", "program", None]:
+        selected = [row for row in rows if kind is None or row["kind"] == kind]
+        if not selected:
+            continue
+        raw = statistics.mean(row["raw"] for row in selected)
+        packed = statistics.mean(row["packed"] for row in selected)
+        retrieved = [row for row in selected if row["retrieved"]]
+        retention = sum(row["kept"] for row in retrieved) / len(retrieved) if retrieved else float("nan")
+        print(f"  {kind or 'all':<8} raw {raw:7.0f} tokens  packed {packed:6.0f} tokens  saved {100 * (1 - packed / raw):5.1f}%"
+              f"  relevant doc kept {100 * retention:5.1f}% of {len(retrieved)}"
+              f"  duplicates/question {statistics.mean(row['duplicates'] for row in selected):.2f}"
+              f"  truncated {statistics.mean(row['truncated'] for row in selected):.2f}"
+              f"  dropped {statistics.mean(row['dropped'] for row in selected):.2f}")
+    print(f"  packing p50 {statistics.median(pack_ms):.2f} ms per question; totals {packer.metrics()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Offline stand-ins for the hosted models, with configurable latency.
+"""
+import re
+import time
+import asyncio
+import hashlib
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Iterator, List, Optional, Sequence
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun, Callbacks
+from langchain_core.documents import BaseDocumentCompressor, Document
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+ANSWER = ("COP 3503C requires COP 3502C with a minimum grade of C, and MAC 2311 as a corequisite. "
+          "It is usually taken in the second semester of the computer science model plan.")
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that answers with a fixed text, word by word, after a time to first token"""
+    response: str = ANSWER
+    first_token_ms: float = 300.0
+    token_ms: float = 15.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _tokens(self) -> List[str]:
+        return re.findall(r"\S+\s*", self.response)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        time.sleep((self.first_token_ms + self.token_ms * len(self._tokens())) / 1000)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.response))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep((self.first_token_ms + self.token_ms * len(self._tokens())) / 1000)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.response))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.first_token_ms / 1000)
+        for i, token in enumerate(self._tokens()):
+            if i:
+                time.sleep(self.token_ms / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.first_token_ms / 1000)
+        for i, token in enumerate(self._tokens()):
+            if i:
+                await asyncio.sleep(self.token_ms / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+class FakeEmbeddingsAPI():
+    def __init__(self, dim: int, request_ms: float) -> None:
+        self.dim = dim
+        self.request_ms = request_ms
+        self.requests = 0
+
+    def create(self, input: List[str], model: str, dimensions: int = None) -> SimpleNamespace:
+        """Deterministic pseudo-random vector per text, like client.embeddings.create"""
+        self.requests += 1
+        if self.request_ms:
+            time.sleep(self.request_ms / 1000)
+        dim = dimensions or self.dim
+        data = []
+        for text in input:
+            seed = int.from_bytes(hashlib.md5(text.encode("utf-8")).digest()[:4], "little")
+            data.append(SimpleNamespace(embedding=np.random.default_rng(seed).standard_normal(dim).astype(np.float32).tolist()))
+        return SimpleNamespace(data=data)
+
+
+class FakeOpenAI():
+    """Stand-in for openai.OpenAI with just the embeddings endpoint, and a simulated time per request"""
+    def __init__(self, dim: int = 1536, request_ms: float = 0.0) -> None:
+        self.embeddings = FakeEmbeddingsAPI(dim, request_ms)
+
+
+class FakeEncoding():
+    """
+    Offline stand-in for a tiktoken Encoding: words, runs of punctuation and whitespace as in cl100k_base's
+    pre-tokenization, split into tokens of at most 4 characters, so counts are close to the real encoding's
+    """
+    PIECE_PATTERN = re.compile(r"'(?:[sdmt]|ll|ve|re)| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|\s+", re.IGNORECASE)
+
+    def __init__(self) -> None:
+        self.ids: dict = {}
+        self.pieces: List[str] = []
+
+    def _id(self, piece: str) -> int:
+        if piece not in self.ids:
+            self.ids[piece] = len(self.pieces)
+            self.pieces.append(piece)
+        return self.ids[piece]
+
+    def encode(self, text: str, disallowed_special=()) -> List[int]:
+        return [self._id(piece[i:i + 4]) for piece in self.PIECE_PATTERN.findall(text) for i in range(0, len(piece), 4)]
+
+    def encode_batch(self, texts: List[str], disallowed_special=()) -> List[List[int]]:
+        return [self.encode(text) for text in texts]
+
+    def decode(self, tokens: List[int]) -> str:
+        return "".join(self.pieces[token] for token in tokens)
+
+
+class FakeReranker(BaseDocumentCompressor):
+    """Stand-in for CohereRerank: keeps the top_n documents sharing the most words with the query, after a delay"""
+    top_n: int = 3
+    request_ms: float = 0.0
+
+    def compress_documents(self, documents: Sequence[Document], query: str, callbacks: Optional[Callbacks] = None) -> Sequence[Document]:
+        if self.request_ms:
+            time.sleep(self.request_ms / 1000)
+        words = set(query.lower().split())
+        scored = sorted(documents, key=lambda document: -len(words & set(document.page_content.lower().split())))
+        return scored[:self.top_n]
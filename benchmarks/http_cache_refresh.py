@@ -0,0 +1,112 @@
+"""
+Re-scrape cost with the conditional-GET HTTP cache, against a local stand-in for catalog.ufl.edu.
+
+The stand-in serves a course index plus one page per major and answers If-None-Match with 304.
+The scraper runs three times: cold cache, warm cache (nothing changed) and offline replay.
+
+    python -m benchmarks.http_cache_refresh --majors 200
+"""
+import os
+import sys
+import time
+import hashlib
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "data"))
+from http_cache import format_stats, get_session     # noqa: E402
+from get_courses import fetch_major_courses           # noqa: E402
+
+COURSE_BLOCK = """<div class="courseblock"><p class="courseblocktitle"><strong>{code}\xa0{number}  Course {number}</strong>
+<span class="credits">3 Credits</span></p><p class="courseblockdesc">Description of course {number}. {filler}</p>
+<p class="courseblockextra noindent">Grading Scheme: Letter Grade</p></div>"""
+
+
+def make_site(n_majors: int, courses_per_major: int) -> dict[str, bytes]:
+    """Pages of a fake course catalog keyed by path"""
+    links = "".join(f'<a href="/UGRD/courses/major{i}/">Major {i}</a>' for i in range(n_majors))
+    pages = {"/UGRD/courses/": f'<html><body><nav id="cl-menu">{links}</nav></body></html>'.encode()}
+    for i in range(n_majors):
+        blocks = "".join(
+            COURSE_BLOCK.format(code=f"M{i:02d}", number=1000 + j, filler="lorem ipsum " * 40) for j in range(courses_per_major)
+        )
+        pages[f"/UGRD/courses/major{i}/"] = f"<html><body>{'<div>nav</div>' * 200}{blocks}</body></html>".encode()
+    return pages
+
+
+def serve(pages: dict[str, bytes]) -> tuple[ThreadingHTTPServer, dict]:
+    """Start the stand-in server on a free port; returns it with its response counters"""
+    counts = {"200": 0, "304": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            body = pages.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            etag = '"' + hashlib.md5(body).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                with lock:
+                    counts["304"] += 1
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            with lock:
+                counts["200"] += 1
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=UTF-8")
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, counts
+
+
+def scrape(base_url: str, session, workers: int) -> int:
+    """Same flow as get_courses.main, returns the number of courses found"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(session.get(base_url + "/UGRD/courses/").text, "html.parser")
+    majors_urls = [(a.text.strip(), a["href"]) for a in soup.find("nav", id="cl-menu").find_all("a")]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(lambda major_url: fetch_major_courses(*major_url, base_url, session), majors_urls)
+        return sum(len(courses) for _, _, courses in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--majors", type=int, default=200, help="number of major pages")
+    parser.add_argument("--courses", type=int, default=30, help="courses per major page")
+    parser.add_argument("--workers", type=int, default=8, help="scraper threads")
+    args = parser.parse_args()
+
+    server, counts = serve(make_site(args.majors, args.courses))
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    cache_path = os.path.join(tempfile.mkdtemp(), "http.sqlite")
+
+    for name, offline in [("cold cache", False), ("warm cache", False), ("offline replay", True)]:
+        counts["200"] = counts["304"] = 0
+        session = get_session(cache_path, offline=offline, pool_size=args.workers)
+        start = time.perf_counter()
+        n_courses = scrape(base_url, session, args.workers)
+        seconds = time.perf_counter() - start
+        print(f"{name:<15} {seconds:6.2f}s  {n_courses} courses  "
+              f"server: {counts['200']} x 200, {counts['304']} x 304  client: {format_stats(session)}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Cold import time of the modules a worker or CLI tool starts with, in fresh interpreters.
+
+Each module is imported in a new `python -X importtime` process, and the cumulative time of the module
+itself is reported (median over --runs), with its heaviest imports. With --ref, the same modules are
+also imported from the src/ of that git revision, for a before / after comparison.
+
+    python -m benchmarks.import_time --modules src.models src.chain --ref HEAD~1
+"""
+import os
+import sys
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def import_times(module: str, cwd: str) -> dict:
+    """Cumulative import time in µs of every package imported by `import module`, or the error"""
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                             cwd=cwd, capture_output=True, text=True)
+    if process.returncode != 0:
+        return {"error": process.stderr.strip().splitlines()[-1]}
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        times[name.strip()] = max(times.get(name.strip(), 0), int(cumulative_us))
+    return times
+
+
+def measure(module: str, cwd: str, runs: int) -> dict:
+    samples = [import_times(module, cwd) for _ in range(runs)]
+    if "error" in samples[0]:
+        return samples[0]
+    total_ms = statistics.median(sample[module] for sample in samples) / 1000
+    # heaviest top level packages pulled in, other than the module itself
+    packages = {}
+    for name, us in samples[-1].items():
+        top = name.split(".")[0]
+        if name != module and top != module.split(".")[0]:
+            packages[top] = max(packages.get(top, 0), us)
+    heaviest = sorted(packages.items(), key=lambda item: -item[1])[:5]
+    return {"ms": total_ms, "heaviest": [(name, us / 1000) for name, us in heaviest]}
+
+
+def checkout(ref: str, directory: str) -> None:
+    """Extract src/ of a git revision into directory"""
+    archive = subprocess.run(["git", "archive", ref, "src"], cwd=ROOT, capture_output=True, check=True)
+    subprocess.run(["tar", "-x", "-C", directory], input=archive.stdout, check=True)
+
+
+def report(label: str, module: str, result: dict) -> None:
+    if "error" in result:
+        print(f"  {label:<8} {module:<16} failed: {result['error']}")
+        return
+    heaviest = ", ".join(f"{name} {ms:.0f}" for name, ms in result["heaviest"])
+    print(f"  {label:<8} {module:<16} {result['ms']:8.1f} ms   heaviest (ms): {heaviest}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=["src.models", "src.chain", "src.server"])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per module")
+    parser.add_argument("--ref", default=None, help="git revision to compare against, e.g. HEAD~1")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.ref:
+            checkout(args.ref, directory)
+        for module in args.modules:
+            print(module)
+            current = measure(module, ROOT, args.runs)
+            if args.ref:
+                before = measure(module, directory, args.runs)
+                report(args.ref, module, before)
+            report("current", module, current)
+            if args.ref and "error" not in current and "error" not in before:
+                print(f"  {'':<8} {module:<16} {current['ms'] - before['ms']:+8.1f} ms ({100 * (current['ms'] / before['ms'] - 1):+.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
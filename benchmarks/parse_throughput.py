@@ -0,0 +1,155 @@
+"""
+Parse throughput of the catalog extractors, before and after the single-pass rewrite.
+
+Program pages: stuff/catalog_tables.html wrapped in catalog-sized page chrome, plus any pages
+recorded in an HTTP cache (--cache data/cache/http.sqlite). Course pages are generated.
+The legacy extractors below are the pre-rewrite code paths, kept here for comparison.
+
+    python -m benchmarks.parse_throughput --seconds 2
+"""
+import os
+import sys
+import time
+import sqlite3
+import argparse
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "data"))
+from get_degrees import PROGRAM_SECTIONS, extract_program_sections     # noqa: E402
+from get_courses import parse_major_courses                          # noqa: E402
+from benchmarks.http_cache_refresh import make_site                   # noqa: E402
+
+STUFF_DIR = os.path.join(os.path.dirname(__file__), "..", "stuff")
+
+
+def legacy_program_sections(html):
+    """Old fetch_program_details parse: one full html.parser parse and eight find_all passes per subsection"""
+    details = {}
+    for subsection in PROGRAM_SECTIONS:
+        soup = BeautifulSoup(html, "html.parser")
+        table_classes = ["sc_courselist", "sc_plangrid"] + [f"sc_sctable tbl_academiclearningcompact{i}" for i in range(1, 7)]
+        course_tables = []
+        for tbl_class in table_classes:
+            course_tables += soup.find_all("table", {"class": tbl_class})
+        subsection_courses = {}
+        for table in course_tables:
+            if "sc_courselist" in table.get("class", []):
+                rows = table.find_all("tr")
+                if any("areaheader" in row.get("class", []) for row in rows):
+                    current_area = None
+                    for row in rows:
+                        if "areaheader" in row.get("class", []):
+                            current_area = row.find("span", class_="courselistcomment").text.strip()
+                            subsection_courses[current_area] = []
+                        else:
+                            cols = row.find_all("td")
+                            if len(cols) >= 2 and cols[0].text.strip() and current_area:
+                                subsection_courses[current_area].append(cols[0].text.strip())
+                else:
+                    courses = []
+                    for row in rows:
+                        cols = row.find_all("td")
+                        if len(cols) >= 2 and cols[0].text.strip():
+                            courses.append(cols[0].text.strip())
+                    subsection_courses["courses"] = courses
+            elif "sc_plangrid" in table.get("class", []) and subsection == "criticaltracking":
+                current_semester = None
+                for row in table.find_all("tr"):
+                    if "plangridterm" in row.get("class", []):
+                        current_semester = row.find("th").text.strip()
+                        subsection_courses[current_semester] = []
+                    else:
+                        cols = row.find_all("td")
+                        if len(cols) >= 2:
+                            if cols[0].text.strip() and current_semester:
+                                subsection_courses[current_semester].append(cols[0].text.strip())
+                        else:
+                            comment = row.find("span", class_="comment")
+                            if comment and current_semester:
+                                subsection_courses[current_semester].append(comment.text.strip())
+        details[subsection] = subsection_courses
+    return details
+
+
+def legacy_major_courses(html):
+    """Old fetch_major_courses parse: full-document html.parser parse, then find_all over the tree"""
+    major_soup = BeautifulSoup(html, "html.parser")
+    courses = []
+    for course_block in major_soup.find_all("div", class_="courseblock"):
+        course_title = course_block.find("p", class_="courseblocktitle")
+        if course_title:
+            course_code, course_name = course_title.find("strong").text.strip().split(" ", 1)
+            course_credits = course_title.find("span", class_="credits").text \
+                .replace("Credits", "").strip().replace("Credit", "").strip()
+            if "-" in course_credits:
+                course_credits = course_credits[-1]
+            prerequisites, grading_scheme = [], ""
+            for extra in course_block.find_all("p", class_="courseblockextra noindent"):
+                if "Prerequisite:" in extra.text:
+                    prerequisites = [link.text.strip().replace("\xa0", " ") for link in extra.find_all("a")]
+                elif "Grading Scheme:" in extra.text:
+                    grading_scheme = extra.text.replace("Grading Scheme:", "").strip()
+            courses.append({
+                "code": course_code,
+                "name": course_name,
+                "credits": course_credits,
+                "description": course_block.find("p", class_="courseblockdesc").text.strip(),
+                "prerequisites": prerequisites,
+                "grading_scheme": grading_scheme
+            })
+    return courses
+
+
+def program_pages(chrome_kb: int, cache_path: str = None) -> list[str]:
+    """Saved program tables wrapped in page chrome, plus recorded program pages from an HTTP cache"""
+    with open(os.path.join(STUFF_DIR, "catalog_tables.html"), "r", encoding="utf-8") as file:
+        tables = file.read()
+    # the hand-copied plan grid in the saved snippet lost its </table>, which html.parser would nest
+    # the rest of the page into; close it so both extractors see the page a browser would
+    tables = tables.replace('\n    <table class="sc_courselist">', '\n    </tbody></table>\n    <table class="sc_courselist">', 1)
+    chrome = "<div class='nav'><ul>" + "<li><a href='/UGRD/'>Link</a></li>" * (chrome_kb * 1024 // 36) + "</ul></div>"
+    pages = [f"<html><head><title>Program</title></head><body>{chrome}<main>{tables}</main>{chrome}</body></html>"]
+    if cache_path:
+        conn = sqlite3.connect(cache_path)
+        for (body,) in conn.execute("SELECT body FROM pages WHERE url LIKE '%/UGRD/colleges-schools/%'"):
+            pages.append(body.decode("utf-8", errors="replace"))
+    return pages
+
+
+def throughput(extract, pages: list[str], seconds: float) -> float:
+    """Pages parsed per second"""
+    n, start = 0, time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        for page in pages:
+            extract(page)
+        n += len(pages)
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=2.0, help="time per measurement")
+    parser.add_argument("--chrome-kb", type=int, default=80, help="size of page chrome around the saved tables")
+    parser.add_argument("--cache", default=None, help="HTTP cache with recorded catalog pages")
+    args = parser.parse_args()
+
+    programs = program_pages(args.chrome_kb, args.cache)
+    majors = [page.decode() for path, page in make_site(5, 40).items() if path != "/UGRD/courses/"]
+
+    # the rewrite must not change what is extracted
+    for page in programs:
+        assert extract_program_sections(page) == legacy_program_sections(page)
+    for page in majors:
+        # schedules are random, everything else must match
+        assert [{k: v for k, v in c.items() if k != "schedules"} for c in parse_major_courses(page)] == legacy_major_courses(page)
+
+    for name, pages, old, new in [
+        ("program pages", programs, legacy_program_sections, extract_program_sections),
+        ("major pages", majors, legacy_major_courses, parse_major_courses),
+    ]:
+        before, after = throughput(old, pages, args.seconds), throughput(new, pages, args.seconds)
+        print(f"{name:<14} legacy {before:8.1f} pages/s   single pass {after:8.1f} pages/s   ({after / before:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
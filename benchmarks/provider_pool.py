@@ -0,0 +1,129 @@
+"""
+Tail latency of a ProviderPool against a single provider, with fake chat models.
+
+The primary fake has a slow tail (a --tail-rate fraction of its calls takes --tail-ms more) and the backup a steady
+time per call. Compares the primary alone, the pool without hedging (failover only) and the hedged pool,
+blocking and streaming (time to first token). Then the primary starts failing to show the failover and
+the routing to the healthy backup.
+
+    python -m benchmarks.provider_pool --requests 200 --hedge-after-ms 150
+"""
+import time
+import random
+import asyncio
+import argparse
+import statistics
+from langchain_core.messages import HumanMessage
+from src.pool import ProviderPool
+from benchmarks.fakes import FakeChatModel
+
+
+class FlakyChatModel(FakeChatModel):
+    """FakeChatModel with a random slow tail and an error rate"""
+    tail_ms: float = 0.0
+    tail_rate: float = 0.0
+    error_rate: float = 0.0
+    seed: int = 0
+    calls: int = 0
+
+    def _delay(self) -> float:
+        """Extra time of this call, on top of first_token_ms"""
+        self.calls += 1
+        rng = random.Random(self.seed * 100003 + self.calls)
+        if rng.random() < self.error_rate:
+            raise RuntimeError("simulated provider error")
+        return (self.tail_ms if rng.random() < self.tail_rate else 0.0) / 1000
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self._delay())
+        return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self._delay())
+        yield from super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self._delay())
+        return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self._delay())
+        async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            yield chunk
+
+
+async def measure(model, requests: int, concurrency: int, stream: bool) -> list[float]:
+    """Latency in ms of each request (whole answer, or first token when streaming), errors excluded"""
+    semaphore, latencies = asyncio.Semaphore(concurrency), []
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if stream:
+                    async for _ in model.astream([HumanMessage(content=f"question {i}")]):
+                        break
+                else:
+                    await model.ainvoke([HumanMessage(content=f"question {i}")])
+            except Exception:
+                return
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return latencies
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+def report(label: str, latencies: list[float], requests: int) -> None:
+    print(f"  {label:<28} ok {len(latencies):4d}/{requests}  p50 {statistics.median(latencies):7.1f} ms"
+          f"  p95 {percentile(latencies, 0.95):7.1f} ms  p99 {percentile(latencies, 0.99):7.1f} ms")
+
+
+def make_members(args, primary_errors: float = 0.0) -> list[FlakyChatModel]:
+    # the answers themselves are instant, only the injected delays count
+    primary = FlakyChatModel(first_token_ms=args.primary_ms, token_ms=0, tail_ms=args.tail_ms,
+                             tail_rate=args.tail_rate, error_rate=primary_errors, seed=1)
+    backup = FlakyChatModel(first_token_ms=args.backup_ms, token_ms=0, seed=2)
+    return [primary, backup]
+
+
+async def run(args) -> None:
+    for stream in [False, True]:
+        print("streaming, time to first token:" if stream else "blocking, whole answer:")
+        report("primary alone", await measure(make_members(args)[0], args.requests, args.concurrency, stream), args.requests)
+        for label, hedge_after in [("pool, failover only", 3600.0), ("pool, hedged", args.hedge_after_ms / 1000)]:
+            pool = ProviderPool(members=make_members(args), names=["primary", "backup"], hedge_after=hedge_after)
+            report(label, await measure(pool, args.requests, args.concurrency, stream), args.requests)
+        print(f"  hedged pool members: {pool.metrics()}")
+
+    print(f"primary failing {100 * args.error_rate:.0f}% of calls:")
+    primary = make_members(args, primary_errors=args.error_rate)[0]
+    report("primary alone", await measure(primary, args.requests, args.concurrency, False), args.requests)
+    pool = ProviderPool(members=make_members(args, primary_errors=args.error_rate), names=["primary", "backup"],
+                        hedge_after=args.hedge_after_ms / 1000, cooldown=args.cooldown)
+    report("pool, hedged + failover", await measure(pool, args.requests, args.concurrency, False), args.requests)
+    for name, summary in pool.metrics().items():
+        print(f"  {name:<8} {summary}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--primary-ms", type=float, default=100.0, help="primary time per call")
+    parser.add_argument("--tail-ms", type=float, default=1500.0, help="extra time of a slow primary call")
+    parser.add_argument("--tail-rate", type=float, default=0.1, help="fraction of slow primary calls")
+    parser.add_argument("--backup-ms", type=float, default=180.0, help="backup time per call")
+    parser.add_argument("--hedge-after-ms", type=float, default=250.0)
+    parser.add_argument("--error-rate", type=float, default=0.3, help="primary error rate in the failover run")
+    parser.add_argument("--cooldown", type=float, default=0.5, help="seconds a failed member is skipped")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
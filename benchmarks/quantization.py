@@ -0,0 +1,83 @@
+"""
+Memory per vector, recall@k and latency of LocalVectorStore.quantize() across code dims and encodings.
+
+Vectors are synthetic by default: a few hundred latent topics with the variance decaying over the dims,
+like text-embedding-3 vectors whose leading dims carry most of the meaning. --store uses the vectors of
+a saved LocalVectorStore instead (e.g. the index written by src.indexer), so dim and encoding can be
+picked from real data. Queries are stored vectors with noise added; the ground truth is exact float32
+search. The store is saved and loaded memory-mapped, so rescoring reads the full vectors from disk.
+
+    python -m benchmarks.quantization --size 20000 --dim 1536 --k 10
+    python -m benchmarks.quantization --store index
+"""
+import time
+import argparse
+import tempfile
+import statistics
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from src.vectorstore import LocalVectorStore
+
+
+def synthetic_vectors(size: int, dim: int, topics: int = 256, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((topics, dim)).astype(np.float32)
+    vectors = centers[rng.integers(topics, size=size)] + 0.6 * rng.standard_normal((size, dim)).astype(np.float32)
+    # leading dims matter most, like Matryoshka-trained embeddings
+    vectors *= (1.0 / np.sqrt(1 + np.arange(dim) / 64)).astype(np.float32)
+    return vectors
+
+
+def evaluate(store: LocalVectorStore, queries: np.ndarray, truth: list[set], k: int) -> tuple[float, float]:
+    """recall@k against the truth and p50 latency in ms"""
+    recalls, latencies = [], []
+    for query, relevant in zip(queries, truth):
+        start = time.perf_counter()
+        rows = [row for row, _ in store.search_vector(query, k=k)]
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len(relevant & set(rows)) / k)
+    return statistics.mean(recalls), statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", default=None, help="saved LocalVectorStore to take the vectors from")
+    parser.add_argument("--size", type=int, default=20000, help="number of synthetic vectors")
+    parser.add_argument("--dim", type=int, default=1536, help="dimension of the synthetic vectors")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--code-dims", type=int, nargs="+", default=None, help="defaults to dim, dim/2, dim/4, dim/8")
+    parser.add_argument("--rescore", type=int, nargs="+", default=[0, 4, 10], help="candidates per result rescored")
+    args = parser.parse_args()
+
+    if args.store:
+        source = LocalVectorStore.load(args.store, None)
+        vectors, metric = np.asarray(source.vectors), source.metric
+    else:
+        vectors, metric = synthetic_vectors(args.size, args.dim), "cosine"
+    n, dim = vectors.shape
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(n, size=min(args.queries, n), replace=False)]
+    queries = queries + 0.5 * queries.std() * rng.standard_normal(queries.shape).astype(np.float32)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = LocalVectorStore(DeterministicFakeEmbedding(size=dim), metric=metric)
+        store.add_vectors(vectors, [""] * n, ids=[str(i) for i in range(n)])
+        store.save(directory)
+        store = LocalVectorStore.load(directory, store.embeddings)
+        truth = [{row for row, _ in store.search_vector(query, k=args.k)} for query in queries]
+        recall, p50 = evaluate(store, queries, truth, args.k)
+        print(f"{n} vectors of {dim} dims ({metric}), {len(queries)} queries, recall@{args.k} against exact float32 search")
+        print(f"  {'encoding':<8} {'dim':>5} {'rescore':>7} {'bytes/vector':>12} {'recall':>7} {'p50 ms':>7}")
+        print(f"  {'float32':<8} {dim:5d} {'-':>7} {store.bytes_per_vector:12.0f} {recall:7.3f} {p50:7.2f}")
+
+        for encoding in ["float16", "int8", "binary"]:
+            for code_dim in args.code_dims or [dim, dim // 2, dim // 4, dim // 8]:
+                for rescore in args.rescore:
+                    store.quantize(encoding, dim=code_dim, rescore=rescore)
+                    recall, p50 = evaluate(store, queries, truth, args.k)
+                    print(f"  {encoding:<8} {code_dim:5d} {rescore:7d} {store.bytes_per_vector:12.1f} {recall:7.3f} {p50:7.2f}")
+
+
+if __name__ == "__main__":
+    main()
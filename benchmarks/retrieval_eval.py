@@ -0,0 +1,143 @@
+"""
+Offline relevance and latency of the retrieval modes: vector only, BM25 only and hybrid (RRF).
+
+The corpus is a generated course catalog in the course_documents format. Queries name a course by code
+("prerequisites for MAC 2311"), by the words of its title, or by synonyms of them, and the relevant document
+is that course. Embeddings come from a stand-in for a dense model that knows the synonyms but blurs exact
+tokens like course numbers. The rerank and multiquery modes need Cohere / an LLM and are not
+measured here; each adds at least one network round trip on top of the vector mode.
+
+    python -m benchmarks.retrieval_eval --courses 3000
+"""
+import re
+import time
+import random
+import hashlib
+import argparse
+import statistics
+from langchain_core.embeddings import Embeddings
+from src.vectorstore import LocalVectorStore
+from src.hybrid import BM25Index, HybridRetriever
+
+SUBJECTS = {
+    "MAC": ["calculus", "analytic", "geometry", "precalculus", "algebra", "trigonometry"],
+    "MAS": ["linear", "algebra", "matrix", "theory", "abstract", "number"],
+    "STA": ["statistics", "probability", "inference", "regression", "sampling", "bayesian"],
+    "COP": ["programming", "fundamentals", "software", "systems", "data", "structures"],
+    "CDA": ["computer", "organization", "architecture", "digital", "logic", "design"],
+    "PHY": ["physics", "mechanics", "electricity", "magnetism", "quantum", "thermal"],
+    "CHM": ["chemistry", "organic", "general", "laboratory", "biochemistry", "analytical"],
+    "BSC": ["biology", "cell", "genetics", "ecology", "evolution", "molecular"],
+    "ECO": ["economics", "microeconomics", "macroeconomics", "markets", "policy", "trade"],
+    "ENC": ["writing", "composition", "rhetoric", "technical", "argument", "research"],
+}
+# topic -> the word a student might use instead, which a dense model maps to the same meaning
+TOPICS = {
+    "networks": "internet", "optimization": "minimization", "signals": "waveforms", "materials": "substances",
+    "security": "cybersecurity", "graphics": "rendering", "ethics": "morality", "history": "past", "society": "communities",
+    "health": "wellness", "energy": "power", "climate": "weather", "finance": "money", "language": "linguistics",
+    "culture": "traditions", "media": "journalism", "robotics": "robots", "vision": "perception", "learning": "training",
+    "databases": "sql", "compilers": "translators", "algorithms": "procedures", "modeling": "models",
+    "simulation": "emulation", "experiments": "trials", "instrumentation": "instruments", "proteins": "enzymes",
+    "populations": "demographics", "oceans": "seas", "soils": "dirt", "plants": "botany", "animals": "wildlife",
+    "law": "legal", "design": "engineering", "visualization": "charts", "imaging": "scans", "sensors": "detectors"
+}
+SYNONYMS = {synonym: topic for topic, synonym in TOPICS.items()}
+FILLER = ["students", "study", "topics", "include", "methods", "applications", "introduction", "advanced",
+          "principles", "analysis", "course", "covers", "emphasis", "practice", "concepts", "modern"]
+
+
+def bucket(feature: str, size: int) -> int:
+    return int(hashlib.md5(feature.encode()).hexdigest()[:8], 16) % size
+
+
+class ConceptEmbedding(Embeddings):
+    """
+    Stand-in for a dense model: hashed words with synonyms folded together (meaning), plus weaker
+    hashed character trigrams (surface form), so "MAC 2311" and "MAC 2312" embed almost alike
+    """
+    def __init__(self, size: int = 512) -> None:
+        self.size = size
+
+    def embed_query(self, text: str) -> list[float]:
+        vector = [0.0] * self.size
+        text = text.lower()
+        for word in re.findall(r"[a-z]+", text):
+            vector[bucket(SYNONYMS.get(word, word), self.size)] += 1.0
+        padded = f"  {text}  "
+        for i in range(len(padded) - 2):
+            vector[bucket(padded[i:i + 3], self.size)] += 0.1
+        return vector
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+def make_catalog(n_courses: int, seed: int = 0) -> tuple[list[str], list[dict], list[tuple[str, str, int]]]:
+    """Course documents, their metadata and (query type, query, relevant document) triples"""
+    rng = random.Random(seed)
+    texts, metadatas, queries = [], [], []
+    subjects = list(SUBJECTS)
+    numbers = rng.sample(range(1000, 5000), n_courses)
+    for i in range(n_courses):
+        prefix = subjects[i % len(subjects)]
+        code = f"{prefix} {numbers[i]}"
+        topics = rng.sample(list(TOPICS), 2)
+        name = " ".join([rng.choice(SUBJECTS[prefix])] + topics).title()
+        description = " ".join(rng.sample(FILLER, 8) + topics + rng.sample(SUBJECTS[prefix], 2))
+        prerequisites = [metadatas[j]["code"] for j in rng.sample(range(i), min(i, 2))] if i > len(subjects) else []
+        text = f"{code} {name} (3 credits): {description}."
+        if prerequisites:
+            text += f" Prerequisites: {', '.join(prerequisites)}."
+        texts.append(text)
+        metadatas.append({"kind": "course", "code": code, "name": name})
+    for i in rng.sample(range(n_courses), min(200, n_courses)):
+        code, name = metadatas[i]["code"], metadatas[i]["name"]
+        queries.append(("code", rng.choice([f"prerequisites for {code}", f"what is {code.replace(' ', '')}", f"{code} credits"]), i))
+        words = name.lower().split()
+        queries.append(("title", f"which course covers {words[2]} and {words[1]} in {words[0]}", i))
+        queries.append(("synonym", f"a {words[0]} class about {TOPICS[words[1]]} and {TOPICS[words[2]]}", i))
+    return texts, metadatas, queries
+
+
+def evaluate(name: str, retrieve, queries: list[tuple[str, str, int]], texts: list[str], top_n: int) -> None:
+    """Print recall@top_n per query type, MRR@10 and latency of a retrieval function returning documents"""
+    rows = {text: i for i, text in enumerate(texts)}
+    hits, reciprocal_ranks, latencies = {}, [], []
+    for query_type, query, relevant in queries:
+        start = time.perf_counter()
+        documents = retrieve(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        ranking = [rows[document.page_content] for document in documents[:10]]
+        hits.setdefault(query_type, []).append(relevant in ranking[:top_n])
+        reciprocal_ranks.append(1 / (ranking.index(relevant) + 1) if relevant in ranking else 0.0)
+    latencies.sort()
+    recalls = "  ".join(f"{query_type} {statistics.mean(found):.3f}" for query_type, found in hits.items())
+    overall = statistics.mean(found for type_hits in hits.values() for found in type_hits)
+    print(f"{name:<8} recall@{top_n} {overall:.3f} ({recalls})   MRR@10 {statistics.mean(reciprocal_ranks):.3f}   "
+          f"p50 {latencies[len(latencies) // 2]:.2f} ms   p95 {latencies[int(len(latencies) * 0.95)]:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=3000, help="size of the generated catalog")
+    parser.add_argument("--top-k", type=int, default=10, help="candidates taken from each retriever")
+    parser.add_argument("--top-n", type=int, default=3, help="documents passed to the LLM")
+    args = parser.parse_args()
+
+    texts, metadatas, queries = make_catalog(args.courses)
+    start = time.perf_counter()
+    store = LocalVectorStore.from_texts(texts, ConceptEmbedding(), metadatas=metadatas)
+    embedded = time.perf_counter()
+    bm25 = BM25Index.from_texts(texts, metadatas)
+    print(f"{len(texts)} courses, {len(queries)} queries; vector index {embedded - start:.1f}s, "
+          f"BM25 index {time.perf_counter() - embedded:.2f}s ({len(bm25.postings)} terms)")
+
+    hybrid = HybridRetriever(vectorstore=store, bm25=bm25, top_k=args.top_k, top_n=args.top_k)
+    evaluate("vector", lambda query: store.similarity_search(query, k=args.top_k), queries, texts, args.top_n)
+    evaluate("bm25", lambda query: bm25.get_documents(query, k=args.top_k), queries, texts, args.top_n)
+    evaluate("hybrid", hybrid.invoke, queries, texts, args.top_n)
+
+
+if __name__ == "__main__":
+    main()
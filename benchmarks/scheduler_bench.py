@@ -0,0 +1,68 @@
+"""
+Solve time of the bitset ScheduleSolver for 6-8 courses with several section options each.
+
+Section options are generated the same way data/get_courses.py does (MWF for 1-3 credits,
+T + double R for 4 credits), with a fixed seed.
+
+    python -m benchmarks.scheduler_bench --options 6 --repeat 50
+"""
+import time
+import random
+import argparse
+import statistics
+from src.scheduler import ScheduleSolver
+
+
+def make_courses(n_courses: int, n_options: int, seed: int) -> list[dict]:
+    """Random courses with section options in the courses.json format"""
+    rng = random.Random(seed)
+    courses = []
+    for i in range(n_courses):
+        credits = rng.choice([3, 3, 3, 4])
+        if credits == 4:
+            options = []
+            for _ in range(n_options):
+                period_r = rng.randint(1, 10)
+                options.append({"T": rng.randint(1, 11), "R": [period_r, period_r + 1]})
+        else:
+            options = [{"MWF": rng.randint(1, 11)} for _ in range(n_options)]
+        courses.append({"code": f"ABC {1000 + i}", "credits": str(credits), "schedules": options})
+    return courses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--options", type=int, default=6, help="section options per course")
+    parser.add_argument("--repeat", type=int, default=50, help="random course sets per measurement")
+    parser.add_argument("--top-n", type=int, default=5, help="schedules to return")
+    args = parser.parse_args()
+
+    solver = ScheduleSolver()
+    scenarios = [
+        ("6 courses", 6, {}),
+        ("8 courses", 8, {}),
+        ("8 courses, from period 3", 8, {"earliest_period": "3"}),
+        ("8 courses, no evening", 8, {"no_evening": True}),
+        ("8 courses, 12-15 credits", 8, {"min_credits": 12, "max_credits": 15}),
+    ]
+    for name, n_courses, constraints in scenarios:
+        times, found = [], []
+        for seed in range(args.repeat):
+            courses = make_courses(n_courses, args.options, seed)
+            start = time.perf_counter()
+            schedules = solver.solve(courses, top_n=args.top_n, **constraints)
+            times.append((time.perf_counter() - start) * 1000)
+            found.append(len(schedules))
+        p95 = statistics.quantiles(times, n=20)[-1]
+        print(f"{name:<28} p50 {statistics.median(times):7.2f} ms   p95 {p95:7.2f} ms   "
+              f"solvable {sum(n > 0 for n in found)}/{args.repeat}")
+
+    courses = make_courses(6, args.options, 0)
+    schedules = solver.solve(courses, top_n=1)
+    if schedules:
+        print()
+        print(solver.timetable(schedules[0]))
+
+
+if __name__ == "__main__":
+    main()
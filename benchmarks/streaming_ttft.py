@@ -0,0 +1,112 @@
+"""
+Time to first token of the streaming endpoint against waiting for the whole answer, end to end over HTTP.
+
+Serves create_app on a local port with a LocalVectorStore of data/programs.json (fake embeddings) and a
+fake chat model with a fixed time to first token and time per token. Also checks that a client
+disconnecting mid-answer cancels the generation.
+
+    python -m benchmarks.streaming_ttft --requests 20 --first-token-ms 300
+"""
+import json
+import time
+import socket
+import argparse
+import threading
+import statistics
+import httpx
+import uvicorn
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from src.chain import get_chain
+from src.server import create_app
+from src.vectorstore import LocalVectorStore
+from benchmarks.fakes import FakeChatModel
+from benchmarks.vectorstore_latency import load_corpus
+
+
+class CountingChatModel(FakeChatModel):
+    """FakeChatModel counting the tokens it generated, to see a cancelled answer stop"""
+    generated: int = 0
+
+    async def _astream(self, *args, **kwargs):
+        async for chunk in super()._astream(*args, **kwargs):
+            self.generated += 1
+            yield chunk
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def read_stream(client: httpx.Client, url: str, question: str, stop_after_tokens: int = None) -> dict:
+    """Client-side timings of one streamed answer: sources, first token and done"""
+    start = time.perf_counter()
+    timings, tokens, event = {}, [], None
+    with client.stream("GET", url, params={"question": question}) as response:
+        for line in response.iter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                now = (time.perf_counter() - start) * 1000
+                timings.setdefault(event, now)
+                if event == "token":
+                    tokens.append(json.loads(line[len("data: "):]))
+                    if stop_after_tokens is not None and len(tokens) >= stop_after_tokens:
+                        break
+    timings["answer"] = "".join(tokens)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--first-token-ms", type=float, default=300.0, help="fake model time to first token")
+    parser.add_argument("--token-ms", type=float, default=15.0, help="fake model time per token")
+    args = parser.parse_args()
+
+    texts, metadatas = load_corpus(339)
+    store = LocalVectorStore.from_texts(texts, DeterministicFakeEmbedding(size=256), metadatas=metadatas)
+    model = CountingChatModel(first_token_ms=args.first_token_ms, token_ms=args.token_ms)
+    app = create_app(get_chain(model, store, top_k=4))
+    port = free_port()
+    server = serve(app, port)
+    base_url = f"http://127.0.0.1:{port}"
+
+    with httpx.Client(timeout=30) as client:
+        blocking, streamed = [], []
+        for i in range(args.requests):
+            start = time.perf_counter()
+            answer = client.post(f"{base_url}/chat", json={"question": f"prerequisites of COP 3503C ({i})"}).json()["answer"]
+            blocking.append((time.perf_counter() - start) * 1000)
+            timings = read_stream(client, f"{base_url}/chat/stream", f"prerequisites of COP 3503C ({i})")
+            assert timings["answer"] == answer
+            streamed.append(timings)
+
+        # disconnect after a few tokens: the server should stop generating
+        generated = model.generated
+        read_stream(client, f"{base_url}/chat/stream", "prerequisites of COP 3503C", stop_after_tokens=3)
+        time.sleep(0.5)
+        cancelled_tokens = model.generated - generated
+        stats = client.get(f"{base_url}/stats").json()
+
+    server.should_exit = True
+    p50 = lambda values: statistics.median(values)
+    print(f"blocking /chat       full answer  p50 {p50(blocking):7.1f} ms")
+    print(f"streaming /chat/stream  sources  p50 {p50([t['sources'] for t in streamed]):7.1f} ms")
+    print(f"                     first token p50 {p50([t['token'] for t in streamed]):7.1f} ms")
+    print(f"                     done        p50 {p50([t['done'] for t in streamed]):7.1f} ms")
+    print(f"disconnect after 3 tokens: {cancelled_tokens} of {len(model._tokens())} tokens generated")
+    print(f"server stats: {stats}")
+
+
+if __name__ == "__main__":
+    main()
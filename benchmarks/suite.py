@@ -0,0 +1,192 @@
+"""
+Offline benchmark suite for the hot paths, with a stored baseline to catch regressions.
+
+Runs without network access: parsing uses stuff/catalog_tables.html (plus recorded pages from an HTTP
+cache with --cache) and generated course pages, the embedding pipeline a fake OpenAI client and a fake
+tokenizer, retrieval a LocalVectorStore over data/programs.json, and the chain a fake chat model and a
+fake reranker. Every group is timed, then run again under tracemalloc for its peak memory.
+
+Results are written as JSON (--out). With a baseline (--baseline, default benchmarks/baseline.json) every
+metric is compared against it and the run fails when one is worse by more than --tolerance.
+
+    python -m benchmarks.suite                          # run and compare
+    python -m benchmarks.suite --only parse chain       # some groups
+    python -m benchmarks.suite --save-baseline          # store this run as the new baseline
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "data"))
+from get_degrees import extract_program_sections                      # noqa: E402
+from get_courses import parse_major_courses                           # noqa: E402
+from src.chain import get_chain                                        # noqa: E402
+from src.embedder import Embedder                                      # noqa: E402
+from src.instrumentation import LatencyTracker                         # noqa: E402
+from src.vectorstore import LocalVectorStore                           # noqa: E402
+from benchmarks.fakes import FakeChatModel, FakeEncoding, FakeOpenAI, FakeReranker   # noqa: E402
+from benchmarks.http_cache_refresh import make_site                    # noqa: E402
+from benchmarks.parse_throughput import program_pages, throughput      # noqa: E402
+from benchmarks.vectorstore_latency import load_corpus                 # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+# outermost retriever of each get_chain mode, whose stage time is the retrieval latency
+CHAIN_MODES = {
+    "plain": ({}, "retriever:VectorStoreRetriever"),
+    "multiquery": ({"multiquery": True}, "retriever:MultiQueryRetriever"),
+    "rerank": ({"rerank": True}, "retriever:ContextualCompressionRetriever"),
+    "hybrid": ({"hybrid": True}, "retriever:HybridRetriever"),
+}
+
+
+def percentile(values: list[float], q: float) -> float:
+    return float(np.percentile(values, q * 100))
+
+
+def bench_parse(args) -> dict:
+    programs = program_pages(chrome_kb=80, cache_path=args.cache)
+    majors = [page.decode() for path, page in make_site(5, 40).items() if path != "/UGRD/courses/"]
+    return {
+        "program_pages_per_s": throughput(extract_program_sections, programs, args.seconds),
+        "major_pages_per_s": throughput(parse_major_courses, majors, args.seconds),
+    }
+
+
+def bench_embedding(args) -> dict:
+    texts, _ = load_corpus(args.documents)
+    texts = [f"{i} {text[:2000]}" for i, text in enumerate(texts)]
+    # FakeEncoding stands in for the tiktoken encoding chunk_texts would otherwise download
+    embedder = Embedder(FakeOpenAI(), dim=args.dim, encoding=FakeEncoding())
+    start = time.perf_counter()
+    vectors = embedder.embed_bulk(texts, max_items=256)
+    bulk_seconds = time.perf_counter() - start
+    start, n = time.perf_counter(), 0
+    while time.perf_counter() - start < args.seconds:
+        embedder.normalize_l2(vectors)
+        n += 1
+    return {
+        "embed_bulk_texts_per_s": len(texts) / bulk_seconds,
+        "normalize_l2_rows_per_s": n * len(vectors) / (time.perf_counter() - start),
+    }
+
+
+def build_store(args) -> LocalVectorStore:
+    texts, metadatas = load_corpus(args.documents)
+    return LocalVectorStore.from_texts(texts, DeterministicFakeEmbedding(size=args.dim), metadatas=metadatas)
+
+
+def bench_chain(args) -> dict:
+    store = build_store(args)
+    questions = [f"What are the requirements of the {name} program?" for name in
+                 ["Physics", "Computer Science", "Mathematics", "Economics", "Chemistry", "Biology", "History", "English"]]
+    results = {}
+    for mode, (kwargs, retriever_stage) in CHAIN_MODES.items():
+        model = FakeChatModel(first_token_ms=args.llm_ms, token_ms=0)
+        chain = get_chain(model, store, top_k=10, top_n=3, reranker=FakeReranker(top_n=3, request_ms=args.rerank_ms), **kwargs)
+        chain.invoke(questions[0])      # warm up
+        # the tracker only times the stages, the totals are measured without it
+        tracker = LatencyTracker()
+        for question in questions * 4:
+            chain.invoke(question, config={"callbacks": [tracker]})
+        totals, start = [], time.perf_counter()
+        while time.perf_counter() - start < args.seconds or len(totals) < 5:
+            question_start = time.perf_counter()
+            chain.invoke(questions[len(totals) % len(questions)])
+            totals.append((time.perf_counter() - question_start) * 1000)
+        retrieval = tracker.latency[retriever_stage]
+        results[f"{mode}_retrieval_ms"] = 1000 * retrieval.sum / retrieval.count
+        results[f"{mode}_chain_p50_ms"] = percentile(totals, 0.5)
+        results[f"{mode}_chain_p95_ms"] = percentile(totals, 0.95)
+    return results
+
+
+BENCHMARKS = {"parse": bench_parse, "embedding": bench_embedding, "chain": bench_chain}
+
+
+def run_group(name: str, args) -> dict:
+    """Timings of a group, then its peak traced memory from a shorter second run"""
+    metrics = BENCHMARKS[name](args)
+    seconds, args.seconds = args.seconds, min(args.seconds, 0.2)
+    tracemalloc.start()
+    try:
+        BENCHMARKS[name](args)
+        metrics["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+        args.seconds = seconds
+    return metrics
+
+
+def higher_is_better(metric: str) -> bool:
+    return metric.endswith("_per_s")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Print every metric against the baseline; returns the regressed ones"""
+    regressions = []
+    for group, metrics in results["groups"].items():
+        for metric, value in metrics.items():
+            old = baseline.get("groups", {}).get(group, {}).get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or old == 0:
+                continue
+            change = (value - old) / old
+            worse = -change if higher_is_better(metric) else change
+            flag = "REGRESSION" if worse > tolerance else ("improved" if worse < -tolerance else "")
+            print(f"  {group + '.' + metric:<40} {old:12.3f} -> {value:12.3f}  {100 * change:+7.1f}%  {flag}")
+            if worse > tolerance:
+                regressions.append(f"{group}.{metric}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="groups to run, defaults to all")
+    parser.add_argument("--seconds", type=float, default=1.0, help="time per measurement")
+    parser.add_argument("--documents", type=int, default=2000, help="documents in the vector store / embedded")
+    parser.add_argument("--dim", type=int, default=512, help="embedding dimension")
+    parser.add_argument("--llm-ms", type=float, default=0.0, help="fake chat model time to first token")
+    parser.add_argument("--rerank-ms", type=float, default=0.0, help="fake reranker time per request")
+    parser.add_argument("--cache", default=None, help="HTTP cache with recorded catalog pages to parse too")
+    parser.add_argument("--out", default="benchmark_results.json", help="where to write the results")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="relative change counted as a regression")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results to --baseline as well")
+    args = parser.parse_args()
+
+    results = {
+        "meta": {"python": platform.python_version(), "machine": platform.machine(), "processor": platform.processor(),
+                 "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "seconds": args.seconds, "documents": args.documents, "dim": args.dim},
+        "groups": {}
+    }
+    for name in args.only or BENCHMARKS:
+        start = time.perf_counter()
+        results["groups"][name] = run_group(name, args)
+        print(f"{name} ({time.perf_counter() - start:.1f}s): {json.dumps(results['groups'][name])}")
+
+    with open(args.out, "w") as file:
+        json.dump(results, file, indent=2)
+    print("Results saved to", args.out)
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=2)
+        print("Baseline saved to", args.baseline)
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+        print(f"Against {args.baseline} ({baseline['meta']['time']}, tolerance {100 * args.tolerance:.0f}%):")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Compare retrieval latency of the in-process LocalVectorStore against the Pinecone path.
+
+Runs offline: documents come from data/programs.json, embeddings from a deterministic fake,
+and Pinecone is replaced by a local stand-in that adds a simulated network round trip.
+
+    python -m benchmarks.vectorstore_latency --size 5000 --rtt-ms 40
+"""
+import os
+import json
+import time
+import argparse
+import statistics
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from src.vectorstore import LocalVectorStore
+
+
+class PineconeStandIn(LocalVectorStore):
+    """Exact local search plus a simulated network round trip and JSON response, like a hosted index"""
+    def __init__(self, *args, rtt_ms: float = 40.0, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.rtt_ms: float = rtt_ms
+
+    def similarity_search_by_vector_with_score(self, embedding, k=4, filter=None, **kwargs):
+        time.sleep(self.rtt_ms / 1000)
+        results = super().similarity_search_by_vector_with_score(embedding, k=k, filter=filter, **kwargs)
+        # the hosted index sends matches (with metadata) back as JSON
+        payload = json.dumps([{"metadata": doc.metadata, "text": doc.page_content, "score": score} for doc, score in results])
+        json.loads(payload)
+        return results
+
+
+def load_corpus(size: int) -> tuple[list[str], list[dict]]:
+    """Program documents from programs.json, repeated with a suffix until there are `size` of them"""
+    path = os.path.join(os.path.dirname(__file__), "..", "data", "programs.json")
+    with open(path, "r", encoding="utf-8") as file:
+        programs = json.load(file)
+    texts, metadatas = [], []
+    while len(texts) < size:
+        copy = len(texts) // len(programs)
+        for program, details in programs.items():
+            if len(texts) == size:
+                break
+            texts.append(f"{program} {copy} " + json.dumps(details, ensure_ascii=False))
+            metadatas.append({"program": program, "type": details["type"]})
+    return texts, metadatas
+
+
+def time_queries(store, queries: list[list[float]], k: int, **kwargs) -> list[float]:
+    """Latency in ms of each query"""
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        store.similarity_search_by_vector_with_score(query, k=k, **kwargs)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarize(name: str, latencies: list[float]) -> None:
+    p50 = statistics.median(latencies)
+    p95 = statistics.quantiles(latencies, n=20)[-1]
+    print(f"{name:<28} p50 {p50:8.3f} ms   p95 {p95:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=5000, help="number of documents")
+    parser.add_argument("--dim", type=int, default=1536, help="embedding dimension")
+    parser.add_argument("--queries", type=int, default=200, help="number of queries")
+    parser.add_argument("--k", type=int, default=10, help="top k")
+    parser.add_argument("--rtt-ms", type=float, default=40.0, help="simulated Pinecone round trip")
+    args = parser.parse_args()
+
+    texts, metadatas = load_corpus(args.size)
+    embedding = DeterministicFakeEmbedding(size=args.dim)
+    vectors = embedding.embed_documents(texts)
+    rng = np.random.default_rng(0)
+    queries = [vectors[i] + rng.normal(0, 0.1, args.dim) for i in rng.choice(len(vectors), args.queries)]
+
+    local = LocalVectorStore(embedding)
+    local.add_vectors(vectors, texts, metadatas=metadatas)
+    remote = PineconeStandIn(embedding, rtt_ms=args.rtt_ms)
+    remote.add_vectors(vectors, texts, metadatas=metadatas)
+
+    print(f"{args.size} documents, dim {args.dim}, k {args.k}, {args.queries} queries")
+    summarize(f"pinecone stand-in ({args.rtt_ms:g} ms rtt)", time_queries(remote, queries[:20], args.k))
+    summarize("local exact", time_queries(local, queries, args.k))
+    summarize("local exact + filter", time_queries(local, queries, args.k, filter={"type": "minor"}))
+
+    exact = [{row for row, _ in local.search_vector(q, k=args.k)} for q in queries]
+    local.build_ivf()
+    approx = [{row for row, _ in local.search_vector(q, k=args.k)} for q in queries]
+    recall = np.mean([len(e & a) / len(e) for e, a in zip(exact, approx)])
+    summarize(f"local ivf (n_probe {local.n_probe})", time_queries(local, queries, args.k))
+    print(f"ivf recall@{args.k}: {recall:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import re
+import json
+import sqlite3
+
+# bumped when the tables change in a way CREATE TABLE IF NOT EXISTS can't pick up
+SCHEMA_VERSION = 2
+
+
+def normalize_code(code):
+    """Stable key of a course code: "COP\xa03503C", "COP 3503C" and "cop3503c" all map to "COP3503C" """
+    return "".join(code.split()).upper()
+
+
+def subject_prefix(code):
+    """Subject prefix of a course code, e.g. "COP" for "COP 3503C" """
+    match = re.match(r"[A-Za-z]+", normalize_code(code))
+    return match.group(0) if match else ""
+
+
+class CatalogStore():
+    """
+    SQLite store of the scraped catalog with indexes for point lookups and listings
+
+    Courses are indexed by code, subject prefix and major, programs by name and type, and course
+    names/descriptions are full-text searchable (FTS5). Queries only read the rows they return,
+    so lookup time doesn't grow with the size of the catalog. A course listed under several majors
+    has one row per major.
+    """
+    def __init__(self, path="catalog.sqlite"):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            # stores written before courses were keyed by (code, major): the course tables are rebuilt by the next crawl
+            self.conn.executescript("DROP TABLE IF EXISTS courses_fts; DROP TABLE IF EXISTS courses;")
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS courses (
+                id INTEGER PRIMARY KEY,
+                code_key TEXT NOT NULL,
+                code TEXT NOT NULL,
+                prefix TEXT NOT NULL,
+                major TEXT NOT NULL,
+                name TEXT NOT NULL,
+                credits TEXT,
+                description TEXT,
+                prerequisites TEXT,
+                grading_scheme TEXT,
+                schedules TEXT,
+                UNIQUE (code_key, major)
+            );
+            CREATE INDEX IF NOT EXISTS idx_courses_prefix ON courses (prefix);
+            CREATE INDEX IF NOT EXISTS idx_courses_major ON courses (major);
+
+            CREATE TABLE IF NOT EXISTS majors (
+                major TEXT PRIMARY KEY,
+                url TEXT NOT NULL
+            );
+
+            CREATE TABLE IF NOT EXISTS programs (
+                key TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                type TEXT NOT NULL,
+                url TEXT NOT NULL,
+                sections TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_programs_name ON programs (name);
+            CREATE INDEX IF NOT EXISTS idx_programs_type ON programs (type);
+            """
+        )
+        try:
+            # external content: the index reads the text from courses and is kept in sync by rowid, so
+            # replacing a major's courses touches only their index entries
+            self.conn.executescript(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS courses_fts USING fts5(
+                    code, name, description, content='courses', content_rowid='id'
+                );
+                CREATE TRIGGER IF NOT EXISTS courses_fts_insert AFTER INSERT ON courses BEGIN
+                    INSERT INTO courses_fts (rowid, code, name, description)
+                    VALUES (new.id, new.code, new.name, new.description);
+                END;
+                CREATE TRIGGER IF NOT EXISTS courses_fts_delete AFTER DELETE ON courses BEGIN
+                    INSERT INTO courses_fts (courses_fts, rowid, code, name, description)
+                    VALUES ('delete', old.id, old.code, old.name, old.description);
+                END;
+                CREATE TRIGGER IF NOT EXISTS courses_fts_update AFTER UPDATE ON courses BEGIN
+                    INSERT INTO courses_fts (courses_fts, rowid, code, name, description)
+                    VALUES ('delete', old.id, old.code, old.name, old.description);
+                    INSERT INTO courses_fts (rowid, code, name, description)
+                    VALUES (new.id, new.code, new.name, new.description);
+                END;
+                """
+            )
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            # sqlite built without FTS5, search_courses falls back to LIKE
+            self.has_fts = False
+        self.conn.commit()
+
+
+    def __str__(self):
+        return f"CatalogStore(path={self.path})"
+
+
+    def __repr__(self):
+        return self.__str__()
+
+
+    def close(self):
+        self.conn.close()
+
+
+    def add_major_courses(self, major, url, courses):
+        """Store (or replace) the courses scraped for one major, committing right away"""
+        rows = {}
+        for course in courses:
+            code = course["code"].replace("\xa0", " ")
+            # a course listed twice on a page keeps its last listing
+            rows[normalize_code(code)] = (
+                normalize_code(code), code, subject_prefix(code), major, course["name"], course["credits"],
+                course["description"], json.dumps(course["prerequisites"], ensure_ascii=False),
+                course["grading_scheme"], json.dumps(course.get("schedules", []))
+            )
+        with self.conn:
+            # drop what an earlier scrape stored for this major, so removed courses disappear too; the
+            # triggers update the full-text index by rowid, and other majors' rows of a course are kept
+            self.conn.execute("DELETE FROM courses WHERE major = ?", (major,))
+            self.conn.execute("INSERT OR REPLACE INTO majors VALUES (?, ?)", (major, url))
+            self.conn.executemany(
+                """INSERT INTO courses (code_key, code, prefix, major, name, credits, description,
+                   prerequisites, grading_scheme, schedules) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                list(rows.values())
+            )
+
+
+    def add_program(self, key, details):
+        """Store (or replace) one program, keyed by "Program (type)" like programs.json"""
+        name = key[:-len(f" ({details['type']})")] if key.endswith(f" ({details['type']})") else key
+        sections = {section: value for section, value in details.items() if section not in ("url", "type")}
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO programs VALUES (?, ?, ?, ?, ?)",
+                (key, name, details["type"], details["url"], json.dumps(sections, ensure_ascii=False))
+            )
+
+
+    def _course(self, row):
+        course = {key: row[key] for key in ("code", "name", "credits", "description", "grading_scheme", "major")}
+        course["prerequisites"] = json.loads(row["prerequisites"])
+        course["schedules"] = json.loads(row["schedules"])
+        return course
+
+
+    def course(self, code):
+        """Returns one course by code (any spacing), or None"""
+        row = self.conn.execute(
+            "SELECT * FROM courses WHERE code_key = ? ORDER BY major LIMIT 1", (normalize_code(code),)
+        ).fetchone()
+        return self._course(row) if row else None
+
+
+    def courses(self, prefix=None, major=None):
+        """
+        Yields courses ordered by code, optionally only those with a subject prefix or in a major
+        (without a major, a course listed under several majors is yielded once)
+        """
+        query, params = "SELECT * FROM courses", []
+        conditions = []
+        if prefix is not None:
+            conditions.append("prefix = ?")
+            params.append(prefix.upper())
+        if major is not None:
+            conditions.append("major = ?")
+            params.append(major)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        if major is None:
+            # one row per code: the one of the first major, like course()
+            query = query.replace("SELECT *", "SELECT *, min(major)", 1) + " GROUP BY code_key"
+        for row in self.conn.execute(query + " ORDER BY code_key", params):
+            yield self._course(row)
+
+
+    def search_courses(self, text, limit=10):
+        """Returns the courses whose code, name or description best match a full-text query"""
+        if self.has_fts:
+            # quote every term so user input can't be read as FTS syntax
+            terms = " ".join('"' + term.replace('"', '""') + '"' for term in text.split())
+            if not terms:
+                return []
+            # a course listed under several majors matches once per major: keep its best match
+            rows = self.conn.execute(
+                """SELECT courses.*, min(courses_fts.rank) AS score FROM courses_fts
+                   JOIN courses ON courses.id = courses_fts.rowid
+                   WHERE courses_fts MATCH ? GROUP BY courses.code_key ORDER BY score LIMIT ?""",
+                (terms, limit)
+            )
+        else:
+            pattern = f"%{text}%"
+            rows = self.conn.execute(
+                "SELECT * FROM courses WHERE name LIKE ? OR description LIKE ? GROUP BY code_key LIMIT ?",
+                (pattern, pattern, limit)
+            )
+        return [self._course(row) for row in rows]
+
+
+    def majors(self):
+        """Yields (major, url) of every scraped course category"""
+        for row in self.conn.execute("SELECT major, url FROM majors ORDER BY major"):
+            yield row["major"], row["url"]
+
+
+    def program(self, key):
+        """Returns one program's details in the programs.json format, or None"""
+        row = self.conn.execute("SELECT * FROM programs WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return {"url": row["url"], "type": row["type"], **json.loads(row["sections"])}
+
+
+    def programs(self, program_type=None, name=None):
+        """Yields {"key", "name", "type", "url"} listings without loading program sections"""
+        query, params = "SELECT key, name, type, url FROM programs", []
+        conditions = []
+        if program_type is not None:
+            conditions.append("type = ?")
+            params.append(program_type)
+        if name is not None:
+            conditions.append("name = ?")
+            params.append(name)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        for row in self.conn.execute(query + " ORDER BY key", params):
+            yield dict(row)
+
+
+def main():
+    import os
+    import argparse
+    parser = argparse.ArgumentParser(description="Build the catalog store from existing courses.json / programs.json")
+    parser.add_argument("--store", default="catalog.sqlite", help="catalog store to write")
+    parser.add_argument("--courses", default="courses.json", help="output of get_courses.py")
+    parser.add_argument("--programs", default="programs.json", help="output of get_degrees.py")
+    args = parser.parse_args()
+
+    store = CatalogStore(args.store)
+    if os.path.exists(args.courses):
+        with open(args.courses, "r", encoding="utf-8") as file:
+            for major, major_info in json.load(file).items():
+                store.add_major_courses(major, major_info["url"], major_info["courses"])
+    if os.path.exists(args.programs):
+        with open(args.programs, "r", encoding="utf-8") as file:
+            for program_key, details in json.load(file).items():
+                store.add_program(program_key, details)
+    store.close()
+    print("Results saved to", args.store)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import time
+import random
+import asyncio
+from email.utils import parsedate_to_datetime
+from urllib.parse import urldefrag, urlparse
+from concurrent.futures import ProcessPoolExecutor
+import httpx
+from tqdm import tqdm
+from http_cache import HttpCache
+
+# statuses worth retrying: throttled or a transient server error
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket():
+    """Allows `rate` requests per second on average, with bursts of up to `burst` requests"""
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def decode_body(headers, body):
+    """Decode a page with the charset from its Content-Type, defaulting to UTF-8"""
+    content_type = headers.get("Content-Type", "")
+    charset = "utf-8"
+    for part in content_type.split(";")[1:]:
+        key, _, value = part.strip().partition("=")
+        if key.lower() == "charset" and value:
+            charset = value.strip('"')
+    return body.decode(charset, errors="replace")
+
+
+def retry_after(response):
+    """Seconds asked for by a Retry-After header, or None"""
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class Crawler():
+    """
+    asyncio crawl engine: bounded concurrency, a token-bucket rate limit per host, retries with jittered
+    exponential backoff, and parsing in a process pool so BeautifulSoup never blocks the event loop
+    """
+    def __init__(
+            self,
+            concurrency=16,
+            rate=8.0,
+            burst=None,
+            max_retries=5,
+            base_delay=0.5,
+            parse_workers=None,
+            cache=None,
+            offline=False,
+            timeout=30.0
+        ):
+        """
+        Create a Crawler
+
+        Args:
+            concurrency: Maximum number of requests in flight (over all hosts)
+            rate: Requests per second allowed to each host
+            burst: Requests a host may receive at once before the rate applies, defaults to concurrency
+            max_retries: Retries of a request that failed with a network error, 429 or 5xx
+            base_delay: Backoff before the first retry in seconds, doubled (with full jitter) every retry
+            parse_workers: Processes used for parsing, defaults to the number of CPUs
+            cache: Optional HttpCache used for conditional requests (shared with the requests session)
+            offline: Serve every page from the cache, without network access
+            timeout: Timeout of a single request in seconds
+        """
+        if offline and cache is None:
+            raise ValueError("Offline mode requires a cache")
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst or concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.parse_workers = parse_workers
+        self.cache = cache
+        self.offline = offline
+        self.timeout = timeout
+        self.stats = {}
+
+
+    def __str__(self):
+        return f"Crawler(concurrency={self.concurrency}, rate={self.rate}/s per host, max_retries={self.max_retries})"
+
+
+    def __repr__(self):
+        return self.__str__()
+
+
+    async def fetch(self, client, url):
+        """Fetch a page as text, revalidating against the cache and retrying transient failures"""
+        url = urldefrag(url)[0]
+        cached = self.cache.get(url) if self.cache is not None else None
+        if self.offline:
+            if cached is None:
+                raise httpx.ConnectError(f"Offline mode: {url} is not in the cache at {self.cache.path}")
+            self.stats["offline"] += 1
+            return decode_body(*cached)
+
+        headers = {}
+        if cached is not None:
+            if "ETag" in cached[0]:
+                headers["If-None-Match"] = cached[0]["ETag"]
+            if "Last-Modified" in cached[0]:
+                headers["If-Modified-Since"] = cached[0]["Last-Modified"]
+
+        host = urlparse(url).netloc
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate, self.burst)
+
+        for attempt in range(self.max_retries + 1):
+            delay = None
+            async with self._semaphore:
+                await self._buckets[host].acquire()
+                try:
+                    response = await client.get(url, headers=headers)
+                except httpx.TransportError:
+                    if attempt == self.max_retries:
+                        raise
+                else:
+                    if response.status_code == 304 and cached is not None:
+                        self.cache.touch(url)
+                        self.stats["not_modified"] += 1
+                        return decode_body(*cached)
+                    if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                        # like requests.get, other error pages are handed to the parser, just never cached
+                        if response.status_code == 200 and self.cache is not None:
+                            self.cache.put(url, response.headers, response.content)
+                        elif response.status_code != 200:
+                            self.stats["errors"] += 1
+                        self.stats["downloaded"] += 1
+                        self.stats["bytes"] += len(response.content)
+                        return decode_body(response.headers, response.content)
+                    delay = retry_after(response)
+
+            # back off outside the semaphore so other requests keep going
+            self.stats["retries"] += 1
+            if delay is None:
+                delay = random.uniform(0, self.base_delay * 2 ** attempt)
+            await asyncio.sleep(delay)
+
+
+    async def _fetch_and_parse(self, client, pool, key, url, parse):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        html = await self.fetch(client, url)
+        fetched = time.perf_counter()
+        result = await loop.run_in_executor(pool, parse, html)
+        self.stats["fetch_seconds"] += fetched - start
+        self.stats["parse_seconds"] += time.perf_counter() - fetched
+        return key, result
+
+
+    async def _run(self, jobs, parse, on_result, desc):
+        # asyncio primitives are created inside the running loop
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._buckets = {}
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        results = {}
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as pool:
+            async with httpx.AsyncClient(limits=limits, timeout=self.timeout, follow_redirects=True) as client:
+                tasks = [asyncio.ensure_future(self._fetch_and_parse(client, pool, key, url, parse)) for key, url in jobs]
+                progress = tqdm(total=len(tasks), desc=desc)
+                try:
+                    for task in asyncio.as_completed(tasks):
+                        key, result = await task
+                        results[key] = result
+                        if on_result is not None:
+                            on_result(key, result)
+                        progress.update()
+                        progress.set_postfix(pages_per_s=f"{progress.n / (time.perf_counter() - self.stats['start']):.1f}")
+                finally:
+                    progress.close()
+                    for task in tasks:
+                        task.cancel()
+        return [results[key] for key, _ in jobs]
+
+
+    def run(self, jobs, parse, on_result=None, desc="Crawling"):
+        """
+        Fetch and parse a list of pages
+
+        Args:
+            jobs: List of (key, url) pairs
+            parse: Picklable function turning a page's HTML into a result, run in the process pool
+            on_result: Optional callback(key, result) called as each page completes, e.g. to stream results to disk
+            desc: Label of the progress bar
+
+        Returns the results in the order of jobs.
+        """
+        self.stats = {
+            "pages": len(jobs), "downloaded": 0, "errors": 0, "not_modified": 0, "offline": 0, "retries": 0, "bytes": 0,
+            "fetch_seconds": 0.0, "parse_seconds": 0.0, "start": time.perf_counter()
+        }
+        results = asyncio.run(self._run(jobs, parse, on_result, desc))
+        self.stats["seconds"] = time.perf_counter() - self.stats.pop("start")
+        return results
+
+
+    def report(self):
+        """Summary of the last run: throughput and time per phase"""
+        stats = self.stats
+        pages = max(stats["pages"], 1)
+        return (f"{stats['pages']} pages in {stats['seconds']:.1f}s ({stats['pages'] / max(stats['seconds'], 1e-9):.1f} pages/s); "
+                f"fetch {1000 * stats['fetch_seconds'] / pages:.0f} ms/page, parse {1000 * stats['parse_seconds'] / pages:.0f} ms/page; "
+                f"{stats['downloaded']} downloaded ({stats['bytes'] / 1e6:.1f} MB), {stats['not_modified']} not modified, "
+                f"{stats['offline']} served offline, {stats['retries']} retries, {stats['errors']} errors")
+
+
+def get_crawler(cache_path, offline=False, concurrency=16, rate=8.0, **kwargs):
+    """Returns a Crawler sharing the scrapers' HTTP cache"""
+    return Crawler(concurrency=concurrency, rate=rate, cache=HttpCache(cache_path), offline=offline, **kwargs)
@@ -0,0 +1,58 @@
+import re
+from bs4 import BeautifulSoup
+
+# lxml is several times faster than html.parser, which is only used if lxml is not installed
+try:
+    import lxml  # noqa: F401
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
+
+CLASS_ATTR = re.compile(r"""\bclass\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+
+
+def slice_elements(html, tag, class_names):
+    """
+    Returns the outer HTML of every <tag> element whose class contains one of class_names, in document order
+
+    Works on the raw text so the rest of the page (navigation, scripts, ...) is never parsed.
+    Nested <tag> elements are balanced. A matching element is never nested in another one: if one opens
+    before the previous one is closed (e.g. a missing </table>), the previous one ends there.
+    """
+    any_tag = re.compile(rf"<(/?){tag}\b[^>]*>", re.IGNORECASE)
+    class_names = set(class_names)
+
+    def matches(tag_match):
+        if tag_match.group(1):
+            return False
+        class_attr = CLASS_ATTR.search(tag_match.group(0))
+        if class_attr is None:
+            return False
+        return bool(set(next(group for group in class_attr.groups() if group is not None).split()) & class_names)
+
+    slices = []
+    start, depth = None, 0
+    for tag_match in any_tag.finditer(html):
+        if matches(tag_match):
+            if start is not None:
+                # close what was left open so the slices parse as siblings
+                slices.append(html[start:tag_match.start()] + f"</{tag}>" * depth)
+            start, depth = tag_match.start(), 1
+        elif start is not None:
+            depth += -1 if tag_match.group(1) else 1
+            if depth == 0:
+                slices.append(html[start:tag_match.end()])
+                start = None
+    if start is not None:
+        slices.append(html[start:] + f"</{tag}>" * depth)
+    return slices
+
+
+def parse_elements(html, tag, class_names, parser=PARSER):
+    """Parses only the matching <tag> elements of a page and returns them as BeautifulSoup tags"""
+    soup = BeautifulSoup("".join(slice_elements(html, tag, class_names)), parser)
+    class_names = set(class_names)
+    return [
+        element for element in soup.find_all(tag)
+        if set(element.get("class", [])) & class_names and not element.find_parent(tag, class_=list(class_names))
+    ]
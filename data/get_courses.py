@@ -1,9 +1,13 @@
+import os
 import json
 import random
+import argparse
 import requests
-from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from tqdm import tqdm
+from bs4 import BeautifulSoup, SoupStrainer
+from http_cache import get_session
+from crawler import get_crawler
+from fast_parse import PARSER, parse_elements
+from catalog_store import CatalogStore
 
 NUM_SCHEDULE_OPTIONS = 5
 
@@ -31,14 +35,12 @@ def generate_schedules(course_credits, num_schedule_options=5):
     return schedules
 
 
-def fetch_major_courses(major, url, base_url):
-    """Extracts the list of courses for a given major and returns their details"""
-    major_response = requests.get(base_url + url)
-    major_soup = BeautifulSoup(major_response.text, "html.parser")
+def parse_major_courses(html, parser=PARSER):
+    """Extracts the details of every course block on a major's page, without parsing the rest of the page"""
     courses = []
 
     # get the course info for each course in the major
-    for course_block in major_soup.find_all("div", class_="courseblock"):
+    for course_block in parse_elements(html, "div", ["courseblock"], parser=parser):
         course_title = course_block.find("p", class_="courseblocktitle")
         if course_title:
             course_code_name = course_title.find("strong").text.strip()
@@ -76,13 +78,31 @@ def fetch_major_courses(major, url, base_url):
             }
             courses.append(course_info)
 
-    return major, url, courses
+    return courses
+
+
+def fetch_major_courses(major, url, base_url, session=requests):
+    """Extracts the list of courses for a given major and returns their details"""
+    major_response = session.get(base_url + url)
+    return major, url, parse_major_courses(major_response.text)
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Scrape the UF course catalog into courses.json")
+    parser.add_argument("--concurrency", type=int, default=16, help="maximum number of requests in flight")
+    parser.add_argument("--rate", type=float, default=8.0, help="maximum requests per second to the catalog")
+    parser.add_argument("--cache", default=os.path.join("cache", "http.sqlite"), help="HTTP cache file")
+    parser.add_argument("--offline", action="store_true", help="replay pages from the cache without network access")
+    parser.add_argument("--store", default="catalog.sqlite", help="catalog store the courses are streamed into")
+    parser.add_argument("--no-json", action="store_true", help="only write the catalog store, not courses.json")
+    args = parser.parse_args()
+    store = CatalogStore(args.store)
+    session = get_session(args.cache, offline=args.offline, pool_size=1)
+    crawler = get_crawler(args.cache, offline=args.offline, concurrency=args.concurrency, rate=args.rate)
+
     base_url = "https://catalog.ufl.edu"
-    response = requests.get(base_url + "/UGRD/courses/")
-    soup = BeautifulSoup(response.text, "html.parser")
+    response = session.get(base_url + "/UGRD/courses/")
+    soup = BeautifulSoup(response.text, PARSER, parse_only=SoupStrainer("nav", id="cl-menu"))
     nav_menu = soup.find("nav", id="cl-menu")
 
     # get a list of the majors and their URLs (well it's really not just majors... oh well)
@@ -92,28 +112,38 @@ def main():
         url = a_element["href"]
         majors_urls.append((major, url))
 
-    # fetch the courses for each major in parallel
+    # fetch the courses for each major concurrently, writing each major to the store as it comes in
     majors_courses = {}
-    with ThreadPoolExecutor() as executor:
-        futures = [executor.submit(fetch_major_courses, major, url, base_url) for major, url in majors_urls]
-
-        for future in tqdm(as_completed(futures), total=len(futures), desc="Processing Courses by Major"):
-            major, url, courses = future.result()
+    num_majors, num_courses = 0, 0
+    major_urls = {major: base_url + url for major, url in majors_urls}
+
+    def save_major(major, courses):
+        nonlocal num_majors, num_courses
+        store.add_major_courses(major, major_urls[major], courses)
+        num_majors += 1
+        num_courses += len(courses)
+        if not args.no_json:
             majors_courses[major] = {
-                "url": base_url + url,
+                "url": major_urls[major],
                 "courses": courses
             }
-    
-    # sort the dictionary alphabetically by major name
-    majors_courses_sorted = dict(sorted(majors_courses.items()))
 
-    with open("courses.json", "w", encoding="utf-8") as file:
-        json.dump(majors_courses_sorted, file, ensure_ascii=False, indent=4)
+    crawler.run(list(major_urls.items()), parse_major_courses, on_result=save_major, desc="Processing Courses by Major")
+    store.close()
+    print("Results saved to", args.store)
+    print("Crawl:", crawler.report())
+
+    if not args.no_json:
+        # sort the dictionary alphabetically by major name
+        majors_courses_sorted = dict(sorted(majors_courses.items()))
+
+        with open("courses.json", "w", encoding="utf-8") as file:
+            json.dump(majors_courses_sorted, file, ensure_ascii=False, indent=4)
 
-    print("Results saved to courses.json")
-    print("Number of total course categories:", len(majors_courses))
-    print("Number of total courses:", sum([len(majors_courses[major]["courses"]) for major in majors_courses]))
-    print("Number of total schedulings:", sum([len(majors_courses[major]["courses"]) for major in majors_courses]) * NUM_SCHEDULE_OPTIONS)
+        print("Results saved to courses.json")
+    print("Number of total course categories:", num_majors)
+    print("Number of total courses:", num_courses)
+    print("Number of total schedulings:", num_courses * NUM_SCHEDULE_OPTIONS)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,12 +1,18 @@
+import os
 import json
+import argparse
 import requests
 from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from tqdm import tqdm
+from http_cache import get_session
+from crawler import get_crawler
+from fast_parse import PARSER, parse_elements
+from catalog_store import CatalogStore
 
-def extract_programs(base_url):
+PROGRAM_SECTIONS = ["base", "criticaltracking", "modelsemesterplan", "academiclearningcompact"]
+
+def extract_programs(base_url, session=requests):
     """Extracts the list of programs (majors/minors/certificates) and returns their names, types, and URLs"""
-    response = requests.get(f"{base_url}/UGRD/programs/")
+    response = session.get(f"{base_url}/UGRD/programs/")
     soup = BeautifulSoup(response.text, "html.parser")
 
     # extract the list of programs, their urls, and types (major/minor/certificate)
@@ -104,106 +110,133 @@ def extract_programs(base_url):
 #     return program, program_details
 
 
-def fetch_program_details(program, program_type, url, base_url):
+def parse_courselist(table):
+    """Returns the courses of an sc_courselist table, grouped by area header if it has any"""
+    rows = table.find_all("tr")
+    has_area_header = any("areaheader" in row.get("class", []) for row in rows)
+    if has_area_header:
+        current_area = None
+        courses_by_area = {}
+        for row in rows:
+            if "areaheader" in row.get("class", []):
+                current_area = row.find("span", class_="courselistcomment").text.strip()
+                courses_by_area[current_area] = []
+            else:
+                cols = row.find_all("td")
+                if len(cols) >= 2:
+                    course_code = cols[0].text.strip()
+                    if course_code and current_area:
+                        courses_by_area[current_area].append(course_code)
+        return courses_by_area
+
+    courses = []
+    for row in rows:
+        cols = row.find_all("td")
+        if len(cols) >= 2:
+            course_code = cols[0].text.strip()
+            if course_code:
+                courses.append(course_code)
+    return {"courses": courses}
+
+
+def parse_plangrid(table):
+    """Returns the courses (and comments) of an sc_plangrid table grouped by semester"""
+    current_semester = None
+    courses_by_semester = {}
+    for row in table.find_all("tr"):
+        if "plangridterm" in row.get("class", []):
+            current_semester = row.find("th").text.strip()
+            courses_by_semester[current_semester] = []
+        else:
+            cols = row.find_all("td")
+            if len(cols) >= 2:
+                course_code = cols[0].text.strip()
+                if course_code and current_semester:
+                    courses_by_semester[current_semester].append(course_code)
+            else:
+                course_comment = row.find("span", class_="comment")
+                if course_comment and current_semester:
+                    courses_by_semester[current_semester].append(course_comment.text.strip())
+    return courses_by_semester
+
+
+def extract_program_sections(html, parser=PARSER):
     """
-    Extracts the details for a given program and returns them as a dictionary
+    Parses a program page once and returns the courses of every subsection
+
+    Only the sc_courselist and sc_plangrid tables are parsed, the rest of the page is skipped. The "#criticaltracking" etc.
+    tabs are all on the same page (the fragment is never sent to the server), so every subsection
+    sees the same tables; the plan grid only counts towards critical tracking.
     """
-    program_details = {"url": base_url + url if base_url not in url else url, "type": program_type}
+    courselist_courses, plangrid_courses = {}, {}
+    for table in parse_elements(html, "table", ["sc_courselist", "sc_plangrid"], parser=parser):
+        table_class = table.get("class", [])
+        if "sc_courselist" in table_class:
+            courselist_courses.update(parse_courselist(table))
+        elif "sc_plangrid" in table_class:
+            plangrid_courses.update(parse_plangrid(table))
 
-    for subsection in ["base", "criticaltracking", "modelsemesterplan", "academiclearningcompact"]:
-        if subsection == "base":
-            response = requests.get(f"{program_details['url']}/")
-        else:
-            response = requests.get(f"{program_details['url']}/#{subsection}")
-        soup = BeautifulSoup(response.text, "html.parser")
-
-        # UF uses different classes for tables in their course catalog
-        table_classes = ["sc_courselist", "sc_plangrid"] + [f"sc_sctable tbl_academiclearningcompact{i}" for i in range(1, 7)]
-
-        course_tables = []
-        for tbl_class in table_classes:
-            course_tables += soup.find_all("table", {"class": tbl_class})
-
-        table_exists = False
-        subsection_courses = {}
-        for table in course_tables:
-            if "sc_courselist" in table.get("class", []):
-                # Handle sc_courselist table
-                rows = table.find_all("tr")
-                has_area_header = any("areaheader" in row.get("class", []) for row in rows)
-                if has_area_header:
-                    current_area = None
-                    courses_by_area = {}
-                    for row in rows:
-                        if "areaheader" in row.get("class", []):
-                            current_area = row.find("span", class_="courselistcomment").text.strip()
-                            courses_by_area[current_area] = []
-                        else:
-                            cols = row.find_all("td")
-                            if len(cols) >= 2:
-                                course_code = cols[0].text.strip()
-                                if course_code and current_area:
-                                    courses_by_area[current_area].append(course_code)
-                    subsection_courses.update(courses_by_area)
-                else:
-                    courses = []
-                    for row in rows:
-                        cols = row.find_all("td")
-                        if len(cols) >= 2:
-                            course_code = cols[0].text.strip()
-                            if course_code:
-                                courses.append(course_code)
-                    subsection_courses["courses"] = courses
-            elif "sc_plangrid" in table.get("class", []) and subsection == "criticaltracking":
-                # Handle sc_plangrid table specifically for critical tracking
-                current_semester = None
-                courses_by_semester = {}
-                rows = table.find_all("tr")
-                for row in rows:
-                    if "plangridterm" in row.get("class", []):
-                        current_semester = row.find("th").text.strip()
-                        courses_by_semester[current_semester] = []
-                    else:
-                        cols = row.find_all("td")
-                        if len(cols) >= 2:
-                            course_code = cols[0].text.strip()
-                            if course_code and current_semester:
-                                courses_by_semester[current_semester].append(course_code)
-                        else:
-                            course_comment = row.find("span", class_="comment")
-                            if course_comment and current_semester:
-                                courses_by_semester[current_semester].append(course_comment.text.strip())
-                subsection_courses.update(courses_by_semester)
-
-        # if the subsection has no courses, the value is just {}
-        program_details[subsection.replace("text", "")] = subsection_courses
+    # if a subsection has no courses, its value is just {}
+    sections = {subsection: dict(courselist_courses) for subsection in PROGRAM_SECTIONS}
+    sections["criticaltracking"].update(plangrid_courses)
+    return sections
 
+
+def fetch_program_details(program, program_type, url, base_url, session=requests):
+    """
+    Extracts the details for a given program and returns them as a dictionary
+    """
+    program_details = {"url": base_url + url if base_url not in url else url, "type": program_type}
+    response = session.get(f"{program_details['url']}/")
+    program_details.update(extract_program_sections(response.text))
     return program, program_details
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Scrape the UF program catalog into programs.json")
+    parser.add_argument("--concurrency", type=int, default=16, help="maximum number of requests in flight")
+    parser.add_argument("--rate", type=float, default=8.0, help="maximum requests per second to the catalog")
+    parser.add_argument("--cache", default=os.path.join("cache", "http.sqlite"), help="HTTP cache file")
+    parser.add_argument("--offline", action="store_true", help="replay pages from the cache without network access")
+    parser.add_argument("--store", default="catalog.sqlite", help="catalog store the programs are streamed into")
+    parser.add_argument("--no-json", action="store_true", help="only write the catalog store, not programs.json")
+    args = parser.parse_args()
+    store = CatalogStore(args.store)
+    session = get_session(args.cache, offline=args.offline, pool_size=1)
+    crawler = get_crawler(args.cache, offline=args.offline, concurrency=args.concurrency, rate=args.rate)
+
     base_url = "https://catalog.ufl.edu"
-    programs_urls = extract_programs(base_url)
+    programs_urls = extract_programs(base_url, session)
+
+    # create a unique key by combining program name and type to prevent collisions between majors & minors
+    programs_info = {}
+    for program, program_type, url in programs_urls:
+        program_url = base_url + url if base_url not in url else url
+        programs_info[f"{program} ({program_type})"] = {"url": program_url, "type": program_type}
 
     programs_details = {}
-    with ThreadPoolExecutor() as executor:
-        futures = [executor.submit(fetch_program_details, program, program_type, url, base_url)
-                   for program, program_type, url in programs_urls]
-
-        for future in tqdm(as_completed(futures), total=len(futures), desc="Processing Programs"):
-            program, details = future.result()
-            # create a unique key by combining program name and type to prevent collisions between majors & minors
-            program_key = f"{program} ({details['type']})"
+
+    def save_program(program_key, sections):
+        details = {**programs_info[program_key], **sections}
+        store.add_program(program_key, details)
+        if not args.no_json:
             programs_details[program_key] = details
 
-    # sort the dictionary alphabetically by program name
-    sorted_programs_details = dict(sorted(programs_details.items()))
+    jobs = [(program_key, f"{info['url']}/") for program_key, info in programs_info.items()]
+    crawler.run(jobs, extract_program_sections, on_result=save_program, desc="Processing Programs")
+    store.close()
+    print("Results saved to", args.store)
+    print("Crawl:", crawler.report())
+
+    if not args.no_json:
+        # sort the dictionary alphabetically by program name
+        sorted_programs_details = dict(sorted(programs_details.items()))
 
-    file_path = "programs.json"
-    with open(file_path, "w", encoding="utf-8") as file:
-        json.dump(sorted_programs_details, file, ensure_ascii=False, indent=4)
+        file_path = "programs.json"
+        with open(file_path, "w", encoding="utf-8") as file:
+            json.dump(sorted_programs_details, file, ensure_ascii=False, indent=4)
 
-    print("Results saved to", file_path)
+        print("Results saved to", file_path)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from urllib.parse import urldefrag
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+# ThreadPoolExecutor's default number of workers, so the connection pool matches the scraper's threads
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+# response headers kept with a cached page
+STORED_HEADERS = ["Content-Type", "ETag", "Last-Modified"]
+
+
+class HttpCache():
+    """
+    On-disk store of fetched pages and their validators (ETag / Last-Modified), backed by SQLite
+    """
+    def __init__(self, path: str = os.path.join("cache", "http.sqlite")) -> None:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path: str = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                fetched_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+
+    def get(self, url: str) -> tuple[dict, bytes]:
+        """Return (headers, body) of a cached page, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT headers, body FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+
+    def put(self, url: str, headers: dict, body: bytes) -> None:
+        stored = {key: headers[key] for key in STORED_HEADERS if key in headers}
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)", (url, json.dumps(stored), body, time.time())
+            )
+            self._conn.commit()
+
+
+    def touch(self, url: str) -> None:
+        """Record that a cached page was revalidated"""
+        with self._lock:
+            self._conn.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class CachedSession(requests.Session):
+    """
+    requests.Session that revalidates pages against an HttpCache with conditional GETs
+
+    In offline mode every request is answered from the cache and a missing page raises an error,
+    so the parsers can be re-run without network access.
+    """
+    def __init__(self, cache: HttpCache, offline: bool = False, pool_size: int = DEFAULT_WORKERS) -> None:
+        super().__init__()
+        self.cache: HttpCache = cache
+        self.offline: bool = offline
+        self.stats: dict[str, int] = {"downloaded": 0, "not_modified": 0, "offline": 0, "bytes": 0}
+        self._stats_lock = threading.Lock()
+
+        # keep-alive connections shared by all scraper threads
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[key] += n
+
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """GET a page, sending If-None-Match / If-Modified-Since when a cached copy exists"""
+        # the #fragment never reaches the server, so it must not split the cache either
+        url = urldefrag(url)[0]
+        cached = self.cache.get(url)
+
+        if self.offline:
+            if cached is None:
+                raise requests.ConnectionError(f"Offline mode: {url} is not in the cache at {self.cache.path}")
+            self._count("offline")
+            return cached_response(url, *cached)
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if cached is not None:
+            if "ETag" in cached[0]:
+                headers["If-None-Match"] = cached[0]["ETag"]
+            if "Last-Modified" in cached[0]:
+                headers["If-Modified-Since"] = cached[0]["Last-Modified"]
+
+        response = super().get(url, headers=headers, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            self.cache.touch(url)
+            self._count("not_modified")
+            return cached_response(url, *cached)
+
+        if response.status_code == 200:
+            self.cache.put(url, response.headers, response.content)
+        self._count("downloaded")
+        self._count("bytes", len(response.content))
+        return response
+
+
+def cached_response(url: str, headers: dict, body: bytes) -> requests.Response:
+    """Build a 200 response from a cached page"""
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response.headers = CaseInsensitiveDict(headers)
+    response._content = body
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    response.from_cache = True
+    return response
+
+
+def get_session(
+        cache_path: str = os.path.join("cache", "http.sqlite"),
+        offline: bool = False,
+        pool_size: int = DEFAULT_WORKERS
+    ) -> CachedSession:
+    """Returns a pooled, caching session for the catalog scrapers"""
+    return CachedSession(HttpCache(cache_path), offline=offline, pool_size=pool_size)
+
+
+def format_stats(session: CachedSession) -> str:
+    stats = session.stats
+    return (f"{stats['downloaded']} downloaded ({stats['bytes'] / 1e6:.1f} MB), "
+            f"{stats['not_modified']} not modified, {stats['offline']} served offline")
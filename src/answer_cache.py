@@ -0,0 +1,232 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Union
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import Runnable
+from src.codes import CODE_IN_TEXT_PATTERN, find_codes
+from src.embedding_cache import normalize_text
+
+
+def normalize_question(question: str) -> str:
+    """Exact-match key of a question: case, spacing, trailing punctuation and course code spelling don't matter"""
+    question = CODE_IN_TEXT_PATTERN.sub(lambda match: "".join(group or "" for group in match.groups()), question)
+    return normalize_text(question).lower().rstrip(" ?!.")
+
+
+class SemanticCache():
+    """
+    Answer cache in front of the runnable returned by get_chain
+
+    A question first goes through an exact-match lookup on its normalized text, then a similarity search
+    over the embeddings of the cached questions (a single matrix-vector product) that only accepts a cached
+    question naming the same course codes ("prereqs for COP 3502C" and "... COP 3503C" embed almost
+    identically but have different answers). A hit returns the cached {"context", "question", "answer"}
+    without running retrieval, reranking or the LLM. Entries are evicted least recently used past
+    max_entries, after ttl seconds, and all at once when the index version changes.
+    """
+    def __init__(
+            self,
+            chain: Runnable,
+            embedding: Embeddings,
+            threshold: float = 0.95,
+            max_entries: int = 1000,
+            ttl: float = 24 * 3600,
+            index_version: Union[str, Callable[[], str]] = None
+        ) -> None:
+        """
+        Create a SemanticCache
+
+        Args:
+            chain: Runnable from get_chain, invoked on a miss
+            embedding: Embeddings used for the questions, e.g. EmbedderEmbeddings
+            threshold: Minimum cosine similarity of a cached question to count as the same question
+            max_entries: Maximum number of cached answers; the least recently used ones are evicted past this
+            ttl: Seconds a cached answer stays valid, None to keep answers until evicted
+            index_version: Version of the catalog index (e.g. IncrementalIndexer.version), or a function
+                           returning it; the cache is cleared whenever it changes
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError(f"Invalid threshold: {threshold}. Must be in (0, 1]")
+        if max_entries < 1:
+            raise ValueError(f"Invalid max_entries: {max_entries}. Must be at least 1")
+        self.chain: Runnable = chain
+        self.embedding: Embeddings = embedding
+        self.threshold: float = threshold
+        self.max_entries: int = max_entries
+        self.ttl: float = ttl
+        self.index_version = index_version
+        self._version: str = self._current_version()
+        self._lock = threading.Lock()
+
+        # key -> entry, in least to most recently used order; each entry owns a row of the vector matrix
+        self.entries: OrderedDict[str, dict] = OrderedDict()
+        self.vectors: np.ndarray = None
+        self._free_rows: list[int] = list(range(max_entries - 1, -1, -1))
+        self._row_keys: list[str] = [None] * max_entries
+        self._live: np.ndarray = np.zeros(max_entries, dtype=bool)
+        self.stats: dict = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "seconds_saved": 0.0, "invalidations": 0}
+
+
+    def __str__(self) -> str:
+        return f"SemanticCache(entries={len(self.entries)}, threshold={self.threshold}, ttl={self.ttl})"
+
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+    def _current_version(self) -> str:
+        return self.index_version() if callable(self.index_version) else self.index_version
+
+
+    def _check_version(self) -> None:
+        version = self._current_version()
+        if version != self._version:
+            self.clear()
+            self._version = version
+            self.stats["invalidations"] += 1
+
+
+    def set_index_version(self, version: str) -> None:
+        """Record a new index version, dropping every answer computed against the old index"""
+        self.index_version = version
+        with self._lock:
+            self._check_version()
+
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self._free_rows = list(range(self.max_entries - 1, -1, -1))
+        self._row_keys = [None] * self.max_entries
+        self._live[:] = False
+
+
+    def _remove(self, key: str) -> None:
+        entry = self.entries.pop(key)
+        self._row_keys[entry["row"]] = None
+        self._live[entry["row"]] = False
+        self._free_rows.append(entry["row"])
+
+
+    def _expired(self, entry: dict, now: float) -> bool:
+        return self.ttl is not None and now - entry["created"] > self.ttl
+
+
+    def _normalize(self, embedding: list[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+
+    def _lookup(self, key: str, vector: np.ndarray = None, codes: frozenset = frozenset()) -> dict:
+        """
+        Cached entry for a question key (exact) or its embedding and course codes (semantic), or None;
+        expects the lock held
+        """
+        now = time.time()
+        entry = self.entries.get(key)
+        if entry is not None and self._expired(entry, now):
+            self._remove(key)
+            entry = None
+        if entry is None and vector is not None and self.entries:
+            scores = self.vectors @ vector
+            # free rows hold stale vectors, never match them
+            scores[~self._live] = -np.inf
+            rows = np.flatnonzero(scores >= self.threshold)
+            for row in rows[np.argsort(-scores[rows])]:
+                candidate = self.entries[self._row_keys[row]]
+                if self._expired(candidate, now):
+                    # evicted, a lower ranked live candidate may still match
+                    self._remove(candidate["key"])
+                    continue
+                if candidate["codes"] == codes:
+                    entry = candidate
+                    break
+        if entry is None:
+            return None
+        self.entries.move_to_end(entry["key"])
+        return entry
+
+
+    def _store(self, key: str, vector: np.ndarray, codes: frozenset, result: dict, seconds: float) -> None:
+        if key in self.entries:
+            self._remove(key)
+        if not self._free_rows:
+            self._remove(next(iter(self.entries)))
+        if self.vectors is None:
+            self.vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+        row = self._free_rows.pop()
+        self.vectors[row] = vector
+        self._row_keys[row] = key
+        self._live[row] = True
+        self.entries[key] = {"key": key, "row": row, "codes": codes, "result": result, "seconds": seconds, "created": time.time()}
+
+
+    def _get(self, question: str, key: str, vector: np.ndarray = None, codes: frozenset = frozenset()) -> dict:
+        """Cached result by exact key, or by similarity and codes when vector is given; counts the hit or miss"""
+        with self._lock:
+            if vector is None:
+                self._check_version()
+            entry = self._lookup(key, vector, codes)
+            if entry is None:
+                if vector is not None:
+                    self.stats["misses"] += 1
+                return None
+            self.stats["exact_hits" if vector is None else "semantic_hits"] += 1
+            self.stats["seconds_saved"] += entry["seconds"]
+            return {**entry["result"], "question": question}
+
+
+    def invoke(self, question: str, config: dict = None) -> dict:
+        """Answer a question like the wrapped chain, {"context", "question", "answer"}, from the cache when possible"""
+        key = normalize_question(question)
+        result = self._get(question, key)
+        if result is not None:
+            return result
+        vector = self._normalize(self.embedding.embed_query(question))
+        codes = frozenset(find_codes(question))
+        result = self._get(question, key, vector, codes)
+        if result is not None:
+            return result
+
+        start = time.perf_counter()
+        result = self.chain.invoke(question, config=config)
+        with self._lock:
+            self._store(key, vector, codes, result, time.perf_counter() - start)
+        return result
+
+
+    async def ainvoke(self, question: str, config: dict = None) -> dict:
+        key = normalize_question(question)
+        result = self._get(question, key)
+        if result is not None:
+            return result
+        vector = self._normalize(await self.embedding.aembed_query(question))
+        codes = frozenset(find_codes(question))
+        result = self._get(question, key, vector, codes)
+        if result is not None:
+            return result
+
+        start = time.perf_counter()
+        result = await self.chain.ainvoke(question, config=config)
+        with self._lock:
+            self._store(key, vector, codes, result, time.perf_counter() - start)
+        return result
+
+
+    def metrics(self) -> dict:
+        """Hit rate and LLM pipeline time saved so far"""
+        hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+        total = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self.entries),
+            "hit_rate": hits / total if total else 0.0,
+            "seconds_saved_per_hit": self.stats["seconds_saved"] / hits if hits else 0.0
+        }
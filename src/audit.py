@@ -0,0 +1,197 @@
+import os
+import re
+import json
+from src.codes import display_code, find_codes, is_course_code, normalize_code
+
+PROGRAMS_PATH: str = os.path.join(os.path.dirname(__file__), "..", "data", "programs.json")
+# semester rows of a plan grid, e.g. "Semester One" or "Summer After Semester Six"
+TERM_PATTERN = re.compile(r"^(Semester|Summer)\b")
+
+
+def compile_group(entries: list[str]) -> list[frozenset]:
+    """
+    Requirements of one area as sets of alternatives, e.g. "PHY\xa02048 or PHY\xa02060 or I" -> {"PHY2048", "PHY2060"}
+
+    Entries without a course code ("Total Credits", "Professional electives") are dropped, and the codes
+    listed after a "Select one:" entry form a single requirement.
+    """
+    requirements, select_one = [], None
+    for entry in entries:
+        codes = frozenset(find_codes(entry))
+        if entry.strip().lower().startswith("select one"):
+            select_one = set()
+            continue
+        if select_one is not None:
+            if codes:
+                select_one |= codes
+                continue
+            requirements.append(frozenset(select_one))
+            select_one = None
+        if codes:
+            requirements.append(codes)
+    if select_one:
+        requirements.append(frozenset(select_one))
+    return requirements
+
+
+def transcript_codes(transcript) -> set[str]:
+    """Normalized codes of every course in a transcript: a list of codes or a transcript.json-style nested dict"""
+    if isinstance(transcript, str):
+        return set(find_codes(transcript)) or ({normalize_code(transcript)} if is_course_code(transcript) else set())
+    if isinstance(transcript, dict):
+        return set().union(*(transcript_codes(value) for value in transcript.values()))
+    if isinstance(transcript, (list, tuple, set, frozenset)):
+        return set().union(*(transcript_codes(value) for value in transcript))
+    return set()
+
+
+class DegreeAuditor():
+    """
+    Deterministic degree audit of completed courses against programs.json
+
+    Every program is compiled once into its requirement areas (lists of alternative code sets) and its
+    critical-tracking terms, so an audit is a set intersection per requirement and auditing a transcript
+    against all 339 programs takes a few milliseconds.
+    """
+    def __init__(self, programs: dict) -> None:
+        """
+        Create a DegreeAuditor
+
+        Args:
+            programs: programs.json as written by get_degrees.main, {"Name (type)": {"url", "type", section: {area: [entries]}}}
+        """
+        self.programs: dict[str, dict] = {key: self._compile(key, details) for key, details in programs.items()}
+
+
+    def __str__(self) -> str:
+        return f"DegreeAuditor(programs={len(self.programs)})"
+
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+    @classmethod
+    def from_json(cls, path: str = PROGRAMS_PATH) -> "DegreeAuditor":
+        with open(path, "r", encoding="utf-8") as file:
+            return cls(json.load(file))
+
+
+    def _compile(self, key: str, details: dict) -> dict:
+        # requirement areas of the program requirements, plan grid terms of the critical-tracking tab
+        areas, seen = [], set()
+        for area, entries in details.get("base", {}).items():
+            if TERM_PATTERN.match(area):
+                continue
+            # a requirement listed in several areas (e.g. again in the learning compact) counts once
+            requirements = [requirement for requirement in compile_group(entries) if requirement not in seen]
+            seen.update(requirements)
+            if requirements:
+                areas.append((area, requirements))
+        terms = []
+        for term, entries in details.get("criticaltracking", {}).items():
+            if TERM_PATTERN.match(term):
+                requirements = compile_group(entries)
+                if requirements:
+                    terms.append((term, requirements))
+        name = key[:-len(f" ({details['type']})")] if key.endswith(f" ({details['type']})") else key
+        return {"key": key, "name": name, "type": details.get("type", ""), "areas": areas, "terms": terms,
+                "total": sum(len(requirements) for _, requirements in areas)}
+
+
+    def find_program(self, name: str, program_type: str = "major") -> str:
+        """Key of a program from its name, e.g. "Physics" -> "Physics (major)" """
+        if name in self.programs:
+            return name
+        key = f"{name} ({program_type})"
+        if key in self.programs:
+            return key
+        matches = [key for key, program in self.programs.items() if program["name"].lower() == name.strip().lower()]
+        if not matches:
+            raise KeyError(f"Unknown program: {name}")
+        return matches[0]
+
+
+    def audit(self, completed, program: str) -> dict:
+        """
+        Audit completed courses against one program
+
+        Args:
+            completed: Completed course codes in any spelling, or a transcript (see transcript_codes)
+            program: Program key or name, e.g. "Physics (major)" or "Physics"
+
+        Returns {"program", "type", "satisfied": {area: [codes]}, "remaining": {area: [options]}, "completed",
+        "total", "progress", "critical_tracking": [{"term", "completed", "remaining"}], "next_term"}.
+        """
+        return self._audit(frozenset(transcript_codes(completed)), self.find_program(program))
+
+
+    def _audit(self, done: frozenset, key: str) -> dict:
+        """audit of already normalized codes against a program key"""
+        compiled = self.programs[key]
+        satisfied, remaining, count = {}, {}, 0
+        for area, requirements in compiled["areas"]:
+            for requirement in requirements:
+                taken = requirement & done
+                if taken:
+                    satisfied.setdefault(area, []).extend(display_code(code) for code in sorted(taken))
+                    count += 1
+                else:
+                    remaining.setdefault(area, []).append(" or ".join(display_code(code) for code in sorted(requirement)))
+
+        critical_tracking, next_term = [], None
+        for term, requirements in compiled["terms"]:
+            term_done = [display_code(code) for requirement in requirements for code in sorted(requirement & done)]
+            term_remaining = [" or ".join(display_code(code) for code in sorted(requirement))
+                              for requirement in requirements if requirement.isdisjoint(done)]
+            critical_tracking.append({"term": term, "completed": term_done, "remaining": term_remaining})
+            if term_remaining and next_term is None:
+                next_term = term
+
+        return {
+            "program": compiled["key"],
+            "type": compiled["type"],
+            "satisfied": satisfied,
+            "remaining": remaining,
+            "completed": count,
+            "total": compiled["total"],
+            "progress": count / compiled["total"] if compiled["total"] else 0.0,
+            "critical_tracking": critical_tracking,
+            "next_term": next_term
+        }
+
+
+    def audit_all(self, completed, program_type: str = None) -> list[dict]:
+        """Audit against every program (or every program of a type), closest to completion first"""
+        done = frozenset(transcript_codes(completed))
+        results = [
+            self._audit(done, key) for key, program in self.programs.items()
+            if program["total"] and (program_type is None or program["type"] == program_type)
+        ]
+        return sorted(results, key=lambda result: (-result["progress"], result["total"] - result["completed"], result["program"]))
+
+
+    def closest(self, completed, program_type: str = "minor", n: int = 5) -> list[dict]:
+        """The n programs of a type, e.g. minors, with the most requirements already satisfied"""
+        return self.audit_all(completed, program_type)[:n]
+
+
+    def audit_transcript(self, transcript: dict) -> dict:
+        """Audit a transcript.json-style dict against the major it names"""
+        return self.audit(transcript, self.find_program(transcript["Major"], "major"))
+
+
+    def describe(self, result: dict) -> str:
+        """Plain-text summary of an audit, e.g. to add to the chain's prompt context"""
+        lines = [f"Degree audit for {result['program']}: {result['completed']} of {result['total']} requirements satisfied "
+                 f"({100 * result['progress']:.0f}%)."]
+        for area, codes in result["satisfied"].items():
+            lines.append(f"Satisfied - {area}: {', '.join(codes)}")
+        for area, options in result["remaining"].items():
+            lines.append(f"Remaining - {area}: {'; '.join(options)}")
+        if result["next_term"] is not None:
+            term = next(term for term in result["critical_tracking"] if term["term"] == result["next_term"])
+            lines.append(f"Critical tracking: first incomplete term is {result['next_term']}, which still needs {'; '.join(term['remaining'])}")
+        elif result["critical_tracking"]:
+            lines.append("Critical tracking: every term of the model plan is complete.")
+        return "\n".join(lines)
@@ -0,0 +1,157 @@
+import time
+import asyncio
+from typing import List, Optional, Tuple
+from langchain_core.documents import BaseDocumentCompressor, Document
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.vectorstores import VectorStore
+from src.answer_cache import normalize_question
+from src.chain import RAG_PROMPT
+from src.context import ContextPacker
+from src.hybrid import BM25Index, HybridRetriever
+
+
+def unique_documents(documents: List[Document]) -> List[Document]:
+    """Documents without the repeats of a text (e.g. a document indexed under two ids), in order"""
+    seen = set()
+    unique = []
+    for document in documents:
+        if document.page_content not in seen:
+            seen.add(document.page_content)
+            unique.append(document)
+    return unique
+
+
+class BatchAnswerer():
+    """
+    Answers a list of questions (e.g. an advisor's questions for one student) with the pipeline of get_chain
+
+    Questions asked more than once (same normalized text) are answered once. All questions are embedded in
+    one bulk call and looked up in one batched vector search (LocalVectorStore.search_vectors), duplicate
+    documents are removed from each question's candidates before reranking, and the reranking and LLM
+    calls run concurrently, at most max_concurrency at a time. Results keep the order of the questions;
+    a question that fails gets an "error" instead of failing the batch.
+    """
+    def __init__(
+            self,
+            model: BaseChatModel,
+            vectorstore: VectorStore,
+            top_k: int = 10,
+            top_n: int = 3,
+            rerank: bool = False,
+            reranker: BaseDocumentCompressor = None,
+            hybrid: bool = False,
+            bm25: BM25Index = None,
+            packer: ContextPacker = None,
+            max_concurrency: int = 8
+        ) -> None:
+        """
+        Create a BatchAnswerer
+
+        Args:
+            model: Chat model answering the questions
+            vectorstore: Store to retrieve from, batched when it is a LocalVectorStore
+            top_k: Documents retrieved per question
+            top_n: Documents kept per question after reranking / fusion
+            rerank: Rerank the candidates of each question (reranker, by default CohereRerank(top_n=top_n))
+            reranker: Document compressor used when rerank is set
+            hybrid: Fuse the vector top k with a BM25 top k (bm25, by default built from a LocalVectorStore)
+            packer: Optional ContextPacker for the prompt context
+            max_concurrency: Maximum number of reranking / LLM calls in flight
+        """
+        if max_concurrency < 1:
+            raise ValueError(f"Invalid max_concurrency: {max_concurrency}. It must be at least 1")
+        self.model: BaseChatModel = model
+        self.vectorstore: VectorStore = vectorstore
+        self.top_k: int = top_k
+        self.top_n: int = top_n
+        self.packer: ContextPacker = packer
+        self.max_concurrency: int = max_concurrency
+        self.reranker: BaseDocumentCompressor = None
+        if rerank:
+            if reranker is None:
+                from langchain.retrievers.document_compressors import CohereRerank
+                reranker = CohereRerank(top_n=top_n)
+            self.reranker = reranker
+        self.hybrid: HybridRetriever = None
+        if hybrid:
+            self.hybrid = HybridRetriever(vectorstore=vectorstore, bm25=bm25 or BM25Index.from_vectorstore(vectorstore),
+                                          top_k=top_k, top_n=top_k if rerank else top_n)
+        self.answer_chain = RAG_PROMPT | model | StrOutputParser()
+
+
+    def __str__(self) -> str:
+        return (f"BatchAnswerer(top_k={self.top_k}, top_n={self.top_n}, rerank={self.reranker is not None}, "
+                f"hybrid={self.hybrid is not None}, max_concurrency={self.max_concurrency})")
+
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+    def retrieve(self, questions: List[str]) -> List[List[Document]]:
+        """Candidate documents of every question: one bulk embedding call and one batched lookup"""
+        embeddings = self.vectorstore.embeddings.embed_documents(questions)
+        if hasattr(self.vectorstore, "similarity_search_by_vectors"):
+            dense = self.vectorstore.similarity_search_by_vectors(embeddings, k=self.top_k)
+        else:
+            dense = [self.vectorstore.similarity_search_by_vector(embedding, k=self.top_k) for embedding in embeddings]
+        if self.hybrid is not None:
+            dense = [self.hybrid.fuse(question, documents) for question, documents in zip(questions, dense)]
+        return [unique_documents(documents) for documents in dense]
+
+
+    async def _answer(self, question: str, documents: List[Document], audit: Optional[str], semaphore: asyncio.Semaphore) -> dict:
+        result = {"question": question, "answer": None, "context": documents, "error": None}
+        try:
+            async with semaphore:
+                if self.reranker is not None:
+                    documents = list(await self.reranker.acompress_documents(documents, question))
+                if audit:
+                    documents = [Document(page_content=audit, metadata={"source": "degree audit"})] + documents
+                result["context"] = documents
+                context = documents
+                if self.packer is not None:
+                    result["packed"] = self.packer.pack(documents)
+                    context = result["packed"]["context"]
+                result["answer"] = await self.answer_chain.ainvoke({"context": context, "question": question})
+        except Exception as error:
+            result["error"] = f"{type(error).__name__}: {error}"
+        return result
+
+
+    async def abatch(self, questions: List[str], audit: str = None) -> Tuple[List[dict], dict]:
+        """
+        Answer questions, returning one {"question", "answer", "context", "error"} per question in order
+        ("packed" too with a packer) and the stats of this batch {"questions", "unique", "errors",
+        "retrieve_ms", "answer_ms"}; audit is an optional degree audit added to every question's context
+        """
+        start = time.perf_counter()
+        unique = list(dict.fromkeys(normalize_question(question) for question in questions))
+        first = {}
+        for question in questions:
+            first.setdefault(normalize_question(question), question)
+        try:
+            candidates = await asyncio.to_thread(self.retrieve, [first[key] for key in unique])
+        except Exception as error:
+            # without the embeddings or the index nothing can be answered
+            message = f"{type(error).__name__}: {error}"
+            results = [{"question": question, "answer": None, "context": [], "error": message} for question in questions]
+            return results, {"questions": len(questions), "unique": len(unique), "errors": len(questions),
+                             "retrieve_ms": (time.perf_counter() - start) * 1000, "answer_ms": 0.0}
+        retrieved = time.perf_counter()
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        answers = await asyncio.gather(*(self._answer(first[key], documents, audit, semaphore)
+                                         for key, documents in zip(unique, candidates)))
+        by_key = dict(zip(unique, answers))
+        results = [dict(by_key[normalize_question(question)], question=question) for question in questions]
+        # returned rather than kept on the instance, which concurrent batches share
+        stats = {"questions": len(questions), "unique": len(unique), "errors": sum(result["error"] is not None for result in results),
+                 "retrieve_ms": (retrieved - start) * 1000, "answer_ms": (time.perf_counter() - retrieved) * 1000}
+        return results, stats
+
+
+    def batch(self, questions: List[str], audit: str = None) -> Tuple[List[dict], dict]:
+        """abatch from synchronous code"""
+        return asyncio.run(self.abatch(questions, audit=audit))
@@ -1,14 +1,13 @@
 from langchain_core.language_models.chat_models import BaseChatModel
-from langchain.retrievers.multi_query import MultiQueryRetriever
+from langchain_core.documents import BaseDocumentCompressor, Document
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.pydantic_v1 import BaseModel
-from langchain.prompts import PromptTemplate
+from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import RunnableParallel, RunnablePassthrough
-from langchain_pinecone import PineconeVectorStore
-from langchain.retrievers import ContextualCompressionRetriever
-from langchain.retrievers.document_compressors import CohereRerank
-from langchain import VectorDBQAWithSourcesChain
+from langchain_core.vectorstores import VectorStore
+from src.context import ContextPacker
+from src.hybrid import BM25Index, HybridRetriever
+from src.instrumentation import LatencyTracker
 
 QUERY_PROMPT = PromptTemplate(
     input_variables=["question"],
@@ -41,32 +40,69 @@ class Question(BaseModel):
 
 def get_chain(
         model: BaseChatModel, 
-        vectorstore: PineconeVectorStore, 
+        vectorstore: VectorStore, 
         top_k: int = 10, 
         top_n: int = 3,
         multiquery: bool = False,
-        rerank: bool = False
+        rerank: bool = False,
+        audit: str = None,
+        hybrid: bool = False,
+        bm25: BM25Index = None,
+        tracker: LatencyTracker = None,
+        reranker: BaseDocumentCompressor = None,
+        packer: ContextPacker = None
     ):
-    """Build a chain"""
+    """
+    Build a chain over any langchain VectorStore, e.g. PineconeVectorStore or the in-process LocalVectorStore
+
+    audit is an optional degree audit of the student (DegreeAuditor.describe), added to the retrieved context.
+    hybrid fuses the vector top k with a BM25 top k (bm25, by default built from a LocalVectorStore) in-process,
+    keeping the top n, as an alternative to the network round trips of multiquery and rerank.
+    tracker records the latency of every stage of every question (see LatencyTracker).
+    reranker replaces the default CohereRerank(top_n=top_n) when rerank is set.
+    packer puts the retrieved docs into the prompt compactly and within its token budget instead of as a raw
+    list, and adds its report (tokens used and saved) to the output as "packed"; "context" stays the docs.
+    """
     print("Building chain")
 
-    # retrieve the top k docs from the db
-    retriever = vectorstore.as_retriever(search_kwargs={"k": top_k})
+    if hybrid:
+        # without a reranker after it, the fusion picks the top n docs itself
+        retriever = HybridRetriever(
+            vectorstore=vectorstore,
+            bm25=bm25 or BM25Index.from_vectorstore(vectorstore),
+            top_k=top_k,
+            top_n=top_k if rerank else top_n
+        )
+    else:
+        # retrieve the top k docs from the db
+        retriever = vectorstore.as_retriever(search_kwargs={"k": top_k})
 
 
+    # the langchain retrievers are only imported when asked for: importing langchain.retrievers
+    # costs more than everything else in this module together
     if multiquery:
+        from langchain.retrievers.multi_query import MultiQueryRetriever
         # translate the query into new queries 
         retriever = MultiQueryRetriever.from_llm(
             retriever=retriever, llm=model, prompt=QUERY_PROMPT
         )
         
     if rerank:
+        from langchain.retrievers import ContextualCompressionRetriever
         # reranks docs and uses the top n docs in final response
-        compressor = CohereRerank(top_n=top_n)
+        if reranker is None:
+            from langchain.retrievers.document_compressors import CohereRerank
+            reranker = CohereRerank(top_n=top_n)
+        compressor = reranker
         retriever = ContextualCompressionRetriever(
             base_compressor=compressor, base_retriever=retriever
         )
 
+    if audit:
+        # the audit is computed, not retrieved: put it in front of the retrieved docs
+        audit_doc = Document(page_content=audit, metadata={"source": "degree audit"})
+        retriever = retriever | (lambda docs: [audit_doc] + docs)
+
     # https://python.langchain.com/docs/use_cases/question_answering/sources
     chain = (
         # RunnablePassthrough.assign(context=(lambda x: format_docs(x["context"])))
@@ -78,5 +114,12 @@ def get_chain(
 
     chain_with_source = RunnableParallel(
         {"context": retriever, "question": RunnablePassthrough()}
-    ).assign(answer=chain)
-    return chain_with_source.with_types(input_type=Question)
\ No newline at end of file
+    )
+    if packer is not None:
+        chain_with_source = chain_with_source.assign(packed=lambda x: packer.pack(x["context"]))
+        chain = (lambda x: {"context": x["packed"]["context"], "question": x["question"]}) | chain
+    chain_with_source = chain_with_source.assign(answer=chain)
+    chain_with_source = chain_with_source.with_types(input_type=Question)
+    if tracker is not None:
+        chain_with_source = chain_with_source.with_config(callbacks=[tracker])
+    return chain_with_source
\ No newline at end of file
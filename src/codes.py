@@ -0,0 +1,39 @@
+import re
+
+CODE_PATTERN = re.compile(r"^([A-Z]{3})(\d{4}[A-Z]?)$")
+
+
+def normalize_code(code: str) -> str:
+    """Canonical key of a course code: "COP\xa03503C", "COP 3503C" and "cop3503c" all map to "COP3503C" """
+    return "".join(code.split()).upper()
+
+
+def display_code(code: str) -> str:
+    """Catalog spelling of a course code, e.g. "COP3503C" -> "COP 3503C" """
+    key = normalize_code(code)
+    match = CODE_PATTERN.match(key)
+    return f"{match.group(1)} {match.group(2)}" if match else code.replace("\xa0", " ").strip()
+
+
+def is_course_code(text: str) -> bool:
+    """Whether a string is a single course code (as opposed to e.g. "Elective" or "Quest 1")"""
+    return CODE_PATTERN.match(normalize_code(text)) is not None
+
+
+# common words and month abbreviations that read as a prefix in lowercase text, e.g. "the 4000 level", "any
+# 3000-level course" or "Jan 2025"; in capitals they still do, so "MAR 3023" stays a code
+COMMON_WORDS: tuple = ("all", "and", "any", "are", "but", "can", "for", "has", "its", "new", "nor", "not",
+                       "one", "our", "per", "six", "ten", "the", "two", "was", "who",
+                       "jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec")
+# a code inside free text in any case, e.g. both codes of "SPC\xa02608or ORI\xa02000" or "cop 3503c"; the suffix
+# letter must not start a word, so "2608or" reads as "2608", and a common word is only a prefix in capitals
+CODE_IN_TEXT_PATTERN = re.compile(
+    r"(?<![A-Za-z])(?!(?-i:" + "|".join(f"[{word[0].upper()}{word[0]}]{word[1:]}" for word in COMMON_WORDS) + r")\s?\d)"
+    r"([A-Z]{3})\s?(\d{4})([A-Z](?![A-Z]))?",
+    re.IGNORECASE
+)
+
+
+def find_codes(text: str) -> list[str]:
+    """Normalized codes of every course mentioned in a string, in order, e.g. "prereqs for cop 3503c" -> ["COP3503C"]"""
+    return [f"{prefix}{number}{suffix}".upper() for prefix, number, suffix in CODE_IN_TEXT_PATTERN.findall(text)]
@@ -0,0 +1,232 @@
+import re
+import json
+import threading
+from langchain_core.documents import Document
+
+# between the areas (e.g. "Semester One") of a rendered program section
+SECTION_SEPARATOR: str = "; "
+
+
+def shingles(text: str, size: int = 3) -> set:
+    """Word n-grams of a text, for near-duplicate detection"""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def course_description(text: str) -> str:
+    """The description of a course document built by indexer.course_documents"""
+    match = re.match(r".*?\(\S+ credits\): (.*?)(?: Prerequisites: .*?\.)?(?: Grading Scheme: .*?\.)?$", text, re.S)
+    return match.group(1) if match else text
+
+
+class ContextPacker():
+    """
+    Turns the retrieved documents into a compact context for RAG_PROMPT within a token budget
+
+    Documents are rendered compactly (a course as code, name, credits, prerequisites and a truncated
+    description; a program as its sections without the copies of one another), exact and near-duplicates
+    are dropped (a near-duplicate leaves just its code on the copy that is kept), and the rest fill the
+    budget greedily in retrieval (relevance) order, truncating the one that no longer fits whole. Tokens
+    are counted with tiktoken.
+    """
+    def __init__(
+            self,
+            budget: int = 1500,
+            model_name: str = "gpt-3.5-turbo",
+            description_chars: int = 300,
+            near_duplicate: float = 0.85,
+            min_tokens: int = 40,
+            encoding = None
+        ) -> None:
+        """
+        Create a ContextPacker
+
+        Args:
+            budget: Maximum number of tokens of the packed context
+            model_name: Model whose tiktoken encoding counts the tokens (cl100k_base if tiktoken doesn't know it)
+            description_chars: Characters of a course description that are kept
+            near_duplicate: Jaccard similarity of word trigrams above which a document counts as a copy of a kept one
+            min_tokens: Smallest truncated document worth adding when a document doesn't fit whole (at least 1)
+            encoding: Tokenizer counting the tokens (encode / decode like a tiktoken Encoding) instead of the
+                      tiktoken encoding of model_name, which is downloaded on first use
+        """
+        if budget < 1:
+            raise ValueError(f"Invalid budget: {budget}. It must be at least 1")
+        if min_tokens < 1:
+            raise ValueError(f"Invalid min_tokens: {min_tokens}. It must be at least 1")
+        if encoding is None:
+            encoding = self.load_encoding(model_name)
+        self.encoding = encoding
+        self.budget: int = budget
+        self.model_name: str = model_name
+        self.description_chars: int = description_chars
+        self.near_duplicate: float = near_duplicate
+        self.min_tokens: int = min_tokens
+        self.lock = threading.Lock()
+        self.totals: dict = {"requests": 0, "raw_tokens": 0, "tokens": 0, "duplicates": 0, "dropped": 0}
+
+
+    def __str__(self) -> str:
+        return f"ContextPacker(budget={self.budget}, model_name={self.model_name}, near_duplicate={self.near_duplicate})"
+
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+    @staticmethod
+    def load_encoding(model_name: str):
+        """tiktoken encoding of a model (cl100k_base if tiktoken doesn't know it)"""
+        try:
+            import tiktoken
+        except ImportError:
+            raise ImportError("This function requires tiktoken to be installed")
+        try:
+            try:
+                return tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                return tiktoken.get_encoding("cl100k_base")
+        except Exception as error:
+            # the encoding files are downloaded on first use and cached in TIKTOKEN_CACHE_DIR
+            raise RuntimeError(f"Could not load the tiktoken encoding for {model_name} ({type(error).__name__}: {error}). "
+                               "Run once with network access or set TIKTOKEN_CACHE_DIR to a directory holding the "
+                               "encoding files") from error
+
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+
+    def truncate(self, text: str, tokens: int) -> str:
+        ids = self.encoding.encode(text, disallowed_special=())
+        if len(ids) <= tokens:
+            return text
+        return self.encoding.decode(ids[:tokens]).rstrip() + " ..."
+
+
+    def render(self, document: Document) -> str:
+        """Compact text of one document"""
+        metadata, text = document.metadata, document.page_content
+        if metadata.get("kind") == "course":
+            description = course_description(text)
+            if len(description) > self.description_chars:
+                description = description[:self.description_chars].rsplit(" ", 1)[0] + " ..."
+            line = f"{metadata.get('code', '')} {metadata.get('name', '')}".strip()
+            if metadata.get("credits"):
+                line += f" ({metadata['credits']} cr)"
+            if metadata.get("prerequisites"):
+                line += f". Prereqs: {', '.join(metadata['prerequisites'])}"
+            return f"{line}. {description}".replace("\xa0", " ")
+        if metadata.get("kind") == "program":
+            return self.render_program(text).replace("\xa0", " ")
+        return " ".join(text.split())
+
+
+    def render_program(self, text: str) -> str:
+        """Program document (indexer.program_documents) with its sections flattened and deduplicated"""
+        name, _, payload = text.partition(": ")
+        try:
+            sections = json.loads(payload)
+        except ValueError:
+            return " ".join(text.split())
+        parts, seen = [], set()
+        for section, areas in sections.items():
+            key = json.dumps(areas, sort_keys=True)
+            if key in seen:
+                # e.g. "criticaltracking" repeating "base" on most pages
+                continue
+            seen.add(key)
+            if isinstance(areas, dict):
+                rendered = SECTION_SEPARATOR.join(f"{area}: {', '.join(map(str, entries))}" for area, entries in areas.items())
+            else:
+                rendered = ", ".join(map(str, areas))
+            parts.append(f"[{section}] {rendered}")
+        return f"{name}: " + " ".join(parts)
+
+
+    def signature(self, document: Document, text: str) -> str:
+        """The part of a document compared for near-duplicates: a course's description, else its rendered text"""
+        if document.metadata.get("kind") == "course":
+            description = course_description(document.page_content)
+            if len(description.split()) >= 5:
+                return description
+        return text
+
+
+    def pack(self, documents: list[Document]) -> dict:
+        """
+        Pack the documents into the budget
+
+        Returns {"context", "tokens", "raw_tokens", "saved", "documents", "duplicates", "dropped", "truncated"},
+        where raw_tokens are the tokens of the documents as RAG_PROMPT would get them unpacked
+        """
+        raw_tokens = self.count_tokens(str(documents))
+        kept, kept_shingles, kept_ids, aliases = [], [], set(), {}
+        duplicates = dropped = truncated = 0
+        remaining = self.budget
+        for document in documents:
+            text = self.render(document)
+            doc_id = document.metadata.get("code") or document.metadata.get("program")
+            similar = shingles(self.signature(document, text))
+            if doc_id is not None and doc_id in kept_ids:
+                duplicates += 1
+                continue
+            copy_of = next((i for i, other in enumerate(kept_shingles) if jaccard(similar, other) >= self.near_duplicate), None)
+            if copy_of is not None:
+                # e.g. the honors section of a course: only its code is added to the kept copy
+                duplicates += 1
+                if doc_id is not None:
+                    alias = doc_id.replace("\xa0", " ")
+                    tokens = self.count_tokens(f", {alias}" if copy_of in aliases else f" (same as: {alias})")
+                    if tokens <= remaining:
+                        aliases.setdefault(copy_of, []).append(alias)
+                        remaining -= tokens
+                continue
+            entry = f"[{len(kept) + 1}] {text}"
+            # plus the newline between entries
+            tokens = self.count_tokens(entry) + 1
+            if tokens > remaining:
+                if remaining - 1 < self.min_tokens:
+                    dropped += 1
+                    continue
+                # leaves room for the " ..." marking the cut, which can also merge differently with the cut text
+                full, cut = entry, remaining - 3
+                while tokens > remaining and cut >= 1:
+                    entry = self.truncate(full, cut)
+                    tokens = self.count_tokens(entry) + 1
+                    cut -= tokens - remaining
+                if tokens > remaining:
+                    # not even the start of the document fits
+                    dropped += 1
+                    continue
+                truncated += 1
+            kept.append(entry)
+            kept_shingles.append(similar)
+            if doc_id is not None:
+                kept_ids.add(doc_id)
+            remaining -= tokens
+        for i, ids in aliases.items():
+            kept[i] += f" (same as: {', '.join(ids)})"
+        context = "\n".join(kept)
+        tokens = self.count_tokens(context)
+        with self.lock:
+            self.totals["requests"] += 1
+            self.totals["raw_tokens"] += raw_tokens
+            self.totals["tokens"] += tokens
+            self.totals["duplicates"] += duplicates
+            self.totals["dropped"] += dropped
+        return {"context": context, "tokens": tokens, "raw_tokens": raw_tokens, "saved": raw_tokens - tokens,
+                "documents": len(kept), "duplicates": duplicates, "dropped": dropped, "truncated": truncated}
+
+
+    def metrics(self) -> dict:
+        requests = self.totals["requests"]
+        return dict(self.totals, saved=self.totals["raw_tokens"] - self.totals["tokens"],
+                    mean_tokens=self.totals["tokens"] / requests if requests else None,
+                    mean_raw_tokens=self.totals["raw_tokens"] / requests if requests else None)
@@ -1,4 +1,9 @@
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
+from langchain_core.embeddings import Embeddings
+from src.embedding_cache import EmbeddingCache
 
 # valid inputs
 VALID_MODELS: list[str] = ["text-embedding-3-small", "text-embedding-3-large"]
@@ -8,6 +13,11 @@ VALID_DIMENSIONS: dict[str, int] = {
     "text-embedding-3-large": 3072
 }
 
+# per-request limits of the OpenAI embeddings endpoint
+MAX_INPUT_TOKENS: int = 8191        # tokens in a single input text
+MAX_BATCH_ITEMS: int = 2048         # inputs in a single request
+MAX_BATCH_TOKENS: int = 300_000     # tokens summed over all inputs in a single request
+
 
 def format_list(lst: list[str]) -> str: 
     """Format a list of strings as 'item1', 'item2', 'item3', ..."""
@@ -23,7 +33,9 @@ class Embedder():
             client: OpenAI = None,
             model_name: str = "text-embedding-3-small", 
             dim: int = 1536, 
-            metric: str = "cosine"
+            metric: str = "cosine",
+            cache: EmbeddingCache = None,
+            encoding = None
         ) -> None:
         """
         Create a new Embedder
@@ -32,11 +44,16 @@ class Embedder():
             model_name: Name of the OpenAI embedding model to use: "text-embedding-3-small", "text-embedding-3-large"
             dim: Dimension of the embeddings
             metric: Metric to use for similarity search in Pinecone: "euclidean", "cosine", or "dotproduct"
+            cache: Optional EmbeddingCache; texts already embedded with this model and dim are not sent to OpenAI again
+            encoding: Tokenizer for chunk_texts (encode_batch / decode like a tiktoken Encoding); by default the
+                      tiktoken encoding of model_name, downloaded on first use
         """
         self.client: OpenAI = client
         self.model_name: str = model_name
         self.dim: int = dim
         self.metric: str = metric
+        self.cache: EmbeddingCache = cache
+        self.encoding = encoding
 
         # validate inputs
         if client is None:
@@ -60,38 +77,180 @@ class Embedder():
     def embed_text(self, text: str) -> list[float]:
         """Embed a given text using the selected model"""
         text = text.replace("\n", " ")
+        if self.cache is not None:
+            embedding = self.cache.get(self.model_name, self.dim, text)
+            if embedding is not None:
+                return embedding
         try:
-            embedding = self.client.embeddings.create(input = [text], model=self.model_name).data[0].embedding
+            embedding = self.client.embeddings.create(input = [text], model=self.model_name, dimensions=self.dim).data[0].embedding
         except Exception as e:
             print(f"Error embedding text: {str(e)}")
             raise
+        if self.cache is not None:
+            self.cache.put(self.model_name, self.dim, text, embedding)
         return embedding
 
 
     def embed_batch(self, texts: list[str]) -> list[list[float]]:
-        """Embed a batch of texts using the selected model"""
+        """Embed a batch of texts using the selected model, only sending cache misses to OpenAI"""
         texts = [text.replace("\n", " ") for text in texts]
-        try:
-            embeddings = self.client.embeddings.create(input = texts, model=self.model_name).data
-        except Exception as e:
-            print(f"Error embedding batch of texts: {str(e)}")
-            raise
+        if self.cache is not None:
+            embeddings = self.cache.get_many(self.model_name, self.dim, texts)
+        else:
+            embeddings = [None] * len(texts)
+
+        # embed each distinct missing text once, then scatter the results back into input order
+        missing = list(dict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+        if missing:
+            try:
+                data = self.client.embeddings.create(input = missing, model=self.model_name, dimensions=self.dim).data
+            except Exception as e:
+                print(f"Error embedding batch of texts: {str(e)}")
+                raise
+            fetched = dict(zip(missing, [item.embedding for item in data]))
+            embeddings = [fetched[text] if embedding is None else embedding for text, embedding in zip(texts, embeddings)]
+            if self.cache is not None:
+                self.cache.put_many(self.model_name, self.dim, missing, [fetched[text] for text in missing])
         return embeddings
     
 
-    def normalize_l2(self, x: list[float]) -> list[float]:
-        """Normalize a list of floats to have L2 norm of 1"""
+    def chunk_texts(
+            self, 
+            texts: list[str], 
+            max_items: int = MAX_BATCH_ITEMS, 
+            max_tokens: int = MAX_BATCH_TOKENS
+        ) -> list[list[int]]:
+        """
+        Split texts into request-sized chunks under the per-request item and token limits
+
+        Texts longer than MAX_INPUT_TOKENS are truncated in place. Returns lists of indices into texts.
+        """
+        if self.encoding is None:
+            try:
+                import tiktoken
+            except:
+                raise ImportError("This function requires tiktoken to be installed")
+            self.encoding = tiktoken.encoding_for_model(self.model_name)
+        encoding = self.encoding
+
+        chunks, chunk, chunk_tokens = [], [], 0
+        for i, tokens in enumerate(encoding.encode_batch(texts, disallowed_special=())):
+            if len(tokens) > MAX_INPUT_TOKENS:
+                tokens = tokens[:MAX_INPUT_TOKENS]
+                texts[i] = encoding.decode(tokens)
+            if chunk and (len(chunk) >= max_items or chunk_tokens + len(tokens) > max_tokens):
+                chunks.append(chunk)
+                chunk, chunk_tokens = [], 0
+            chunk.append(i)
+            chunk_tokens += len(tokens)
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+
+    def _create_with_backoff(self, texts: list[str], max_retries: int, base_delay: float) -> list[list[float]]:
+        """Call the embeddings endpoint, retrying rate-limited (429) requests with jittered exponential backoff"""
+        for attempt in range(max_retries + 1):
+            try:
+                data = self.client.embeddings.create(input = texts, model=self.model_name, dimensions=self.dim).data
+                return [item.embedding for item in data]
+            except Exception as e:
+                if getattr(e, "status_code", None) != 429 or attempt == max_retries:
+                    print(f"Error embedding batch of texts: {str(e)}")
+                    raise
+                time.sleep(base_delay * 2 ** attempt * (0.5 + random.random()))
+
+
+    def embed_bulk(
+            self, 
+            texts: list[str], 
+            max_workers: int = 4, 
+            normalize: bool = False,
+            max_items: int = MAX_BATCH_ITEMS, 
+            max_tokens: int = MAX_BATCH_TOKENS,
+            max_retries: int = 6,
+            base_delay: float = 1.0
+        ):
+        """
+        Embed an arbitrarily large list of texts into a single (len(texts), dim) float32 NumPy array
+
+        Args:
+            texts: Texts to embed
+            max_workers: Number of requests in flight at once
+            normalize: L2-normalize the rows of the result in place
+            max_items: Maximum number of inputs per request
+            max_tokens: Maximum number of tokens per request
+            max_retries: Retries for a request that is rate limited (HTTP 429)
+            base_delay: Initial backoff in seconds, doubled after every rate-limited attempt
+        """
         try:
             import numpy as np
         except:
             raise ImportError("This function requires numpy to be installed")
-        x = np.array(x)
-        if x.ndim == 1:
-            norm = np.linalg.norm(x)
-            if norm == 0:
-                return x
-            out = x / norm
-            return out.tolist()
-        else:
-            norm = np.linalg.norm(x, 2, axis=1, keepdims=True)
-            return np.where(norm == 0, x, x / norm).tolist()
\ No newline at end of file
+
+        texts = [text.replace("\n", " ") for text in texts]
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+
+        # fill cache hits directly, and only embed each distinct missing text once
+        rows_by_text = {}
+        cached = self.cache.get_many(self.model_name, self.dim, texts) if self.cache is not None else [None] * len(texts)
+        for i, (text, embedding) in enumerate(zip(texts, cached)):
+            if embedding is None:
+                rows_by_text.setdefault(text, []).append(i)
+            else:
+                out[i] = embedding
+        missing = list(rows_by_text)
+        request_texts = list(missing)   # may be truncated by chunk_texts, missing keeps the cache keys
+
+        def embed_chunk(chunk: list[int]) -> None:
+            embeddings = self._create_with_backoff([request_texts[i] for i in chunk], max_retries, base_delay)
+            for i, embedding in zip(chunk, embeddings):
+                out[rows_by_text[missing[i]]] = embedding
+            if self.cache is not None:
+                self.cache.put_many(self.model_name, self.dim, [missing[i] for i in chunk], embeddings)
+
+        if missing:
+            chunks = self.chunk_texts(request_texts, max_items=max_items, max_tokens=max_tokens)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # list() re-raises the first worker exception
+                list(executor.map(embed_chunk, chunks))
+
+        if normalize:
+            self.normalize_l2(out)
+        return out
+
+
+    def normalize_l2(self, x):
+        """
+        Normalize a vector (or each row of a matrix) to have L2 norm of 1
+
+        A float NumPy array is normalized in place and returned; lists are copied and a list is returned.
+        Zero vectors are left unchanged.
+        """
+        try:
+            import numpy as np
+        except:
+            raise ImportError("This function requires numpy to be installed")
+        if isinstance(x, np.ndarray) and np.issubdtype(x.dtype, np.floating):
+            norm = np.linalg.norm(x, 2, axis=-1, keepdims=True)
+            norm[norm == 0] = 1
+            x /= norm
+            return x
+        return self.normalize_l2(np.array(x, dtype=np.float64)).tolist()
+
+
+class EmbedderEmbeddings(Embeddings):
+    """
+    langchain Embeddings backed by an Embedder, so vector stores share its cache and bulk pipeline
+    """
+    def __init__(self, embedder: Embedder, max_workers: int = 4) -> None:
+        self.embedder: Embedder = embedder
+        self.max_workers: int = max_workers
+
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embedder.embed_bulk(texts, max_workers=self.max_workers).tolist()
+
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embedder.embed_text(text)
@@ -0,0 +1,161 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace (including newlines) so trivially different copies of a text share a cache entry"""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def text_key(model_name: str, dim: int, text: str) -> str:
+    """Content address of an embedding: hash of (model_name, dim, normalized text)"""
+    payload = f"{model_name}\x00{dim}\x00{normalize_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache():
+    """
+    On-disk, content-addressed cache of embeddings backed by SQLite
+    """
+    def __init__(self, path: str = "embeddings.sqlite", max_entries: int = 200_000) -> None:
+        """
+        Create (or open) an embedding cache
+
+        Args:
+            path: Path of the SQLite database file, or ":memory:" for a throwaway cache
+            max_entries: Maximum number of embeddings kept; the least recently used ones are evicted past this
+        """
+        if max_entries < 1:
+            raise ValueError(f"Invalid max_entries: {max_entries}. Must be at least 1")
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.path: str = path
+        self.max_entries: int = max_entries
+        self.hits: int = 0
+        self.misses: int = 0
+
+        # the same cache may be shared by several embedding worker threads
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings (last_access)")
+        self._conn.commit()
+
+
+    def __str__(self) -> str:
+        return f"EmbeddingCache(path={self.path}, entries={len(self)}, hits={self.hits}, misses={self.misses})"
+
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+    def get_many(self, model_name: str, dim: int, texts: list[str]) -> list[list[float]]:
+        """Look up a list of texts, returning the cached embedding or None for each one (in input order)"""
+        keys = [text_key(model_name, dim, text) for text in texts]
+        found = {}
+        with self._lock:
+            # sqlite caps the number of bound parameters, so look keys up in chunks
+            unique_keys = list(dict.fromkeys(keys))
+            for i in range(0, len(unique_keys), 500):
+                chunk = unique_keys[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+        results = [found.get(key) for key in keys]
+        hits = sum(result is not None for result in results)
+        self.hits += hits
+        self.misses += len(results) - hits
+        return results
+
+
+    def get(self, model_name: str, dim: int, text: str) -> list[float]:
+        """Look up a single text, returning None on a miss"""
+        return self.get_many(model_name, dim, [text])[0]
+
+
+    def put_many(self, model_name: str, dim: int, texts: list[str], embeddings: list[list[float]]) -> None:
+        """Store embeddings for a list of texts, evicting the least recently used entries if over capacity"""
+        if len(texts) != len(embeddings):
+            raise ValueError(f"Got {len(texts)} texts but {len(embeddings)} embeddings")
+        now = time.time()
+        rows = [
+            (text_key(model_name, dim, text), model_name, dim, array("f", embedding).tobytes(), now)
+            for text, embedding in zip(texts, embeddings)
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
+            self._evict()
+            self._conn.commit()
+
+
+    def put(self, model_name: str, dim: int, text: str, embedding: list[float]) -> None:
+        """Store the embedding of a single text"""
+        self.put_many(model_name, dim, [text], [embedding])
+
+
+    def _evict(self) -> None:
+        """Drop the least recently used entries beyond max_entries (caller holds the lock)"""
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                (excess,)
+            )
+
+
+    def clear(self) -> None:
+        """Remove every cached embedding and reset the counters"""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+
+    def stats(self) -> dict:
+        """Return the hit/miss counters and current size of the cache"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+    def close(self) -> None:
+        self._conn.close()
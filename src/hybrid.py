@@ -0,0 +1,159 @@
+import re
+import math
+from collections import Counter
+from typing import List
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+from src.codes import CODE_IN_TEXT_PATTERN, find_codes, normalize_code
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for", "from", "how", "i", "in", "is", "it",
+    "me", "my", "of", "on", "or", "the", "this", "to", "what", "when", "which", "who", "with"
+}
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    BM25 terms of a text, aware of course codes
+
+    "MAC 2311", "MAC\xa02311" and "MAC2311" all give the term "mac2311", plus "mac" and "2311" so a
+    subject or a course number alone still matches. Other words are lowercased, minus stopwords.
+    """
+    terms = []
+    for prefix, number, suffix in CODE_IN_TEXT_PATTERN.findall(text):
+        terms += [f"{prefix}{number}{suffix}".lower(), prefix.lower(), number]
+    rest = CODE_IN_TEXT_PATTERN.sub(" ", text).lower()
+    terms += [word for word in WORD_PATTERN.findall(rest) if word not in STOPWORDS]
+    return terms
+
+
+class BM25Index():
+    """
+    In-memory inverted index scored with Okapi BM25
+
+    Each term maps to numpy arrays of (document, term frequency), so a query only touches the postings of
+    its own terms and the scores accumulate into one array.
+    """
+    def __init__(self, documents: list[Document], k1: float = 1.5, b: float = 0.75) -> None:
+        """
+        Create a BM25Index
+
+        Args:
+            documents: Documents to index, e.g. the course and program documents of the vector index
+            k1: Term frequency saturation
+            b: Document length normalization
+        """
+        self.documents: list[Document] = list(documents)
+        self.k1: float = k1
+        self.b: float = b
+
+        postings = {}
+        lengths = np.zeros(len(self.documents), dtype=np.float32)
+        for i, document in enumerate(self.documents):
+            counts = Counter(tokenize(document.page_content))
+            lengths[i] = sum(counts.values())
+            for term, count in counts.items():
+                postings.setdefault(term, ([], []))
+                postings[term][0].append(i)
+                postings[term][1].append(count)
+        # documents of a course (metadata "code", as in course_documents) by normalized code
+        self.by_code: dict[str, int] = {
+            normalize_code(document.metadata["code"]): i for i, document in enumerate(self.documents) if "code" in document.metadata
+        }
+        self.lengths: np.ndarray = lengths
+        self.avg_length: float = float(lengths.mean()) if len(lengths) else 0.0
+        n = len(self.documents)
+        self.postings: dict[str, tuple[np.ndarray, np.ndarray, float]] = {
+            term: (np.array(docs, dtype=np.int32), np.array(counts, dtype=np.float32),
+                   math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5)))
+            for term, (docs, counts) in postings.items()
+        }
+
+
+    def __str__(self) -> str:
+        return f"BM25Index(documents={len(self.documents)}, terms={len(self.postings)})"
+
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+
+    @classmethod
+    def from_texts(cls, texts: list[str], metadatas: list[dict] = None, **kwargs) -> "BM25Index":
+        metadatas = metadatas or [{} for _ in texts]
+        return cls([Document(page_content=text, metadata=metadata) for text, metadata in zip(texts, metadatas)], **kwargs)
+
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore: VectorStore, **kwargs) -> "BM25Index":
+        """Index the same documents as a LocalVectorStore"""
+        if not hasattr(vectorstore, "texts"):
+            raise ValueError(f"Can't read the documents of a {type(vectorstore).__name__}, build the BM25Index from the catalog documents instead")
+        return cls.from_texts(vectorstore.texts, vectorstore.metadatas, **kwargs)
+
+
+    def search(self, query: str, k: int = 10) -> list[tuple[int, float]]:
+        """(document index, score) of the k best matching documents, best first"""
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * self.lengths / max(self.avg_length, 1e-9))
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            docs, counts, idf = self.postings[term]
+            scores[docs] += idf * counts * (self.k1 + 1) / (counts + norm[docs])
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(i), float(scores[i])) for i in matched]
+
+
+    def get_documents(self, query: str, k: int = 10) -> list[Document]:
+        return [self.documents[i] for i, _ in self.search(query, k)]
+
+
+def reciprocal_rank_fusion(rankings: list[list[Document]], k: int = 60) -> list[Document]:
+    """Merge ranked lists of documents: each list adds 1 / (k + rank) to a document's score"""
+    scores, documents = {}, {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, start=1):
+            key = document.page_content
+            scores[key] = scores.get(key, 0.0) + 1 / (k + rank)
+            documents.setdefault(key, document)
+    return [documents[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Vector top_k and BM25 top_k fused with reciprocal-rank fusion, all in-process
+
+    Courses named by code in the question go first: the student is asking about that exact course.
+    """
+    vectorstore: VectorStore
+    bm25: BM25Index
+    top_k: int = 10
+    top_n: int = 10
+    rrf_k: int = 60
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.fuse(query, self.vectorstore.similarity_search(query, k=self.top_k))
+
+
+    def fuse(self, query: str, dense: List[Document]) -> List[Document]:
+        """Fuse the vector top k of a query, retrieved already (e.g. in a batch), with its BM25 top k"""
+        sparse = self.bm25.get_documents(query, k=self.top_k)
+        named = [self.bm25.documents[self.bm25.by_code[code]] for code in find_codes(query) if code in self.bm25.by_code]
+        fused = reciprocal_rank_fusion([dense, sparse], k=self.rrf_k)
+        named_texts = {document.page_content for document in named}
+        return (named + [document for document in fused if document.page_content not in named_texts])[:self.top_n]
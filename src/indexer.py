@@ -0,0 +1,197 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+from langchain_core.vectorstores import VectorStore
+from src.codes import normalize_code
+
+
+def course_documents(courses: dict) -> dict[str, tuple[str, dict]]:
+    """
+    Build {course code: (text, metadata)} from the courses.json written by get_courses.main
+
+    A course listed under several majors is one document whose "majors" lists all of them, so a
+    filter={"majors": major} search finds it under each.
+    """
+    documents = {}
+    for major, major_info in courses.items():
+        for course in major_info["courses"]:
+            code = course["code"].replace("\xa0", " ")
+            key = normalize_code(code)
+            majors = documents[key][1]["majors"] if key in documents else []
+            text = f"{code} {course['name']} ({course['credits']} credits): {course['description']}"
+            if course["prerequisites"]:
+                text += f" Prerequisites: {', '.join(course['prerequisites'])}."
+            if course["grading_scheme"]:
+                text += f" Grading Scheme: {course['grading_scheme']}."
+            # "schedules" is randomly generated on every scrape, so it is left out of the indexed content
+            metadata = {
+                "kind": "course",
+                "code": code,
+                "name": course["name"],
+                "credits": course["credits"],
+                "majors": majors + [major] if major not in majors else majors,
+                "prerequisites": course["prerequisites"]
+            }
+            documents[key] = (text, metadata)
+    return documents
+
+
+def program_documents(programs: dict) -> dict[str, tuple[str, dict]]:
+    """Build {"Program (type)": (text, metadata)} from the programs.json written by get_degrees.main"""
+    documents = {}
+    for program_key, details in programs.items():
+        sections = {key: value for key, value in details.items() if key not in ("url", "type") and value}
+        text = f"{program_key}: " + json.dumps(sections, ensure_ascii=False)
+        metadata = {"kind": "program", "program": program_key, "type": details["type"], "url": details["url"]}
+        documents[program_key] = (text, metadata)
+    return documents
+
+
+def content_hash(text: str, metadata: dict) -> str:
+    """Hash of everything that ends up in the index for a document"""
+    payload = text + "\x00" + json.dumps(metadata, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class IncrementalIndexer():
+    """
+    Keeps a vector store in sync with the catalog by only writing documents whose content changed
+    """
+    def __init__(
+            self, 
+            vectorstore: VectorStore, 
+            manifest_path: str = "index_manifest.json", 
+            batch_size: int = 100,
+            checkpoint: bool = True
+        ) -> None:
+        """
+        Create an IncrementalIndexer
+
+        Args:
+            vectorstore: Store to write to; must support add_texts(ids=...) as an upsert and delete(ids=...)
+            manifest_path: JSON file mapping each indexed document id to its content hash
+            batch_size: Number of documents embedded and written per call to the store
+            checkpoint: Save the manifest after every batch. Right for stores that persist each write (Pinecone);
+                        for a LocalVectorStore, turn it off and call save_manifest() after saving the store
+        """
+        if batch_size < 1:
+            raise ValueError(f"Invalid batch_size: {batch_size}. Must be at least 1")
+        self.vectorstore: VectorStore = vectorstore
+        self.manifest_path: str = manifest_path
+        self.batch_size: int = batch_size
+        self.checkpoint: bool = checkpoint
+        self.manifest: dict[str, str] = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as file:
+                self.manifest = json.load(file)
+
+
+    @property
+    def version(self) -> str:
+        """Hash of the manifest, i.e. of the indexed content; changes whenever a sync writes anything"""
+        payload = json.dumps(self.manifest, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+    def save_manifest(self) -> None:
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self.manifest, file)
+        os.replace(tmp_path, self.manifest_path)
+
+
+    def sync(self, documents: dict[str, tuple[str, dict]], prefix: str = None) -> dict:
+        """
+        Upsert new and changed documents and delete ones that disappeared
+
+        Args:
+            documents: {id: (text, metadata)} describing the full current state of the catalog
+            prefix: Only ids already in the manifest with this prefix are considered for deletion,
+                    so courses and programs can be synced separately (e.g. prefix="course:")
+
+        Returns a report of how much work was done.
+        """
+        start = time.perf_counter()
+        hashes = {id_: content_hash(text, metadata) for id_, (text, metadata) in documents.items()}
+        added = [id_ for id_ in documents if id_ not in self.manifest]
+        updated = [id_ for id_ in documents if id_ in self.manifest and self.manifest[id_] != hashes[id_]]
+        deleted = [
+            id_ for id_ in self.manifest
+            if id_ not in documents and (prefix is None or id_.startswith(prefix))
+        ]
+
+        # with checkpointing, an interrupted run resumes where it stopped
+        changed = added + updated
+        for i in range(0, len(changed), self.batch_size):
+            batch = changed[i:i + self.batch_size]
+            self.vectorstore.add_texts(
+                [documents[id_][0] for id_ in batch], metadatas=[documents[id_][1] for id_ in batch], ids=batch
+            )
+            self.manifest.update((id_, hashes[id_]) for id_ in batch)
+            if self.checkpoint:
+                self.save_manifest()
+        for i in range(0, len(deleted), self.batch_size):
+            batch = deleted[i:i + self.batch_size]
+            self.vectorstore.delete(ids=batch)
+            for id_ in batch:
+                del self.manifest[id_]
+            if self.checkpoint:
+                self.save_manifest()
+
+        return {
+            "added": len(added),
+            "updated": len(updated),
+            "deleted": len(deleted),
+            "unchanged": len(documents) - len(changed),
+            "batches": -(-len(changed) // self.batch_size) + -(-len(deleted) // self.batch_size),
+            "seconds": time.perf_counter() - start
+        }
+
+
+def main():
+    from openai import OpenAI
+    from dotenv import load_dotenv
+    from src.embedder import Embedder, EmbedderEmbeddings
+    from src.embedding_cache import EmbeddingCache
+    from src.vectorstore import LocalVectorStore
+
+    parser = argparse.ArgumentParser(description="Incrementally sync the catalog into a local vector store")
+    parser.add_argument("--courses", default="courses.json", help="output of get_courses.py")
+    parser.add_argument("--programs", default=os.path.join("data", "programs.json"), help="output of get_degrees.py")
+    parser.add_argument("--store", default="index", help="LocalVectorStore directory")
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    load_dotenv()
+    embedding = EmbedderEmbeddings(Embedder(OpenAI(), cache=EmbeddingCache(os.path.join(args.store, "embeddings.sqlite"))))
+    if os.path.exists(os.path.join(args.store, "docs.json")):
+        store = LocalVectorStore.load(args.store, embedding)
+    else:
+        store = LocalVectorStore(embedding)
+    indexer = IncrementalIndexer(
+        store, os.path.join(args.store, "index_manifest.json"), batch_size=args.batch_size, checkpoint=False
+    )
+
+    # each source only deletes its own ids, so a missing file never wipes the other half of the index
+    sources = [("course:", args.courses, course_documents), ("program:", args.programs, program_documents)]
+    changed = False
+    for prefix, path, build_documents in sources:
+        if not os.path.exists(path):
+            print(f"Skipping {path}: file not found")
+            continue
+        with open(path, "r", encoding="utf-8") as file:
+            documents = {prefix + id_: doc for id_, doc in build_documents(json.load(file)).items()}
+        report = indexer.sync(documents, prefix=prefix)
+        changed = changed or bool(report["added"] or report["updated"] or report["deleted"])
+        print(f"Synced {len(documents)} documents from {path} in {report['seconds']:.2f}s: "
+              f"{report['added']} added, {report['updated']} updated, {report['deleted']} deleted, {report['unchanged']} unchanged")
+
+    if changed:
+        store.save(args.store)
+        indexer.save_manifest()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+import json
+import time
+import bisect
+import threading
+from typing import Any, Optional
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+
+# upper bounds of the latency buckets in seconds, roughly x2 apart like the Prometheus client defaults
+LATENCY_BUCKETS: list[float] = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+COUNT_BUCKETS: list[float] = [0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 500, 1000, 2500, 5000]
+
+
+class Histogram():
+    """Fixed-bucket histogram (constant memory) with quantiles interpolated inside the bucket, like Prometheus"""
+    def __init__(self, buckets: list[float]) -> None:
+        self.buckets: list[float] = buckets
+        self.counts: list[int] = [0] * (len(buckets) + 1)    # last bucket is +Inf
+        self.sum: float = 0.0
+        self.count: int = 0
+
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+    def summary(self) -> dict:
+        return {"count": self.count, "sum": self.sum, "mean": self.sum / self.count if self.count else None,
+                "p50": self.quantile(0.5), "p95": self.quantile(0.95), "p99": self.quantile(0.99)}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) for models that don't report usage"""
+    return max(1, len(text) // 4) if text else 0
+
+
+class LatencyTracker(BaseCallbackHandler):
+    """
+    Callback handler recording where the time of each question goes
+
+    Stages are named after the run that took the time: "retriever:<class>" for each retriever (e.g.
+    VectorStoreRetriever, MultiQueryRetriever, HybridRetriever), "rerank" for the compression step of a
+    ContextualCompressionRetriever (its time minus its base retriever's), "llm:multiquery" for the query
+    rewriting call, "llm:answer" for the answer and "total" for the whole chain. Also tracks retrieved doc
+    counts, prompt/completion tokens and the answer's time to first token. Pass it to get_chain(tracker=...);
+    without one nothing is attached, so there is no overhead.
+    """
+    # handlers are cheap, run them in the event loop instead of a thread pool
+    run_inline = True
+
+    def __init__(self, trace_path: str = None) -> None:
+        """
+        Create a LatencyTracker
+
+        Args:
+            trace_path: Optional JSON lines file getting one trace per question (every stage with its start and duration)
+        """
+        self.trace_path: str = trace_path
+        self.lock = threading.Lock()
+        self.runs: dict[UUID, dict] = {}
+        self.traces: dict[UUID, dict] = {}
+        self.latency: dict[str, Histogram] = {}
+        self.docs: Histogram = Histogram(COUNT_BUCKETS)
+        self.ttft: Histogram = Histogram(LATENCY_BUCKETS)
+        self.tokens: dict[str, int] = {"prompt": 0, "completion": 0}
+        self.errors: int = 0
+
+
+    def __str__(self) -> str:
+        return f"LatencyTracker(questions={self.latency['total'].count if 'total' in self.latency else 0}, trace_path={self.trace_path})"
+
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+    def _start(self, kind: str, name: str, run_id: UUID, parent_run_id: Optional[UUID]) -> None:
+        now = time.perf_counter()
+        with self.lock:
+            parent = self.runs.get(parent_run_id)
+            root = parent["root"] if parent else run_id
+            self.runs[run_id] = {"kind": kind, "name": name, "parent": parent_run_id, "root": root, "start": now,
+                                 "children": 0.0, "in_retriever": kind == "retriever" or bool(parent and parent["in_retriever"])}
+            if parent is None:
+                self.traces[run_id] = {"start": now, "stages": [], "docs": 0, "tokens": {"prompt": 0, "completion": 0}, "ttft": None}
+
+
+    def _end(self, run_id: UUID, stage: str = None) -> Optional[dict]:
+        """Close a run, recording its time under stage (if given); returns the run"""
+        now = time.perf_counter()
+        with self.lock:
+            run = self.runs.pop(run_id, None)
+            if run is None:
+                return None
+            seconds = now - run["start"]
+            run["seconds"] = seconds
+            if run["parent"] in self.runs:
+                self.runs[run["parent"]]["children"] += seconds
+            trace = self.traces.get(run["root"])
+            if stage is not None:
+                self._observe(stage, seconds)
+                if trace is not None:
+                    trace["stages"].append({"stage": stage, "start_ms": (run["start"] - trace["start"]) * 1000, "ms": seconds * 1000})
+            if run_id == run["root"]:
+                self._observe("total", seconds)
+                self.traces.pop(run_id, None)
+                if trace is not None:
+                    trace["total_ms"] = seconds * 1000
+                    if trace["ttft"] is not None:
+                        self.ttft.observe(trace["ttft"])
+                    self.docs.observe(trace["docs"])
+                    if self.trace_path:
+                        self._dump(trace)
+            return run
+
+
+    def _observe(self, stage: str, seconds: float) -> None:
+        if stage not in self.latency:
+            self.latency[stage] = Histogram(LATENCY_BUCKETS)
+        self.latency[stage].observe(seconds)
+
+
+    def _dump(self, trace: dict) -> None:
+        record = {"question": trace.get("question"), "total_ms": trace["total_ms"],
+                  "ttft_ms": trace["ttft"] * 1000 if trace["ttft"] is not None else None,
+                  "docs": trace["docs"], "tokens": trace["tokens"], "stages": trace["stages"]}
+        with open(self.trace_path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(record) + "\n")
+
+
+    @staticmethod
+    def _name(serialized: Optional[dict], kwargs: dict) -> str:
+        if kwargs.get("name"):
+            return kwargs["name"]
+        if serialized:
+            return serialized.get("name") or (serialized.get("id") or ["unknown"])[-1]
+        return "unknown"
+
+
+    def on_chain_start(self, serialized: dict, inputs: Any, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        self._start("chain", self._name(serialized, kwargs), run_id, parent_run_id)
+        if parent_run_id is None and run_id in self.traces:
+            if isinstance(inputs, dict):
+                inputs = inputs.get("input", inputs.get("question"))
+            self.traces[run_id]["question"] = inputs if isinstance(inputs, str) else None
+
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self.runs.get(run_id)
+        if run is not None and run["root"] == run_id:
+            self.errors += 1
+        self._end(run_id)
+
+
+    def on_retriever_start(self, serialized: dict, query: str, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        self._start("retriever", self._name(serialized, kwargs), run_id, parent_run_id)
+
+
+    def on_retriever_end(self, documents, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self.runs.get(run_id)
+        if run is None:
+            return
+        run = self._end(run_id, f"retriever:{run['name']}")
+        if run["name"] == "ContextualCompressionRetriever":
+            # what the compressor (e.g. CohereRerank) took on top of the base retriever
+            self._observe("rerank", max(run["seconds"] - run["children"], 0.0))
+        with self.lock:
+            trace = self.traces.get(run["root"])
+            parent = self.runs.get(run["parent"])
+            # count the documents of the outermost retriever only
+            if trace is not None and not (parent and parent["in_retriever"]):
+                trace["docs"] += len(documents)
+
+
+    def on_retriever_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+
+    def on_chat_model_start(self, serialized: dict, messages, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        self._start("llm", self._name(serialized, kwargs), run_id, parent_run_id)
+        self.runs[run_id]["prompt"] = "".join(str(message.content) for batch in messages for message in batch)
+        self.runs[run_id]["streamed"] = 0
+
+
+    def on_llm_start(self, serialized: dict, prompts: list[str], *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        self._start("llm", self._name(serialized, kwargs), run_id, parent_run_id)
+        self.runs[run_id]["prompt"] = "".join(prompts)
+        self.runs[run_id]["streamed"] = 0
+
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self.runs.get(run_id)
+        if run is None:
+            return
+        run["streamed"] += 1
+        if run["streamed"] == 1 and not run["in_retriever"]:
+            trace = self.traces.get(run["root"])
+            if trace is not None and trace["ttft"] is None:
+                trace["ttft"] = time.perf_counter() - trace["start"]
+
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        run = self.runs.get(run_id)
+        if run is None:
+            return
+        run = self._end(run_id, "llm:multiquery" if run["in_retriever"] else "llm:answer")
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        text = "".join(generation.text for generations in response.generations for generation in generations)
+        prompt = usage.get("prompt_tokens") or estimate_tokens(run["prompt"])
+        completion = usage.get("completion_tokens") or run["streamed"] or estimate_tokens(text)
+        with self.lock:
+            self.tokens["prompt"] += prompt
+            self.tokens["completion"] += completion
+            trace = self.traces.get(run["root"])
+            if trace is not None:
+                trace["tokens"]["prompt"] += prompt
+                trace["tokens"]["completion"] += completion
+
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end(run_id)
+
+
+    def to_json(self) -> dict:
+        """Aggregates so far: latency per stage in seconds, time to first token, docs per question and tokens"""
+        with self.lock:
+            return {
+                "stages": {stage: histogram.summary() for stage, histogram in sorted(self.latency.items())},
+                "ttft": self.ttft.summary(),
+                "docs": self.docs.summary(),
+                "tokens": dict(self.tokens),
+                "errors": self.errors
+            }
+
+
+    def to_prometheus(self, prefix: str = "rag") -> str:
+        """Aggregates so far in the Prometheus text exposition format"""
+        lines = []
+
+        def histogram_lines(name: str, histogram: Histogram, labels: str = "") -> None:
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + [float("inf")], histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f'{name}_bucket{{{labels}{"," if labels else ""}le="{le}"}} {cumulative}')
+            label_set = f"{{{labels}}}" if labels else ""
+            lines.append(f"{name}_sum{label_set} {histogram.sum:g}")
+            lines.append(f"{name}_count{label_set} {histogram.count}")
+
+        with self.lock:
+            lines += [f"# HELP {prefix}_stage_seconds Wall time of each stage of the RAG chain",
+                      f"# TYPE {prefix}_stage_seconds histogram"]
+            for stage, histogram in sorted(self.latency.items()):
+                histogram_lines(f"{prefix}_stage_seconds", histogram, f'stage="{stage}"')
+            lines += [f"# HELP {prefix}_ttft_seconds Time to the first answer token",
+                      f"# TYPE {prefix}_ttft_seconds histogram"]
+            histogram_lines(f"{prefix}_ttft_seconds", self.ttft)
+            lines += [f"# HELP {prefix}_retrieved_documents Documents retrieved per question",
+                      f"# TYPE {prefix}_retrieved_documents histogram"]
+            histogram_lines(f"{prefix}_retrieved_documents", self.docs)
+            lines += [f"# HELP {prefix}_tokens_total LLM tokens", f"# TYPE {prefix}_tokens_total counter"]
+            for kind, count in self.tokens.items():
+                lines.append(f'{prefix}_tokens_total{{kind="{kind}"}} {count}')
+            lines += [f"# HELP {prefix}_errors_total Questions that failed", f"# TYPE {prefix}_errors_total counter",
+                      f"{prefix}_errors_total {self.errors}"]
+        return "\n".join(lines) + "\n"
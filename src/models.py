@@ -1,38 +1,67 @@
 import os
 import json
-from langchain_groq import ChatGroq
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_community.chat_models import ChatCohere
-from langchain_google_genai import ChatGoogleGenerativeAI
+import importlib
+from functools import lru_cache
+from typing import List, Tuple
 from langchain_core.language_models.chat_models import BaseChatModel
-from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
+from src.pool import ProviderPool
 
-# map provider to langchain ChatModel
+# map provider to the "module:class" of its langchain ChatModel, imported on first use:
+# a process only ever pays the import of the provider it talks to
 chat = {
-    "groq": ChatGroq,
-    "openai": ChatOpenAI,
-    "anthropic": ChatAnthropic,
-    "google": ChatGoogleGenerativeAI,
-    "cohere": ChatCohere
+    "groq": "langchain_groq:ChatGroq",
+    "openai": "langchain_openai:ChatOpenAI",
+    "anthropic": "langchain_anthropic:ChatAnthropic",
+    "google": "langchain_google_genai:ChatGoogleGenerativeAI",
+    "cohere": "langchain_community.chat_models:ChatCohere"
 }
 
-def get_llm(provider: str, model: str, temperature: int, max_tokens: int, path: str = ".", stream: bool = False) -> BaseChatModel:
-    """Returns a prepared langchain ChatModel"""
+# clients built by get_client, kept warm (with their HTTP connection pools) for reuse
+clients: dict = {}
+
+
+@lru_cache(maxsize=None)
+def load_providers(path: str = ".") -> dict:
+    """Valid models per provider from providers.json, parsed once per path"""
+    filepath = os.path.join(path, "providers.json")
+    with open(filepath, "r") as file:
+        return json.load(file)
+
+
+@lru_cache(maxsize=None)
+def get_chat_class(provider: str) -> type:
+    """The langchain ChatModel class of a provider, importing its package the first time"""
+    module_name, class_name = chat[provider].split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def get_llm(
+        provider: str,
+        model: str,
+        temperature: int,
+        max_tokens: int,
+        path: str = ".",
+        stream: bool = False,
+        stdout: bool = False
+    ) -> BaseChatModel:
+    """
+    Returns a prepared langchain ChatModel
+
+    stream makes invoke() generate token by token too (astream() always streams); stdout echoes the
+    tokens to the console, for command line use
+    """
     print("Getting LLM API")
     provider = provider.lower()
     model = model.lower()
 
-    # load the valid models 
-    filepath = os.path.join(path, "providers.json")
-    with open(filepath, "r") as file:
-        providers = json.load(file)
+    # load the valid models
+    providers = load_providers(os.path.abspath(path))
 
     if provider in providers:
         # check that the model is valid
         if model in providers[provider]["models"]:
             # save the correct langchain ChatModel
-            LLM = chat[provider]
+            LLM = get_chat_class(provider)
         else:
             # invalid model
             valid_models_str = ", ".join(providers[provider]["models"])
@@ -41,5 +70,43 @@ def get_llm(provider: str, model: str, temperature: int, max_tokens: int, path:
         # invalid provider
         valid_providers_str = ", ".join(providers.keys())
         raise Exception(f"Invalid provider: '{provider}'. Valid providers are: {valid_providers_str}")
-    # return LLM(model=model, temperature=temperature, max_tokens=max_tokens, streaming=stream, callbacks=[StreamingStdOutCallbackHandler()])
-    return LLM(model=model, temperature=temperature, max_tokens=max_tokens, callbacks=[StreamingStdOutCallbackHandler()])
\ No newline at end of file
+    kwargs = {"streaming": True} if stream else {}
+    callbacks = None
+    if stdout:
+        from langchain_core.callbacks import StreamingStdOutCallbackHandler
+        callbacks = [StreamingStdOutCallbackHandler()]
+    return LLM(model=model, temperature=temperature, max_tokens=max_tokens, callbacks=callbacks, **kwargs)
+
+
+def get_client(
+        provider: str,
+        model: str,
+        temperature: int,
+        max_tokens: int,
+        path: str = ".",
+        stream: bool = False
+    ) -> BaseChatModel:
+    """get_llm, returning the client of an earlier call with the same settings instead of building a new one"""
+    key = (provider.lower(), model.lower(), temperature, max_tokens, os.path.abspath(path), stream)
+    if key not in clients:
+        clients[key] = get_llm(provider, model, temperature, max_tokens, path=path, stream=stream)
+    return clients[key]
+
+
+def get_pool(
+        models: List[Tuple[str, str]],
+        temperature: int,
+        max_tokens: int,
+        path: str = ".",
+        stream: bool = False,
+        **kwargs
+    ) -> ProviderPool:
+    """
+    Returns a ProviderPool over (provider, model) pairs in priority order, e.g.
+    [("groq", "llama3-70b-8192"), ("openai", "gpt-3.5-turbo")], reusing warm clients
+
+    kwargs (hedge_after, max_hedges, cooldown, alpha) are passed to the ProviderPool
+    """
+    members = [get_client(provider, model, temperature, max_tokens, path=path, stream=stream) for provider, model in models]
+    names = [f"{provider.lower()}:{model.lower()}" for provider, model in models]
+    return ProviderPool(members=members, names=names, **kwargs)
@@ -0,0 +1,264 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.pydantic_v1 import Field, root_validator
+from src.instrumentation import LATENCY_BUCKETS, Histogram
+
+# sync calls race in threads; a thread can't be cancelled, so the loser of a hedge runs to completion here
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="provider-pool")
+
+
+class MemberStats():
+    """Latency and health of one model of a ProviderPool"""
+    def __init__(self, name: str, alpha: float) -> None:
+        self.name: str = name
+        self.alpha: float = alpha
+        self.lock = threading.Lock()
+        self.latency: Histogram = Histogram(LATENCY_BUCKETS)
+        self.ewma: Optional[float] = None       # smoothed latency in seconds, None until measured
+        self.requests: int = 0                  # calls started, hedges included
+        self.wins: int = 0                      # calls whose response was used
+        self.errors: int = 0
+        self.unhealthy_until: float = 0.0
+
+
+    def __str__(self) -> str:
+        ewma = f"{self.ewma * 1000:.0f}ms" if self.ewma is not None else None
+        return f"MemberStats(name={self.name}, ewma={ewma}, requests={self.requests}, errors={self.errors})"
+
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.unhealthy_until
+
+
+    def success(self, seconds: float) -> None:
+        with self.lock:
+            self.latency.observe(seconds)
+            self.ewma = seconds if self.ewma is None else self.alpha * seconds + (1 - self.alpha) * self.ewma
+
+
+    def slower_than(self, seconds: float) -> None:
+        """A call given up after seconds (it lost a hedge): a lower bound of its latency, for the EWMA only"""
+        with self.lock:
+            if self.ewma is None or seconds > self.ewma:
+                self.ewma = seconds if self.ewma is None else self.alpha * seconds + (1 - self.alpha) * self.ewma
+
+
+    def failure(self, cooldown: float) -> None:
+        with self.lock:
+            self.errors += 1
+            self.unhealthy_until = time.monotonic() + cooldown
+
+
+    def summary(self) -> dict:
+        latency = self.latency.summary()
+        return {"healthy": self.healthy, "requests": self.requests, "wins": self.wins, "errors": self.errors,
+                "ewma_ms": self.ewma * 1000 if self.ewma is not None else None,
+                "p50_ms": latency["p50"] * 1000 if latency["p50"] is not None else None,
+                "p95_ms": latency["p95"] * 1000 if latency["p95"] is not None else None}
+
+
+class ProviderPool(BaseChatModel):
+    """
+    Chat model spreading calls over several chat models (e.g. the same question to Groq and OpenAI)
+
+    Each call goes to the fastest healthy model (smoothed latency; unmeasured models keep their priority
+    order). When it hasn't answered after hedge_after seconds, the call is hedged: the same request goes to
+    the next model too, the first response is used and the other request is cancelled, its smoothed latency
+    raised to at least the time it was given so routing moves off a model that slowed down. A model raising an
+    error is failed over to the next one right away and skipped for cooldown seconds. The latency is the
+    time to the whole response, or to the first token when streaming. Usable anywhere a single chat model
+    is, e.g. get_chain(ProviderPool(members=[...]), ...), or built from (provider, model) pairs by get_pool.
+    """
+    members: List[BaseChatModel]
+    names: List[str] = Field(default_factory=list)
+    hedge_after: float = 2.0
+    max_hedges: int = 1
+    cooldown: float = 30.0
+    alpha: float = 0.3
+    stats: List[Any] = Field(default_factory=list)
+
+    @root_validator(skip_on_failure=True)
+    def check_members(cls, values: dict) -> dict:
+        members = values["members"]
+        if not members:
+            raise ValueError("Invalid members: a ProviderPool needs at least one chat model")
+        names = values.get("names") or [f"{i}:{member._llm_type}" for i, member in enumerate(members)]
+        if len(names) != len(members):
+            raise ValueError(f"Invalid names: got {len(names)} names for {len(members)} members")
+        values["names"] = names
+        values["stats"] = [MemberStats(name, values["alpha"]) for name in names]
+        return values
+
+
+    @property
+    def _llm_type(self) -> str:
+        return "provider-pool"
+
+
+    def route(self) -> List[int]:
+        """Member indices in the order to try them: healthy first, then fastest, then priority"""
+        return sorted(range(len(self.members)), key=lambda i: (
+            not self.stats[i].healthy,
+            self.stats[i].ewma if self.stats[i].ewma is not None else float("inf"),
+            i
+        ))
+
+
+    def metrics(self) -> dict:
+        return {stats.name: stats.summary() for stats in self.stats}
+
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        message = self._race(lambda member: member.invoke(messages, stop=stop, **kwargs))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        message = await self._arace(lambda member: member.ainvoke(messages, stop=stop, **kwargs))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        def first_chunk(member: BaseChatModel):
+            stream = member.stream(messages, stop=stop, **kwargs)
+            return stream, next(stream, None)
+
+        # a losing stream is closed once its first chunk is in, which ends its request
+        stream, chunk = self._race(first_chunk, on_lost=lambda result: result[0].close())
+        try:
+            while chunk is not None:
+                yield ChatGenerationChunk(message=chunk)
+                chunk = next(stream, None)
+        finally:
+            stream.close()
+
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        async def first_chunk(member: BaseChatModel):
+            stream = member.astream(messages, stop=stop, **kwargs)
+            try:
+                return stream, await stream.__anext__()
+            except StopAsyncIteration:
+                return stream, None
+            except BaseException:
+                # includes the cancellation of a hedge that lost: close the request
+                await stream.aclose()
+                raise
+
+        async def close(result) -> None:
+            await result[0].aclose()
+
+        # once the first token is out there is no failing over anymore: later errors are raised
+        stream, chunk = await self._arace(first_chunk, on_lost=close)
+        try:
+            while chunk is not None:
+                yield ChatGenerationChunk(message=chunk)
+                chunk = await stream.__anext__()
+        except StopAsyncIteration:
+            pass
+        finally:
+            await stream.aclose()
+
+
+    def _started(self, i: int) -> float:
+        with self.stats[i].lock:
+            self.stats[i].requests += 1
+        return time.perf_counter()
+
+
+    def _won(self, i: int, start: float) -> None:
+        self.stats[i].success(time.perf_counter() - start)
+        with self.stats[i].lock:
+            self.stats[i].wins += 1
+
+
+    def _lost(self, i: int, start: float) -> None:
+        # without this a member that slowed down would keep its old EWMA, and first place in route(), forever
+        self.stats[i].slower_than(time.perf_counter() - start)
+
+
+    def _race(self, call: Callable[[BaseChatModel], Any], on_lost: Callable[[Any], None] = None) -> Any:
+        """Run call on the members in routing order, hedging and failing over, in threads"""
+        order, pending, error, hedges = self.route(), {}, None, 0
+
+        def launch() -> None:
+            i = order.pop(0)
+            pending[_executor.submit(call, self.members[i])] = (i, self._started(i))
+
+        launch()
+        while pending:
+            can_hedge = order and hedges < self.max_hedges
+            done, _ = wait(pending, timeout=self.hedge_after if can_hedge else None, return_when=FIRST_COMPLETED)
+            if not done:
+                hedges += 1
+                launch()
+                continue
+            for future in done:
+                i, start = pending.pop(future)
+                if future.exception() is None:
+                    self._won(i, start)
+                    for other in pending:
+                        self._lost(*pending[other])
+                        # not started yet: dropped, already running: its result is discarded
+                        if not other.cancel() and on_lost is not None:
+                            other.add_done_callback(lambda f: f.exception() is None and on_lost(f.result()))
+                    return future.result()
+                error = future.exception()
+                self.stats[i].failure(self.cooldown)
+            if not pending and order:
+                launch()
+        raise error
+
+
+    async def _arace(self, call: Callable[[BaseChatModel], Any], on_lost: Callable[[Any], Any] = None) -> Any:
+        """Run call on the members in routing order, hedging and failing over, cancelling the losers"""
+        order, pending, error, hedges = self.route(), {}, None, 0
+
+        def launch() -> None:
+            i = order.pop(0)
+            pending[asyncio.ensure_future(call(self.members[i]))] = (i, self._started(i))
+
+        launch()
+        try:
+            while pending:
+                can_hedge = order and hedges < self.max_hedges
+                done, _ = await asyncio.wait(pending, timeout=self.hedge_after if can_hedge else None,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedges += 1
+                    launch()
+                    continue
+                for task in done:
+                    i, start = pending.pop(task)
+                    if task.exception() is None:
+                        self._won(i, start)
+                        return task.result()
+                    error = task.exception()
+                    self.stats[i].failure(self.cooldown)
+                if not pending and order:
+                    launch()
+            raise error
+        finally:
+            for task in pending:
+                self._lost(*pending[task])
+                task.cancel()
+            for result in await asyncio.gather(*pending, return_exceptions=True):
+                # a loser that finished at the same time as the winner
+                if on_lost is not None and not isinstance(result, BaseException):
+                    await on_lost(result)
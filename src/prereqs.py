@@ -0,0 +1,285 @@
+import json
+import argparse
+from collections import deque
+import numpy as np
+from src.codes import display_code, normalize_code
+
+
+class PrereqGraph():
+    """
+    Compiled prerequisite graph of the catalog
+
+    Course codes are interned to integer ids and the "course -> prerequisite" edges are kept in CSR form
+    (indptr/indices). The transitive closure is precomputed as one bitset (a Python int) per course, so
+    eligibility and ancestor queries are bit operations instead of repeated walks over courses.json.
+    """
+    def __init__(self, codes: list[str], indptr, indices, defined) -> None:
+        """
+        Create a PrereqGraph from its CSR arrays, use from_courses() or load() to build one
+
+        Args:
+            codes: Display code of each id, e.g. "COP 3503C"
+            indptr: Prerequisites of id i are indices[indptr[i]:indptr[i + 1]]
+            indices: Concatenated prerequisite ids
+            defined: Whether each id is a course in the catalog (False for codes only seen as a prerequisite)
+        """
+        self.codes: list[str] = list(codes)
+        self.ids: dict[str, int] = {normalize_code(code): i for i, code in enumerate(self.codes)}
+        self.indptr: np.ndarray = np.asarray(indptr, dtype=np.int32)
+        self.indices: np.ndarray = np.asarray(indices, dtype=np.int32)
+        self.defined: np.ndarray = np.asarray(defined, dtype=bool)
+
+        self.direct: list[int] = [self._to_bits(self.prereq_ids(i)) for i in range(len(self.codes))]
+        self.closure: list[int] = []
+        self.cycles: list[list[str]] = []
+        self._compute_closure()
+
+
+    def __str__(self) -> str:
+        return (f"PrereqGraph(courses={int(self.defined.sum())}, edges={len(self.indices)}, "
+                f"dangling={len(self.dangling())}, cycles={len(self.cycles)})")
+
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+
+    def __contains__(self, code: str) -> bool:
+        return normalize_code(code) in self.ids
+
+
+    @classmethod
+    def from_courses(cls, courses: dict) -> "PrereqGraph":
+        """Build the graph from the courses.json structure written by get_courses.main"""
+        codes, ids, defined, prereqs = [], {}, [], []
+
+        def intern(code: str) -> int:
+            key = normalize_code(code)
+            if key not in ids:
+                ids[key] = len(codes)
+                codes.append(display_code(code))
+                defined.append(False)
+                prereqs.append([])
+            return ids[key]
+
+        for major_info in courses.values():
+            for course in major_info["courses"]:
+                i = intern(course["code"])
+                defined[i] = True
+                prereqs[i] = sorted({intern(code) for code in course["prerequisites"]} - {i})
+
+        indptr = np.zeros(len(codes) + 1, dtype=np.int32)
+        indptr[1:] = np.cumsum([len(p) for p in prereqs])
+        indices = np.array([j for p in prereqs for j in p], dtype=np.int32)
+        return cls(codes, indptr, indices, defined)
+
+
+    @classmethod
+    def from_courses_json(cls, path: str = "courses.json") -> "PrereqGraph":
+        with open(path, "r", encoding="utf-8") as file:
+            return cls.from_courses(json.load(file))
+
+
+    def save(self, path: str) -> None:
+        """Save the CSR graph to a .npz file (the closure is cheap to recompute on load)"""
+        np.savez(path, codes=np.array(self.codes), indptr=self.indptr, indices=self.indices, defined=self.defined)
+
+
+    @classmethod
+    def load(cls, path: str) -> "PrereqGraph":
+        data = np.load(path)
+        return cls(data["codes"].tolist(), data["indptr"], data["indices"], data["defined"])
+
+
+    def prereq_ids(self, i: int) -> np.ndarray:
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+
+    def _to_bits(self, ids) -> int:
+        bits = 0
+        for i in ids:
+            bits |= 1 << int(i)
+        return bits
+
+
+    def _to_codes(self, bits: int) -> list[str]:
+        codes = []
+        i = 0
+        while bits:
+            if bits & 1:
+                codes.append(self.codes[i])
+            bits >>= 1
+            i += 1
+        return codes
+
+
+    def id(self, code: str) -> int:
+        key = normalize_code(code)
+        if key not in self.ids:
+            raise KeyError(f"Unknown course code: {code}")
+        return self.ids[key]
+
+
+    def bits(self, codes: list[str]) -> int:
+        """Bitset of a list of course codes; codes not in the graph are ignored"""
+        return self._to_bits(self.ids[key] for key in map(normalize_code, codes) if key in self.ids)
+
+
+    def _compute_closure(self) -> None:
+        """Transitive closure via Tarjan's SCCs, which come out prerequisites first; also records cycles"""
+        n = len(self.codes)
+        index, low = [-1] * n, [0] * n
+        on_stack, stack = [False] * n, []
+        scc_closure = [0] * n
+        self.closure = [0] * n
+        counter = 0
+
+        for root in range(n):
+            if index[root] != -1:
+                continue
+            work = [(root, 0)]
+            while work:
+                v, child = work.pop()
+                if child == 0:
+                    index[v] = low[v] = counter
+                    counter += 1
+                    stack.append(v)
+                    on_stack[v] = True
+                prereqs = self.prereq_ids(v)
+                if child < len(prereqs):
+                    work.append((v, child + 1))
+                    w = int(prereqs[child])
+                    if index[w] == -1:
+                        work.append((w, 0))
+                    elif on_stack[w]:
+                        low[v] = min(low[v], index[w])
+                    continue
+                # all prerequisites of v visited
+                for w in prereqs:
+                    w = int(w)
+                    if on_stack[w]:
+                        low[v] = min(low[v], low[w])
+                if low[v] == index[v]:
+                    members = []
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        members.append(w)
+                        if w == v:
+                            break
+                    member_bits = self._to_bits(members)
+                    closure = 0
+                    for m in members:
+                        closure |= self.direct[m]
+                        for w in self.prereq_ids(m):
+                            if not member_bits >> int(w) & 1:
+                                closure |= scc_closure[int(w)]
+                    if len(members) > 1:
+                        closure |= member_bits
+                        self.cycles.append(sorted(self.codes[m] for m in members))
+                    for m in members:
+                        scc_closure[m] = closure
+                        self.closure[m] = closure
+
+
+    def prerequisites(self, code: str) -> list[str]:
+        """Direct prerequisites of a course"""
+        return [self.codes[j] for j in self.prereq_ids(self.id(code))]
+
+
+    def ancestors(self, code: str) -> list[str]:
+        """Every course that is transitively a prerequisite of a course"""
+        return self._to_codes(self.closure[self.id(code)])
+
+
+    def dependents(self, code: str) -> list[str]:
+        """Every course that transitively requires a course"""
+        i = self.id(code)
+        return [self.codes[j] for j, closure in enumerate(self.closure) if closure >> i & 1]
+
+
+    def missing(self, code: str, completed: list[str]) -> list[str]:
+        """Transitive prerequisites of a course that are not completed yet"""
+        return self._to_codes(self.closure[self.id(code)] & ~self.bits(completed))
+
+
+    def can_take(self, i: int, done: int, mode: str = "all") -> bool:
+        """Whether course id i is unlocked by the completed bitset: all (or, with mode="any", one) of its prerequisites"""
+        if mode == "any":
+            return self.direct[i] == 0 or self.direct[i] & done != 0
+        return self.direct[i] & ~done == 0
+
+
+    def eligible(self, completed: list[str], mode: str = "all", include_no_prereqs: bool = False) -> list[str]:
+        """
+        Courses that are not completed and whose prerequisites are
+
+        Args:
+            completed: Codes of completed courses, in any spelling
+            mode: "all" needs every listed prerequisite; "any" needs one of them (the catalog's flat
+                  prerequisite lists lose the and/or structure, so "all" is the conservative reading)
+            include_no_prereqs: Also list the (many) courses without prerequisites
+        """
+        if mode not in ("all", "any"):
+            raise ValueError(f"Invalid mode: {mode}. Valid modes are: 'all', 'any'")
+        done = self.bits(completed)
+        return [
+            self.codes[i] for i in range(len(self.codes))
+            if self.defined[i] and not done >> i & 1 and (include_no_prereqs or self.direct[i])
+            and self.can_take(i, done, mode)
+        ]
+
+
+    def shortest_chain(self, code: str, completed: list[str] = (), mode: str = "all") -> list[str]:
+        """
+        Shortest path of prerequisite links from a course that can be taken now to a course
+
+        Returns the chain in the order the courses would be taken, [] if the course is already completed.
+        """
+        target = self.id(code)
+        done = self.bits(completed)
+        if done >> target & 1:
+            return []
+        parent = {target: None}
+        queue = deque([target])
+        while queue:
+            v = queue.popleft()
+            if self.can_take(v, done, mode):
+                chain = []
+                while v is not None:
+                    chain.append(self.codes[v])
+                    v = parent[v]
+                return chain
+            for w in self.prereq_ids(v):
+                w = int(w)
+                if w not in parent and not done >> w & 1:
+                    parent[w] = v
+                    queue.append(w)
+        return []
+
+
+    def dangling(self) -> list[str]:
+        """Codes that appear as a prerequisite but are not courses in the catalog"""
+        return [code for code, defined in zip(self.codes, self.defined) if not defined]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the prerequisite graph of courses.json")
+    parser.add_argument("--courses", default="courses.json", help="output of get_courses.py")
+    parser.add_argument("--out", default="prereqs.npz", help="where to save the compiled graph")
+    args = parser.parse_args()
+
+    graph = PrereqGraph.from_courses_json(args.courses)
+    graph.save(args.out)
+    print(graph)
+    for cycle in graph.cycles:
+        print("Cycle:", ", ".join(cycle))
+    print("Results saved to", args.out)
+
+
+if __name__ == "__main__":
+    main()
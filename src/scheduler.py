@@ -0,0 +1,204 @@
+import os
+import json
+import heapq
+from typing import Callable, Optional
+
+DAYS: str = "MTWRFS"
+PERIODS_PATH: str = os.path.join(os.path.dirname(__file__), "..", "data", "periods.json")
+EVENING_PERIODS: list[str] = ["E1", "E2", "E3"]
+
+
+def load_periods(path: str = PERIODS_PATH) -> list[str]:
+    """Load the period names ("1" ... "11", "E1" ... "E3") in the order they occur in a day"""
+    with open(path, "r") as file:
+        return list(json.load(file).keys())
+
+
+class ScheduleSolver():
+    """
+    Finds the best conflict-free weekly schedules for a set of courses
+
+    Every section option is encoded as a bitmask with one bit per (day, period), so a conflict check is a
+    single AND. The search is a depth-first backtracking that always branches on the course with the
+    fewest options left that fit (most constrained first) and prunes on conflicts, credit bounds and cost.
+    """
+    def __init__(self, periods: list[str] = None) -> None:
+        """
+        Create a ScheduleSolver
+
+        Args:
+            periods: Period names in order, defaults to the 14 periods in data/periods.json
+        """
+        self.periods: list[str] = periods or load_periods()
+        self.period_index: dict[str, int] = {period: i for i, period in enumerate(self.periods)}
+
+
+    def __str__(self) -> str:
+        return f"ScheduleSolver(periods={len(self.periods)}, days={DAYS})"
+
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+    def encode(self, option: dict) -> int:
+        """Bitmask of a section option such as {"MWF": 3} or {"T": 5, "R": [5, 6]}"""
+        mask = 0
+        for days, periods in option.items():
+            for period in periods if isinstance(periods, list) else [periods]:
+                if str(period) not in self.period_index:
+                    raise ValueError(f"Invalid period: {period}. Valid periods are: {', '.join(self.periods)}")
+                for day in days:
+                    if day not in DAYS:
+                        raise ValueError(f"Invalid day: {day}. Valid days are: {', '.join(DAYS)}")
+                    mask |= 1 << (DAYS.index(day) * len(self.periods) + self.period_index[str(period)])
+        return mask
+
+
+    def period_mask(self, periods: list[str]) -> int:
+        """Bitmask of the given periods on every day"""
+        mask = 0
+        for i in range(len(DAYS)):
+            for period in periods:
+                mask |= 1 << (i * len(self.periods) + self.period_index[str(period)])
+        return mask
+
+
+    def default_cost(self, option: dict) -> int:
+        """Number of meetings in the first two or the evening periods, so the best schedules avoid them"""
+        mask = self.encode(option)
+        return bin(mask & self.period_mask(self.periods[:2] + EVENING_PERIODS)).count("1")
+
+
+    def solve(
+            self,
+            courses: list[dict],
+            top_n: int = 5,
+            earliest_period: str = None,
+            no_evening: bool = False,
+            min_credits: int = None,
+            max_credits: int = None,
+            required: list[str] = None,
+            cost: Optional[Callable[[dict], float]] = None
+        ) -> list[dict]:
+        """
+        Return the top_n lowest cost conflict-free schedules
+
+        Args:
+            courses: Courses as in courses.json, each with "code", "credits" and "schedules" (its section options)
+            top_n: Number of schedules to return
+            earliest_period: Drop options meeting before this period, e.g. "3"
+            no_evening: Drop options meeting in the evening periods (E1-E3)
+            min_credits: Minimum total credits of a schedule
+            max_credits: Maximum total credits of a schedule
+            required: Codes of the courses every schedule must contain. Defaults to all courses when
+                      there is no credit target; with one, any subset of courses meeting it is allowed
+            cost: Cost of a section option, summed over a schedule (lower is better). Defaults to default_cost
+
+        Returns a list of {"cost", "credits", "sections": {code: option}} sorted by cost.
+        """
+        if top_n < 1:
+            raise ValueError(f"Invalid top_n: {top_n}. It must be at least 1")
+        cost = cost or self.default_cost
+        if required is None:
+            required = [course["code"] for course in courses] if min_credits is None and max_credits is None else []
+        required = set(required)
+        codes = [course["code"] for course in courses]
+        for code in required:
+            if code not in codes:
+                raise ValueError(f"Required course {code} is not in the list of courses")
+
+        # periods the constraints rule out
+        blocked = 0
+        if earliest_period is not None:
+            blocked |= self.period_mask(self.periods[:self.period_index[str(earliest_period)]])
+        if no_evening:
+            blocked |= self.period_mask([period for period in EVENING_PERIODS if period in self.period_index])
+
+        # encode and filter each course's options once, cheapest first so good schedules are found early
+        options, credits = [], []
+        for course in courses:
+            # options meeting at the same times are interchangeable, keep the cheapest
+            encoded = {}
+            for option in course.get("schedules", []):
+                mask = self.encode(option)
+                if mask & blocked == 0 and (mask not in encoded or cost(option) < encoded[mask][0]):
+                    encoded[mask] = (cost(option), mask, option)
+            encoded = sorted(encoded.values(), key=lambda item: (item[0], item[1]))
+            if not encoded and course["code"] in required:
+                return []
+            options.append(encoded)
+            credits.append(int(course["credits"]))
+        is_required = [code in required for code in codes]
+        max_credits = max_credits if max_credits is not None else float("inf")
+        min_credits = min_credits or 0
+
+        best = []      # max-heap on cost (negated) of the top_n schedules found so far
+        chosen = {}
+        counter = [0]
+
+        def worst_cost():
+            return -best[0][0] if len(best) == top_n else float("inf")
+
+        def search(remaining: list[int], mask: int, total_cost: float, total_credits: int) -> None:
+            if total_credits > max_credits:
+                return
+            # credit bound: even taking every remaining course can't reach min_credits
+            if total_credits + sum(credits[i] for i in remaining if options[i]) < min_credits:
+                return
+            # cost bound: required courses still have to add at least their cheapest fitting option
+            lower_bound = total_cost
+            fitting = {}
+            for i in remaining:
+                fits = [option for option in options[i] if option[1] & mask == 0]
+                if not fits and is_required[i]:
+                    return
+                fitting[i] = fits
+                if is_required[i]:
+                    lower_bound += fits[0][0]
+            if lower_bound >= worst_cost():
+                return
+
+            if not remaining:
+                if total_credits >= min_credits:
+                    counter[0] += 1
+                    schedule = {"cost": total_cost, "credits": total_credits, "sections": dict(chosen)}
+                    entry = (-total_cost, -counter[0], schedule)
+                    if len(best) < top_n:
+                        heapq.heappush(best, entry)
+                    else:
+                        heapq.heapreplace(best, entry)
+                return
+
+            # most constrained first: the course with the fewest options that still fit
+            i = min(remaining, key=lambda j: (len(fitting[j]), j))
+            rest = [j for j in remaining if j != i]
+            for option_cost, option_mask, option in fitting[i]:
+                chosen[codes[i]] = option
+                search(rest, mask | option_mask, total_cost + option_cost, total_credits + credits[i])
+                del chosen[codes[i]]
+            if not is_required[i]:
+                search(rest, mask, total_cost, total_credits)
+
+        search(list(range(len(courses))), 0, 0, 0)
+        return [schedule for _, _, schedule in sorted(best, key=lambda entry: (-entry[0], -entry[1]))]
+
+
+    def timetable(self, schedule: dict, periods_path: str = PERIODS_PATH) -> str:
+        """Render a schedule as a weekly grid of periods (rows) by days (columns)"""
+        with open(periods_path, "r") as file:
+            times = json.load(file)
+        grid = {}
+        for code, option in schedule["sections"].items():
+            mask = self.encode(option)
+            for d, day in enumerate(DAYS):
+                for p, period in enumerate(self.periods):
+                    if mask >> (d * len(self.periods) + p) & 1:
+                        grid[(day, period)] = code
+
+        days = DAYS.rstrip("S") if not any(day == "S" for day, _ in grid) else DAYS
+        lines = ["Period  Time          " + "".join(f"{day:<11}" for day in days)]
+        for period in self.periods:
+            time = times.get(period, {}).get("start", "")
+            lines.append(f"{period:<8}{time:<14}" + "".join(f"{grid.get((day, period), '-'):<11}" for day in days))
+        return "\n".join(lines)
@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import argparse
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from langchain_core.documents import Document
+from langchain_core.runnables import Runnable
+from src.batch import BatchAnswerer
+from src.instrumentation import LATENCY_BUCKETS, Histogram, LatencyTracker
+
+
+def sse(event: str, data) -> str:
+    """One server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class ChatRequest(BaseModel):
+    """Body of POST /chat"""
+    question: str = Field(..., min_length=1)
+
+
+class BatchRequest(BaseModel):
+    """Body of POST /chat/batch"""
+    questions: List[str]
+    audit: Optional[str] = None
+
+
+def document_source(document: Document) -> dict:
+    return {"text": document.page_content, "metadata": document.metadata}
+
+
+async def stream_answer(chain: Runnable, question: str, request: Request = None, stats: dict = None):
+    """
+    Yield the chain's output as server-sent events: "sources" as soon as retrieval is done, then one "token"
+    event per answer chunk, then "done" with the timings (or "error"). Stops, cancelling the LLM call,
+    when the client disconnects.
+    """
+    start = time.perf_counter()
+    first_token = None
+    finished = False
+    stream = chain.astream(question)
+    try:
+        async for chunk in stream:
+            if request is not None and await request.is_disconnected():
+                return
+            if "context" in chunk:
+                sources_ms = (time.perf_counter() - start) * 1000
+                yield sse("sources", {"sources": [document_source(doc) for doc in chunk["context"]], "ms": sources_ms})
+            if chunk.get("answer"):
+                if first_token is None:
+                    first_token = time.perf_counter()
+                yield sse("token", chunk["answer"])
+        finished = True
+    except Exception as error:
+        finished = True
+        yield sse("error", {"error": f"{type(error).__name__}: {error}"})
+        return
+    finally:
+        # the client went away (or the server cancelled this response): closing the chain's stream
+        # cancels whatever is still running in it, e.g. the LLM call
+        if not finished and stats is not None:
+            stats["cancelled"] += 1
+        await stream.aclose()
+
+    ttft_ms = (first_token - start) * 1000 if first_token is not None else None
+    total_ms = (time.perf_counter() - start) * 1000
+    if stats is not None:
+        stats["requests"] += 1
+        if ttft_ms is not None:
+            stats["ttft"].observe(ttft_ms / 1000)
+    yield sse("done", {"ttft_ms": ttft_ms, "total_ms": total_ms})
+
+
+def create_app(chain: Runnable, tracker: LatencyTracker = None, batcher: BatchAnswerer = None, max_batch: int = 50) -> FastAPI:
+    """
+    HTTP API over a chain from get_chain
+
+    GET /chat/stream?question=... streams server-sent events (see stream_answer), usable from an EventSource
+    POST /chat {"question": ...} returns {"question", "answer", "sources"} once the answer is complete
+    GET /stats reports the time to first token of the streamed answers
+    GET /metrics exports the per-stage latencies of the tracker given to get_chain (Prometheus text, or ?format=json)
+    POST /chat/batch {"questions": [...], "audit": optional} answers up to max_batch questions with the batcher, in order
+    """
+    app = FastAPI(title="Course Scheduler")
+    # time to first token in seconds, in a fixed-bucket histogram so memory doesn't grow with the requests
+    app.state.stats = {"requests": 0, "cancelled": 0, "ttft": Histogram(LATENCY_BUCKETS)}
+
+    @app.get("/chat/stream")
+    async def chat_stream(request: Request, question: str = Query(..., min_length=1)):
+        return StreamingResponse(
+            stream_answer(chain, question, request, app.state.stats),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    @app.post("/chat")
+    async def chat(body: ChatRequest):
+        result = await chain.ainvoke(body.question)
+        return {"question": result["question"], "answer": result["answer"],
+                "sources": [document_source(doc) for doc in result["context"]]}
+
+    @app.get("/stats")
+    async def stats():
+        ttft = app.state.stats["ttft"]
+        percentile = lambda q: ttft.quantile(q) * 1000 if ttft.count else None
+        return {"requests": app.state.stats["requests"], "cancelled": app.state.stats["cancelled"],
+                "ttft_ms_p50": percentile(0.5), "ttft_ms_p95": percentile(0.95)}
+
+    if batcher is not None:
+        @app.post("/chat/batch")
+        async def chat_batch(body: BatchRequest):
+            # every question costs an LLM call
+            if not 1 <= len(body.questions) <= max_batch:
+                raise HTTPException(status_code=422, detail=f"Between 1 and {max_batch} questions are answered per request")
+            if not all(question.strip() for question in body.questions):
+                raise HTTPException(status_code=422, detail="Questions must not be empty")
+            results, stats = await batcher.abatch(body.questions, audit=body.audit)
+            return {"results": [{"question": result["question"], "answer": result["answer"], "error": result["error"],
+                                 "sources": [document_source(doc) for doc in result["context"]]} for result in results],
+                    "stats": stats}
+
+    if tracker is not None:
+        @app.get("/metrics")
+        async def metrics(format: str = "prometheus"):
+            if format == "json":
+                return tracker.to_json()
+            return PlainTextResponse(tracker.to_prometheus(), media_type="text/plain; version=0.0.4")
+
+    return app
+
+
+def main():
+    import uvicorn
+    from openai import OpenAI
+    from dotenv import load_dotenv
+    from src.chain import get_chain
+    from src.context import ContextPacker
+    from src.models import get_llm, get_pool
+    from src.embedder import Embedder, EmbedderEmbeddings
+    from src.embedding_cache import EmbeddingCache
+    from src.vectorstore import LocalVectorStore
+
+    parser = argparse.ArgumentParser(description="Serve the chatbot with token streaming")
+    parser.add_argument("--provider", default="openai")
+    parser.add_argument("--model", default="gpt-3.5-turbo")
+    parser.add_argument("--fallback", nargs="+", default=[], metavar="PROVIDER:MODEL",
+                        help="backup models in priority order, pooled with hedged requests and failover")
+    parser.add_argument("--hedge-after", type=float, default=2.0, help="seconds before a request is hedged to a backup model")
+    parser.add_argument("--store", default="index", help="LocalVectorStore directory written by src.indexer")
+    parser.add_argument("--hybrid", action="store_true", help="use hybrid BM25 + vector retrieval")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--context-budget", type=int, default=None, help="pack the retrieved docs into this many prompt tokens")
+    parser.add_argument("--batch-concurrency", type=int, default=8, help="LLM calls in flight for /chat/batch")
+    parser.add_argument("--max-batch", type=int, default=50, help="most questions accepted by one /chat/batch request")
+    parser.add_argument("--trace", default=None, help="JSON lines file to dump a latency trace of every question to")
+    args = parser.parse_args()
+
+    load_dotenv()
+    embedding = EmbedderEmbeddings(Embedder(OpenAI(), cache=EmbeddingCache(os.path.join(args.store, "embeddings.sqlite"))))
+    store = LocalVectorStore.load(args.store, embedding)
+    if args.fallback:
+        models = [(args.provider, args.model)] + [tuple(pair.split(":", 1)) for pair in args.fallback]
+        model = get_pool(models, temperature=0, max_tokens=1024, stream=True, hedge_after=args.hedge_after)
+    else:
+        model = get_llm(args.provider, args.model, temperature=0, max_tokens=1024, stream=True)
+    tracker = LatencyTracker(trace_path=args.trace)
+    try:
+        packer = ContextPacker(budget=args.context_budget) if args.context_budget else None
+    except (ImportError, RuntimeError) as error:
+        parser.error(f"--context-budget: {error}")
+    chain = get_chain(model, store, hybrid=args.hybrid, tracker=tracker, packer=packer)
+    batcher = BatchAnswerer(model, store, hybrid=args.hybrid, packer=packer, max_concurrency=args.batch_concurrency)
+    uvicorn.run(create_app(chain, tracker, batcher, max_batch=args.max_batch), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
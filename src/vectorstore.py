@@ -0,0 +1,537 @@
+import os
+import json
+import uuid
+from typing import Any, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from src.embedder import VALID_METRICS, format_list
+
+VALID_ENCODINGS: list[str] = ["float16", "int8", "binary"]
+# rows decoded to float32 at a time when scoring float16 / int8 codes, bounding the temporary memory
+SCORE_BLOCK: int = 2048
+# popcount of every 16 bit value, for Hamming distances between packed sign bits
+POPCOUNT: np.ndarray = np.unpackbits(np.arange(2 ** 16, dtype=np.uint16).view(np.uint8)).reshape(-1, 16).sum(axis=1).astype(np.uint8)
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector store over a (memory-mapped) float32 matrix, usable in place of PineconeVectorStore
+
+    Search is exact top-k by default. After build_ivf() it probes the nearest clusters only (IVF),
+    which trades a little recall for speed on larger corpora. After quantize() candidates are scored on
+    compact codes (float16, int8 or sign bits, optionally of the first dims only) kept in memory, and only
+    the best ones are rescored against the full vectors, which can then stay on disk (see load()).
+    """
+    def __init__(self, embedding: Embeddings, metric: str = "cosine") -> None:
+        """
+        Create an empty LocalVectorStore
+
+        Args:
+            embedding: langchain Embeddings used to embed added texts and queries
+            metric: Similarity metric: "euclidean", "cosine", or "dotproduct"
+        """
+        if metric not in VALID_METRICS:
+            raise ValueError(f"Invalid metric: {metric}. Valid metrics are: {format_list(VALID_METRICS)}")
+        self._embedding: Embeddings = embedding
+        self.metric: str = metric
+
+        self.vectors: np.ndarray = None     # (n, dim) float32, rows are unit norm for cosine
+        self.ids: list[str] = []
+        self.texts: list[str] = []
+        self.metadatas: list[dict] = []
+
+        # IVF state, only set once build_ivf() has been called
+        self.centroids: np.ndarray = None
+        self.assignments: np.ndarray = None
+        self.n_probe: int = 1
+
+        # quantization state, only set once quantize() has been called
+        self.encoding: str = None
+        self.codes: np.ndarray = None       # (n, dim) float16 / int8, or (n, dim / 8) packed sign bits
+        self.code_dim: int = None
+        self.scale: np.ndarray = None       # per-dimension int8 scale
+        self.rescore: int = 4
+
+        self._id_to_row: dict[str, int] = {}
+        self._metadata_index: dict = None
+
+
+    def __str__(self) -> str:
+        mode = f"ivf, n_lists={len(self.centroids)}" if self.centroids is not None else "exact"
+        if self.codes is not None:
+            mode += f", {self.encoding}[{self.code_dim}]"
+        return f"LocalVectorStore(metric={self.metric}, size={len(self)}, mode={mode})"
+
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self._embedding
+
+
+    def _prepare(self, vectors) -> np.ndarray:
+        """Convert vectors to a float32 matrix, unit normalizing them for cosine similarity"""
+        vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+        if self.metric == "cosine":
+            norm = np.linalg.norm(vectors, axis=1, keepdims=True)
+            norm[norm == 0] = 1
+            vectors /= norm
+        return vectors
+
+
+    def _scores(self, vectors: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Score rows against a query so that higher is always better (negated distance for euclidean)"""
+        if self.metric == "euclidean":
+            return -np.linalg.norm(vectors - query, axis=1)
+        return vectors @ query
+
+
+    def add_texts(
+            self,
+            texts: Iterable[str],
+            metadatas: Optional[List[dict]] = None,
+            ids: Optional[List[str]] = None,
+            **kwargs: Any
+        ) -> List[str]:
+        """Embed and add texts to the store, replacing any existing documents with the same ids"""
+        texts = list(texts)
+        if not texts:
+            return []
+        return self.add_vectors(self._embedding.embed_documents(texts), texts, metadatas=metadatas, ids=ids)
+
+
+    def add_vectors(
+            self,
+            vectors,
+            texts: List[str],
+            metadatas: Optional[List[dict]] = None,
+            ids: Optional[List[str]] = None
+        ) -> List[str]:
+        """Add precomputed vectors (e.g. from Embedder.embed_bulk) and their texts to the store"""
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        if not len(texts) == len(metadatas) == len(ids) == len(vectors):
+            raise ValueError("texts, metadatas, ids and vectors must have the same length")
+        if len(texts) == 0:
+            # _prepare would turn no vectors into one empty row
+            return []
+
+        # upsert semantics: drop the old rows of ids that are being re-added
+        self.delete([id_ for id_ in ids if id_ in self._id_to_row])
+
+        vectors = self._prepare(vectors)
+        self.vectors = vectors if self.vectors is None else np.vstack([self.vectors, vectors])
+        start = len(self.ids)
+        self.ids.extend(ids)
+        self.texts.extend(texts)
+        self.metadatas.extend(dict(metadata) for metadata in metadatas)
+        self._id_to_row.update((id_, start + i) for i, id_ in enumerate(ids))
+        self._metadata_index = None
+
+        if self.centroids is not None:
+            self.assignments = np.concatenate([self.assignments, self._assign(vectors)])
+        if self.codes is not None:
+            self.codes = np.concatenate([self.codes, self._encode(vectors)])
+        return ids
+
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """Delete documents by id"""
+        rows = [self._id_to_row[id_] for id_ in ids or [] if id_ in self._id_to_row]
+        if not rows:
+            return True
+        keep = np.ones(len(self.ids), dtype=bool)
+        keep[rows] = False
+        self.vectors = self.vectors[keep]
+        if self.assignments is not None:
+            self.assignments = self.assignments[keep]
+        if self.codes is not None:
+            self.codes = self.codes[keep]
+        self.ids = [id_ for id_, k in zip(self.ids, keep) if k]
+        self.texts = [text for text, k in zip(self.texts, keep) if k]
+        self.metadatas = [metadata for metadata, k in zip(self.metadatas, keep) if k]
+        self._id_to_row = {id_: row for row, id_ in enumerate(self.ids)}
+        self._metadata_index = None
+        return True
+
+
+    def build_ivf(self, n_lists: int = None, n_iter: int = 10, n_probe: int = None, seed: int = 0) -> None:
+        """
+        Cluster the stored vectors with k-means so searches only visit the n_probe nearest clusters
+
+        Args:
+            n_lists: Number of clusters, defaults to sqrt(n)
+            n_iter: Number of k-means iterations
+            n_probe: Number of clusters searched per query, defaults to max(1, n_lists // 8)
+            seed: Random seed for the initial centroids
+        """
+        n = len(self)
+        if n == 0:
+            raise ValueError("Cannot build an IVF index over an empty store")
+        n_lists = min(n, n_lists or int(np.sqrt(n)))
+        rng = np.random.default_rng(seed)
+        centroids = self.vectors[rng.choice(n, size=n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            self.centroids = centroids
+            assignments = self._assign(self.vectors)
+            for c in range(n_lists):
+                members = self.vectors[assignments == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            if self.metric == "cosine":
+                centroids = self._prepare(centroids)
+        self.centroids = centroids
+        self.assignments = self._assign(self.vectors)
+        self.n_probe = n_probe or max(1, n_lists // 8)
+
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        """Index of the best scoring centroid for each vector"""
+        if self.metric == "euclidean":
+            # |v - c|^2 = |v|^2 - 2 v.c + |c|^2, and |v|^2 does not change the argmin
+            scores = 2 * vectors @ self.centroids.T - (self.centroids ** 2).sum(axis=1)
+        else:
+            scores = vectors @ self.centroids.T
+        return scores.argmax(axis=1).astype(np.int32)
+
+
+    def quantize(self, encoding: str = "int8", dim: int = None, rescore: int = 4) -> None:
+        """
+        Keep a compact copy of the vectors to generate search candidates from
+
+        Args:
+            encoding: "float16" (2 bytes per dim), "int8" (1 byte per dim, with a per-dimension scale) or
+                "binary" (sign bits, 1 bit per dim, scored by Hamming distance)
+            dim: Only encode the first dim dimensions, e.g. of text-embedding-3 vectors which keep most of
+                their meaning when shortened. Defaults to all of them
+            rescore: Candidates per result (k * rescore) that are rescored against the full vectors;
+                0 returns the candidates' approximate scores without touching the full vectors
+        """
+        if encoding not in VALID_ENCODINGS:
+            raise ValueError(f"Invalid encoding: {encoding}. Valid encodings are: {format_list(VALID_ENCODINGS)}")
+        if len(self) == 0:
+            raise ValueError("Cannot quantize an empty store")
+        full_dim = self.vectors.shape[1]
+        self.encoding, self.code_dim, self.rescore = encoding, min(dim or full_dim, full_dim), rescore
+        self.scale = None
+        if encoding == "int8":
+            scale = np.zeros(self.code_dim, dtype=np.float32)
+            for start in range(0, len(self), SCORE_BLOCK):
+                block = np.abs(self._prefix(self.vectors[start:start + SCORE_BLOCK]))
+                scale = np.maximum(scale, block.max(axis=0))
+            scale[scale == 0] = 1
+            self.scale = scale / 127
+        self.codes = np.concatenate([self._encode(self.vectors[start:start + SCORE_BLOCK])
+                                     for start in range(0, len(self), SCORE_BLOCK)])
+
+
+    def _prefix(self, vectors: np.ndarray) -> np.ndarray:
+        """The first code_dim dims of rows, unit normalized again for cosine"""
+        if self.code_dim == vectors.shape[1]:
+            return np.asarray(vectors, dtype=np.float32)
+        return self._prepare(vectors[:, :self.code_dim]) if self.metric == "cosine" else np.array(vectors[:, :self.code_dim], dtype=np.float32)
+
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = self._prefix(vectors)
+        if self.encoding == "float16":
+            return vectors.astype(np.float16)
+        if self.encoding == "int8":
+            return np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+        bits = np.packbits(vectors > 0, axis=1)
+        return np.pad(bits, ((0, 0), (0, bits.shape[1] % 2)))
+
+
+    def _approximate_scores(self, query: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        """Scores of the (selected) rows from their codes, higher is better"""
+        codes = self.codes if rows is None else self.codes[rows]
+        query = query[:self.code_dim]
+        if self.encoding == "binary":
+            # the codes are padded to whole 16 bit words, looked up two bytes at a time
+            bits = np.packbits(query > 0, axis=-1)
+            bits = np.pad(bits, (0, codes.shape[1] - len(bits)))
+            return -POPCOUNT[np.bitwise_xor(codes.view(np.uint16), bits.view(np.uint16))].sum(axis=1, dtype=np.int32).astype(np.float32)
+        scale = self.scale
+        if scale is not None and self.metric != "euclidean":
+            # (codes * scale) @ q == codes @ (scale * q): no need to decode the codes
+            query, scale = query * scale, None
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK):
+            block = codes[start:start + SCORE_BLOCK].astype(np.float32)
+            if scale is not None:
+                block *= scale
+            scores[start:start + SCORE_BLOCK] = self._scores(block, query)
+        return scores
+
+
+    @property
+    def bytes_per_vector(self) -> float:
+        """Memory per vector of what a search scans: the codes after quantize(), else the float32 vectors"""
+        if len(self) == 0:
+            return 0.0
+        if self.codes is not None:
+            return self.codes.nbytes / len(self)
+        return self.vectors.nbytes / len(self)
+
+
+    def _build_metadata_index(self) -> dict:
+        """Map metadata key -> value -> rows; list values are indexed per element like Pinecone"""
+        index = {}
+        for row, metadata in enumerate(self.metadatas):
+            for key, value in metadata.items():
+                for v in value if isinstance(value, list) else [value]:
+                    try:
+                        index.setdefault(key, {}).setdefault(v, []).append(row)
+                    except TypeError:
+                        continue    # unhashable values can't be filtered on
+        return index
+
+
+    def _filter_rows(self, filter: dict) -> np.ndarray:
+        """
+        Boolean mask of rows matching a metadata filter
+
+        Supports the common subset of Pinecone's filter syntax: {"key": value}, {"key": {"$eq": value}}
+        and {"key": {"$in": [values]}}, with all keys ANDed together. A list metadata value (e.g. a course's
+        "majors") matches when any of its elements does.
+        """
+        if self._metadata_index is None:
+            self._metadata_index = self._build_metadata_index()
+        mask = np.ones(len(self), dtype=bool)
+        for key, condition in filter.items():
+            if isinstance(condition, dict):
+                if "$eq" in condition:
+                    values = [condition["$eq"]]
+                elif "$in" in condition:
+                    values = condition["$in"]
+                else:
+                    raise ValueError(f"Unsupported filter operator for '{key}': {format_list(list(condition))}")
+            else:
+                values = [condition]
+            key_mask = np.zeros(len(self), dtype=bool)
+            for value in values:
+                key_mask[self._metadata_index.get(key, {}).get(value, [])] = True
+            mask &= key_mask
+        return mask
+
+
+    def search_vector(self, embedding, k: int = 4, filter: Optional[dict] = None, n_probe: int = None) -> List[Tuple[int, float]]:
+        """Return (row, score) of the top k rows for a query vector, best first"""
+        if len(self) == 0:
+            return []
+        query = self._prepare(embedding)[0]
+
+        candidates = None
+        if self.centroids is not None:
+            probe = min(len(self.centroids), n_probe or self.n_probe)
+            centroid_scores = self._scores(self.centroids, query)
+            nearest = np.argpartition(-centroid_scores, probe - 1)[:probe]
+            candidates = np.isin(self.assignments, nearest)
+        if filter:
+            mask = self._filter_rows(filter)
+            candidates = mask if candidates is None else candidates & mask
+
+        rows = None if candidates is None else np.flatnonzero(candidates)
+        if self.codes is not None:
+            return self._search_quantized(query, k, rows)
+        scores = self._scores(self.vectors if rows is None else self.vectors[rows], query)
+        if len(scores) == 0:
+            return []
+
+        # argpartition finds the top k in O(n), only those k get sorted
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        if rows is not None:
+            return [(int(rows[i]), float(scores[i])) for i in top]
+        return [(int(i), float(scores[i])) for i in top]
+
+
+    def search_vectors(self, embeddings, k: int = 4, filter: Optional[dict] = None, n_probe: int = None) -> List[List[Tuple[int, float]]]:
+        """search_vector for many query vectors at once: one matrix product for an exact search"""
+        if self.centroids is not None or self.codes is not None or filter or len(self) == 0:
+            return [self.search_vector(embedding, k=k, filter=filter, n_probe=n_probe) for embedding in embeddings]
+        queries = self._prepare(embeddings)
+        k = min(k, len(self))
+        results = []
+        # a block of queries at a time, bounding the (queries, n) score matrix
+        step = max(1, SCORE_BLOCK * 64 // len(self))
+        norms = (self.vectors ** 2).sum(axis=1) if self.metric == "euclidean" else None
+        for start in range(0, len(queries), step):
+            block = queries[start:start + step]
+            if self.metric == "euclidean":
+                # |v - q|^2 = |v|^2 - 2 v.q + |q|^2
+                squared = norms - 2 * block @ self.vectors.T + (block ** 2).sum(axis=1)[:, None]
+                scores = -np.sqrt(np.maximum(squared, 0))
+            else:
+                scores = block @ self.vectors.T
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            for row_scores, row_top in zip(scores, top):
+                row_top = row_top[np.argsort(-row_scores[row_top])]
+                results.append([(int(i), float(row_scores[i])) for i in row_top])
+        return results
+
+
+    def _search_quantized(self, query: np.ndarray, k: int, rows: Optional[np.ndarray]) -> List[Tuple[int, float]]:
+        """Top k from the codes, rescored against the full vectors when rescore is set"""
+        scores = self._approximate_scores(query, rows)
+        if len(scores) == 0:
+            return []
+        n_candidates = min(len(scores), k * self.rescore if self.rescore else k)
+        local = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+        top, scores = (local if rows is None else rows[local]), scores[local]
+        if self.rescore:
+            # sorted rows read a memory-mapped matrix front to back
+            top = np.sort(top)
+            scores = self._scores(self.vectors[top], query)
+        k = min(k, len(top))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(top[i]), float(scores[i])) for i in best]
+
+
+    def _to_document(self, row: int) -> Document:
+        return Document(page_content=self.texts[row], metadata=self.metadatas[row])
+
+
+    def similarity_search_by_vector_with_score(
+            self,
+            embedding: List[float],
+            k: int = 4,
+            filter: Optional[dict] = None,
+            **kwargs: Any
+        ) -> List[Tuple[Document, float]]:
+        """Return documents most similar to a vector with their scores (distance for euclidean)"""
+        results = self.search_vector(embedding, k=k, filter=filter, n_probe=kwargs.get("n_probe"))
+        if self.metric == "euclidean":
+            return [(self._to_document(row), -score) for row, score in results]
+        return [(self._to_document(row), score) for row, score in results]
+
+
+    def similarity_search_by_vectors(
+            self,
+            embeddings: List[List[float]],
+            k: int = 4,
+            filter: Optional[dict] = None,
+            **kwargs: Any
+        ) -> List[List[Document]]:
+        """Return the documents most similar to each of many vectors, searched as a batch"""
+        results = self.search_vectors(embeddings, k=k, filter=filter, n_probe=kwargs.get("n_probe"))
+        return [[self._to_document(row) for row, _ in rows] for rows in results]
+
+
+    def similarity_search_with_score(
+            self,
+            query: str,
+            k: int = 4,
+            filter: Optional[dict] = None,
+            **kwargs: Any
+        ) -> List[Tuple[Document, float]]:
+        """Return documents most similar to a query with their scores (distance for euclidean)"""
+        return self.similarity_search_by_vector_with_score(
+            self._embedding.embed_query(query), k=k, filter=filter, **kwargs
+        )
+
+
+    def similarity_search_by_vector(
+            self,
+            embedding: List[float],
+            k: int = 4,
+            filter: Optional[dict] = None,
+            **kwargs: Any
+        ) -> List[Document]:
+        """Return documents most similar to a vector"""
+        return [doc for doc, _ in self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter, **kwargs)]
+
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Document]:
+        """Return documents most similar to a query"""
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter, **kwargs)]
+
+
+    def _select_relevance_score_fn(self):
+        if self.metric == "euclidean":
+            return self._euclidean_relevance_score_fn
+        if self.metric == "cosine":
+            return self._cosine_relevance_score_fn
+        return self._max_inner_product_relevance_score_fn
+
+
+    def save(self, path: str) -> None:
+        """Save the store to a directory (vectors as .npy so they can be memory-mapped on load)"""
+        os.makedirs(path, exist_ok=True)
+        vectors = self.vectors if self.vectors is not None else np.empty((0, 0), np.float32)
+        if isinstance(vectors, np.memmap):
+            # copy out first, the memmap may be backed by the file about to be overwritten
+            vectors = np.array(vectors)
+        np.save(os.path.join(path, "vectors.npy"), vectors)
+        if self.centroids is not None:
+            np.savez(os.path.join(path, "ivf.npz"), centroids=self.centroids, assignments=self.assignments, n_probe=self.n_probe)
+        elif os.path.exists(os.path.join(path, "ivf.npz")):
+            os.remove(os.path.join(path, "ivf.npz"))
+        if self.codes is not None:
+            np.savez(os.path.join(path, "codes.npz"), codes=self.codes, encoding=self.encoding, dim=self.code_dim,
+                     scale=self.scale if self.scale is not None else np.empty(0, np.float32), rescore=self.rescore)
+        elif os.path.exists(os.path.join(path, "codes.npz")):
+            os.remove(os.path.join(path, "codes.npz"))
+        with open(os.path.join(path, "docs.json"), "w", encoding="utf-8") as file:
+            json.dump(
+                {"metric": self.metric, "ids": self.ids, "texts": self.texts, "metadatas": self.metadatas},
+                file, ensure_ascii=False
+            )
+
+
+    @classmethod
+    def load(cls, path: str, embedding: Embeddings, mmap: bool = True) -> "LocalVectorStore":
+        """
+        Load a store saved with save(), memory-mapping the vectors by default
+
+        A quantized store keeps just its codes in memory; the pages of the full vectors are only read for the
+        candidates that get rescored.
+        """
+        with open(os.path.join(path, "docs.json"), "r", encoding="utf-8") as file:
+            docs = json.load(file)
+        store = cls(embedding, metric=docs["metric"])
+        store.ids, store.texts, store.metadatas = docs["ids"], docs["texts"], docs["metadatas"]
+        store._id_to_row = {id_: row for row, id_ in enumerate(store.ids)}
+        if store.ids:
+            store.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r" if mmap else None)
+
+        ivf_path = os.path.join(path, "ivf.npz")
+        if os.path.exists(ivf_path):
+            ivf = np.load(ivf_path)
+            store.centroids, store.assignments, store.n_probe = ivf["centroids"], ivf["assignments"], int(ivf["n_probe"])
+
+        codes_path = os.path.join(path, "codes.npz")
+        if os.path.exists(codes_path):
+            # the codes are read into memory, the full vectors stay memory-mapped for rescoring
+            codes = np.load(codes_path)
+            store.codes, store.encoding, store.code_dim = codes["codes"], str(codes["encoding"]), int(codes["dim"])
+            store.scale = codes["scale"] if len(codes["scale"]) else None
+            store.rescore = int(codes["rescore"])
+        return store
+
+
+    @classmethod
+    def from_texts(
+            cls,
+            texts: List[str],
+            embedding: Embeddings,
+            metadatas: Optional[List[dict]] = None,
+            ids: Optional[List[str]] = None,
+            metric: str = "cosine",
+            **kwargs: Any
+        ) -> "LocalVectorStore":
+        """Build a store from a list of texts"""
+        store = cls(embedding, metric=metric, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store